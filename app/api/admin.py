@@ -0,0 +1,84 @@
+from fastapi import APIRouter, BackgroundTasks, HTTPException, status
+
+from app.schemas import BacktestRequest
+from app.services.alerts import alert_service
+from app.services.backtest import Backtest, backtest_runner
+from app.services.baselines import baseline_job, baseline_elector
+from app.services.cache import cache_service
+from app.services.recent_checks import recent_checks
+from app.services.retention import retention_job, retention_elector
+
+router = APIRouter()
+
+@router.get("/retention")
+async def get_retention_status():
+    """Retention policy, progress of the current or last run, and the oldest data kept"""
+    report = await retention_job.report()
+    # Scheduled runs happen in whichever API process holds the retention lease
+    report["leader"] = retention_elector.is_leader
+    return report
+
+@router.post("/retention/run", status_code=status.HTTP_202_ACCEPTED)
+async def run_retention():
+    """Start a retention run now instead of waiting for the next scheduled one"""
+    if not retention_elector.is_leader:
+        # Only the lease holder may delete; another process may be running it right now
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This process does not hold the retention lease; send the request to the leader"
+        )
+    started = not retention_job.is_running
+    if started:
+        retention_job.request_run()
+    return {"started": started}
+
+@router.get("/recent-checks")
+async def get_recent_checks_stats():
+    """Size of the in-memory recent checks buffers in this process"""
+    return recent_checks.stats()
+
+@router.get("/cache")
+async def get_cache_stats():
+    """Hit, miss and coalescing counters of this process's cache tiers"""
+    return cache_service.stats()
+
+@router.get("/alerts")
+async def get_alert_stats():
+    """Alert queue depth and delivery counters of this process's worker"""
+    return alert_service.stats()
+
+@router.get("/baselines")
+async def get_baseline_status():
+    """Progress of the current or last seasonal baseline build"""
+    return {
+        **baseline_job.status,
+        "running": baseline_job.is_running,
+        "leader": baseline_elector.is_leader,
+    }
+
+@router.post("/baselines/run", status_code=status.HTTP_202_ACCEPTED)
+async def run_baselines():
+    """Rebuild seasonal baselines now instead of waiting for the next scheduled build"""
+    if not baseline_elector.is_leader:
+        # Builds run in the lease holder only, so two processes never rebuild at once
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This process does not hold the baselines lease; send the request to the leader"
+        )
+    started = not baseline_job.is_running
+    if started:
+        baseline_job.request_run()
+    return {"started": started}
+
+@router.get("/backtest")
+async def get_backtest():
+    """Progress of the running backtest, or the report of the last one"""
+    return backtest_runner.report()
+
+@router.post("/backtest", status_code=status.HTTP_202_ACCEPTED)
+async def run_backtest(request: BacktestRequest, background_tasks: BackgroundTasks):
+    """Replay stored checks through the anomaly detectors; poll GET for the report"""
+    started = not backtest_runner.is_running
+    if started:
+        background_tasks.add_task(backtest_runner.run, Backtest(**request.model_dump()))
+    return {"started": started}
@@ -0,0 +1,61 @@
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from typing import Optional
+
+from app.config import get_settings
+from app.services.events import event_hub, encode
+
+settings = get_settings()
+
+router = APIRouter()
+
+@router.get("/stream")
+async def stream_events(request: Request, pipeline_id: Optional[int] = None):
+    """
+    Server-Sent Events: `status` changes and `dashboard` counter changes, or
+    with `pipeline_id` that pipeline's `checks` and `status`. A `resync`
+    event means events were dropped because the client fell behind.
+
+    Any replica relays `status` changes from the event bus; `checks` and
+    `dashboard` come only from the process running the health check worker.
+    The first `ready` event says which of them this stream carries, so
+    clients keep polling for the rest.
+    """
+    if len(event_hub.subscribers) >= settings.EVENTS_MAX_SUBSCRIBERS:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many live update clients; poll the API instead"
+        )
+
+    subscription = event_hub.subscribe(pipeline_id)
+
+    async def events():
+        try:
+            yield f"retry: {settings.EVENTS_RETRY_MS}\n\n"
+            snapshot = event_hub.dashboard_snapshot() if pipeline_id is None else None
+            ready = {"checks": event_hub.live, "dashboard": snapshot is not None}
+            yield f"event: ready\ndata: {encode(ready)}\n\n"
+            if snapshot is not None:
+                yield f"event: dashboard\ndata: {encode(snapshot)}\n\n"
+
+            reported = 0
+            while not await request.is_disconnected():
+                batch = await subscription.get(settings.EVENTS_KEEPALIVE_SECONDS)
+                if not batch:
+                    yield ": keepalive\n\n"
+                    continue
+                if subscription.dropped != reported:
+                    reported = subscription.dropped
+                    yield f"event: resync\ndata: {encode({'dropped': reported})}\n\n"
+                for event_type, data in batch:
+                    if event_type == "close":
+                        return
+                    yield f"event: {event_type}\ndata: {data}\n\n"
+        finally:
+            event_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -7,6 +7,7 @@ from datetime import datetime, timedelta
 from app.database import get_db
 from app.models import HealthCheck, Pipeline
 from app.schemas import HealthCheckResponse
+from app.services.recent_checks import recent_checks
 
 router = APIRouter()
 
@@ -24,6 +25,10 @@ async def get_pipeline_health_checks(
         raise HTTPException(status_code=404, detail="Pipeline not found")
     
     since = datetime.utcnow() - timedelta(hours=hours)
+    checks = recent_checks.latest(pipeline_id, limit, since)
+    if checks is not None:
+        return checks
+    
     stmt = (
         select(HealthCheck)
         .where(HealthCheck.pipeline_id == pipeline_id)
@@ -41,6 +46,10 @@ async def get_recent_health_checks(
     db: AsyncSession = Depends(get_db)
 ):
     """Get most recent health checks"""
+    checks = recent_checks.recent(limit)
+    if checks is not None:
+        return checks
+    
     stmt = (
         select(HealthCheck)
         .order_by(desc(HealthCheck.checked_at))
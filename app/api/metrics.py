@@ -1,78 +1,165 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, status as http_status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc
-from datetime import datetime, timedelta
+from sqlalchemy import select, desc, func
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
 from app.services.anomaly_detector import anomaly_detector
+from app.services.baselines import baseline_job
 
-from app.database import get_db
-from app.models import Pipeline, HealthCheck, HealthStatus
-from app.schemas import DashboardStats, PipelineMetrics
+from app.database import AsyncSessionLocal, get_db
+from app.models import Pipeline, HealthCheck, HealthStatus, PipelineType
+from app.schemas import DashboardStats, PipelineMetrics, PipelineSummary
 from app.services.cache import cache_service
+from app.services.dashboard_view import dashboard_view, query_dashboard, to_stats
+from app.services.rollups import latency_percentiles, window_stats
+from app.services.recent_checks import recent_checks
+from app.services.series import METHODS, pipeline_series
 
 router = APIRouter()
 
 @router.get("/dashboard", response_model=DashboardStats)
-async def get_dashboard_stats(db: AsyncSession = Depends(get_db)):
+async def get_dashboard_stats():
     """Get dashboard statistics"""
-    cache_key = "metrics:dashboard"
-    cached = await cache_service.get(cache_key)
-    if cached:
-        return cached
+    # Kept current in memory by the worker in this process
+    stats = dashboard_view.stats()
+    if stats is not None:
+        return stats
     
-    total_stmt = select(func.count(Pipeline.id))
-    total_result = await db.execute(total_stmt)
-    total_pipelines = total_result.scalar()
+    async def compute():
+        # Its own session: a background refresh may outlive this request
+        async with AsyncSessionLocal() as session:
+            return to_stats(await query_dashboard(session))
     
-    healthy_stmt = select(func.count(Pipeline.id)).where(
-        Pipeline.current_status == HealthStatus.HEALTHY
-    )
-    healthy_result = await db.execute(healthy_stmt)
-    healthy_pipelines = healthy_result.scalar()
-    
-    degraded_stmt = select(func.count(Pipeline.id)).where(
-        Pipeline.current_status == HealthStatus.DEGRADED
+    cache_key = await cache_service.tagged("metrics:dashboard", "metrics")
+    return await cache_service.get_or_set(cache_key, compute, ttl=30)
+
+async def _recent_statuses(
+        db: AsyncSession,
+        pipeline_ids: List[int],
+        limit: int,
+        since: datetime
+) -> Dict[int, List[HealthStatus]]:
+    """Newest-first statuses of the last `limit` checks since `since`, per pipeline"""
+    statuses = {}
+    missing = []
+    for pipeline_id in pipeline_ids:
+        rows = recent_checks.latest(pipeline_id, limit, since)
+        if rows is None:
+            missing.append(pipeline_id)
+        else:
+            statuses[pipeline_id] = [row["status"] for row in rows]
+    if not missing:
+        return statuses
+
+    ranked = (
+        select(
+            HealthCheck.pipeline_id,
+            HealthCheck.status,
+            func.row_number().over(
+                partition_by=HealthCheck.pipeline_id,
+                order_by=HealthCheck.checked_at.desc()
+            ).label("rank")
+        )
+        .where(HealthCheck.pipeline_id.in_(missing))
+        .where(HealthCheck.checked_at >= since)
+        .subquery()
     )
-    degraded_result = await db.execute(degraded_stmt)
-    degraded_pipelines = degraded_result.scalar()
-    
-    down_stmt = select(func.count(Pipeline.id)).where(
-        Pipeline.current_status == HealthStatus.DOWN
+    result = await db.execute(
+        select(ranked.c.pipeline_id, ranked.c.status)
+        .where(ranked.c.rank <= limit)
+        .order_by(ranked.c.pipeline_id, ranked.c.rank)
     )
-    down_result = await db.execute(down_stmt)
-    down_pipelines = down_result.scalar()
+    for pipeline_id in missing:
+        statuses[pipeline_id] = []
+    for pipeline_id, status in result.all():
+        statuses[pipeline_id].append(status)
+    return statuses
+
+@router.get("/pipelines", response_model=List[PipelineSummary])
+async def get_pipelines_metrics(
+    ids: Optional[List[int]] = Query(default=None),
+    owner_team: Optional[str] = None,
+    pipeline_type: Optional[PipelineType] = None,
+    status: Optional[HealthStatus] = None,
+    active_only: bool = False,
+    hours: int = Query(default=24, ge=1, le=24 * 365),
+    last: int = Query(default=10, ge=0, le=100),
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Uptime, latency, failure counts and the last `last` statuses of many
+    pipelines at once, selected by `ids` and/or filters. The query count
+    does not grow with the page: the pipelines, their rollup totals grouped
+    by pipeline, and a ROW_NUMBER() window over recent checks (skipped when
+    the in-memory buffer has them), the last two only for pipelines whose
+    figures are not cached.
+    """
+    stmt = select(Pipeline)
+    if ids:
+        stmt = stmt.where(Pipeline.id.in_(ids))
+    if owner_team:
+        stmt = stmt.where(Pipeline.owner_team == owner_team)
+    if pipeline_type:
+        stmt = stmt.where(Pipeline.pipeline_type == pipeline_type)
+    if status:
+        stmt = stmt.where(Pipeline.current_status == status)
+    if active_only:
+        stmt = stmt.where(Pipeline.is_active == True)
+    stmt = stmt.order_by(Pipeline.id).offset(skip).limit(limit)
+    pipelines = (await db.execute(stmt)).scalars().all()
+    if not pipelines:
+        return []
     
-    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    checks_stmt = select(func.count(HealthCheck.id)).where(
-        HealthCheck.checked_at >= today
-    )
-    checks_result = await db.execute(checks_stmt)
-    total_checks_today = checks_result.scalar()
+    # Window figures are cached per pipeline and fetched in one round trip;
+    # only the pipelines missing from the cache are queried
+    key_prefix = await cache_service.tagged(f"metrics:pipeline-window:{hours}:{last}", "metrics")
+    keys = [f"{key_prefix}:{p.id}" for p in pipelines]
+    windows = dict(zip((p.id for p in pipelines), await cache_service.get_many(keys)))
     
-    avg_stmt = select(func.avg(HealthCheck.response_time_ms)).where(
-        HealthCheck.checked_at >= today
-    )
-    avg_result = await db.execute(avg_stmt)
-    avg_response_time = avg_result.scalar() or 0.0
-    
-    stats = DashboardStats(
-        total_pipelines=total_pipelines,
-        healthy_pipelines=healthy_pipelines,
-        degraded_pipelines=degraded_pipelines,
-        down_pipelines=down_pipelines,
-        total_checks_today=total_checks_today,
-        avg_response_time=round(avg_response_time, 2)
-    )
+    missing = [pipeline_id for pipeline_id, window in windows.items() if window is None]
+    if missing:
+        since = datetime.utcnow() - timedelta(hours=hours)
+        stats = await window_stats(db, since, pipeline_ids=missing)
+        statuses = await _recent_statuses(db, missing, last, since) if last else {}
+        for pipeline_id in missing:
+            window = stats.get(pipeline_id)
+            windows[pipeline_id] = {
+                "uptime_percentage": round(window.uptime_percentage, 2) if window else 100.0,
+                "avg_response_time_ms": round(window.avg_response_time_ms, 2) if window else 0.0,
+                "total_checks": window.check_count if window else 0,
+                "failed_checks": window.failed_count if window else 0,
+                "recent_statuses": statuses.get(pipeline_id, []),
+            }
+        await cache_service.set_many(
+            {f"{key_prefix}:{pipeline_id}": windows[pipeline_id] for pipeline_id in missing}, ttl=30
+        )
     
-    await cache_service.set(cache_key, stats, ttl=30)
-    
-    return stats
+    return [
+        PipelineSummary(
+            id=p.id,
+            name=p.name,
+            description=p.description,
+            pipeline_type=p.pipeline_type,
+            current_status=p.current_status,
+            is_active=p.is_active,
+            owner_team=p.owner_team,
+            last_check_time=p.last_check_time,
+            circuit_state=p.circuit_state,
+            consecutive_failures=p.consecutive_failures,
+            **windows[p.id],
+        )
+        for p in pipelines
+    ]
 
 @router.get("/pipeline/{pipeline_id}", response_model=PipelineMetrics)
 async def get_pipeline_metrics(
     pipeline_id: int,
+    hours: int = Query(default=24, ge=1, le=24 * 365),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get pipeline metrics"""
+    """Get pipeline metrics over the last `hours` (served from rollups, so 90-day windows cost the same as 24h)"""
     pipeline_stmt = select(Pipeline).where(Pipeline.id == pipeline_id)
     pipeline_result = await db.execute(pipeline_stmt)
     pipeline = pipeline_result.scalar_one_or_none()
@@ -80,40 +167,26 @@ async def get_pipeline_metrics(
     if not pipeline:
         raise HTTPException(status_code=404, detail="Pipeline not found")
     
-    since = datetime.utcnow() - timedelta(hours=24)
-    
-    total_stmt = select(func.count(HealthCheck.id)).where(
-        HealthCheck.pipeline_id == pipeline_id,
-        HealthCheck.checked_at >= since
-    )
-    total_result = await db.execute(total_stmt)
-    total_checks = total_result.scalar()
-    
-    failed_stmt = select(func.count(HealthCheck.id)).where(
-        HealthCheck.pipeline_id == pipeline_id,
-        HealthCheck.checked_at >= since,
-        HealthCheck.status != HealthStatus.HEALTHY
-    )
-    failed_result = await db.execute(failed_stmt)
-    failed_checks = failed_result.scalar()
-    
-    avg_stmt = select(func.avg(HealthCheck.response_time_ms)).where(
-        HealthCheck.pipeline_id == pipeline_id,
-        HealthCheck.checked_at >= since
-    )
-    avg_result = await db.execute(avg_stmt)
-    avg_response_time = avg_result.scalar() or 0.0
+    since = datetime.utcnow() - timedelta(hours=hours)
     
-    uptime = ((total_checks - failed_checks) / total_checks * 100) if total_checks > 0 else 100.0
+    stats = await window_stats(db, since, pipeline_ids=[pipeline_id])
+    window = stats.get(pipeline_id)
+    total_checks = window.check_count if window else 0
+    failed_checks = window.failed_count if window else 0
+    avg_response_time = window.avg_response_time_ms if window else 0.0
+    uptime = window.uptime_percentage if window else 100.0
+    percentiles = await latency_percentiles(db, since, pipeline_ids=[pipeline_id])
     
-    recent_stmt = (
-        select(HealthCheck)
-        .where(HealthCheck.pipeline_id == pipeline_id)
-        .order_by(desc(HealthCheck.checked_at))
-        .limit(20)
-    )
-    recent_result = await db.execute(recent_stmt)
-    last_24h_checks = recent_result.scalars().all()
+    last_24h_checks = recent_checks.latest(pipeline_id, 20)
+    if last_24h_checks is None:
+        recent_stmt = (
+            select(HealthCheck)
+            .where(HealthCheck.pipeline_id == pipeline_id)
+            .order_by(desc(HealthCheck.checked_at))
+            .limit(20)
+        )
+        recent_result = await db.execute(recent_stmt)
+        last_24h_checks = recent_result.scalars().all()
     
     return PipelineMetrics(
         pipeline_id=pipeline.id,
@@ -123,12 +196,58 @@ async def get_pipeline_metrics(
         avg_response_time_ms=round(avg_response_time, 2),
         total_checks=total_checks,
         failed_checks=failed_checks,
+        latency_percentiles=percentiles.get(pipeline_id),
         last_24h_checks=last_24h_checks
     )
 
+@router.get("/latency")
+async def get_fleet_latency(
+    ids: Optional[List[int]] = Query(default=None),
+    owner_team: Optional[str] = None,
+    pipeline_type: Optional[PipelineType] = None,
+    hours: int = Query(default=24, ge=1, le=24 * 365),
+    db: AsyncSession = Depends(get_db)
+):
+    """Latency percentiles across a group of pipelines (default: the whole fleet), merged from rollup sketches"""
+    pipeline_ids = ids or None
+    if owner_team or pipeline_type:
+        stmt = select(Pipeline.id)
+        if pipeline_ids:
+            stmt = stmt.where(Pipeline.id.in_(pipeline_ids))
+        if owner_team:
+            stmt = stmt.where(Pipeline.owner_team == owner_team)
+        if pipeline_type:
+            stmt = stmt.where(Pipeline.pipeline_type == pipeline_type)
+        pipeline_ids = (await db.execute(stmt)).scalars().all()
+    
+    since = datetime.utcnow() - timedelta(hours=hours)
+    stats = (await window_stats(db, since, pipeline_ids=pipeline_ids, per_pipeline=False)).get(None)
+    percentiles = await latency_percentiles(db, since, pipeline_ids=pipeline_ids, per_pipeline=False)
+    
+    return {
+        "since": since,
+        "total_checks": stats.check_count if stats else 0,
+        "latency_count": stats.latency_count if stats else 0,
+        "avg_response_time_ms": round(stats.avg_response_time_ms, 2) if stats else 0.0,
+        "latency_percentiles": percentiles.get(None),
+    }
+
+@router.get("/anomalies")
+async def get_fleet_anomalies(
+    owner_team: Optional[str] = None,
+    pipeline_type: Optional[PipelineType] = None,
+    limit: int = Query(default=100, ge=1, le=10000),
+    db: AsyncSession = Depends(get_db)
+):
+    """Anomalous pipelines across the whole fleet, most severe first"""
+    return await anomaly_detector.scan_fleet(
+        db, owner_team=owner_team, pipeline_type=pipeline_type, limit=limit
+    )
+
 @router.get("/pipeline/{pipeline_id}/anomalies")
 async def get_pipeline_anomalies(
     pipeline_id: int,
+    hours: int = Query(default=24, ge=1, le=720),
     db: AsyncSession = Depends(get_db)
 ):
     """Get anomaly detection results for a pipeline"""
@@ -141,6 +260,7 @@ async def get_pipeline_anomalies(
         raise HTTPException(status_code=404, detail="Pipeline not found")
     
     # Detect anomalies
+    # Answered from streaming detector state, no history scan
     response_time_anomaly = await anomaly_detector.detect_response_time_anomaly(
         db, pipeline_id
     )
@@ -149,13 +269,66 @@ async def get_pipeline_anomalies(
         db, pipeline_id
     )
     
+    # Shift points for annotating the pipeline's history
+    level_shifts = await anomaly_detector.level_shifts(
+        db, pipeline_id, since=datetime.utcnow() - timedelta(hours=hours)
+    )
+    
     return {
         "pipeline_id": pipeline_id,
         "pipeline_name": pipeline.name,
         "response_time_analysis": response_time_anomaly,
         "error_rate_analysis": error_rate_anomaly,
+        "detectors": await anomaly_detector.analyze(db, pipeline_id),
+        "level_shifts": level_shifts,
         "overall_status": "anomaly_detected" if (
             response_time_anomaly["is_anomaly"] or 
             error_rate_anomaly["is_anomaly"]
         ) else "normal"
-    }
\ No newline at end of file
+    }
+
+def _naive_utc(ts: Optional[datetime]) -> Optional[datetime]:
+    if ts is None or ts.tzinfo is None:
+        return ts
+    return ts.astimezone(timezone.utc).replace(tzinfo=None)
+
+@router.get("/pipeline/{pipeline_id}/series")
+async def get_pipeline_series(
+    pipeline_id: int,
+    from_: Optional[datetime] = Query(default=None, alias="from"),
+    to: Optional[datetime] = None,
+    points: int = Query(default=500, ge=2, le=5000),
+    method: str = Query(default="minmax"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Latency and failure series over [from, to) (default: the last 24h)
+    downsampled to at most `points` samples, from rollups where they exist
+    """
+    if method not in METHODS:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"method must be one of: {', '.join(METHODS)}"
+        )
+    
+    pipeline_stmt = select(Pipeline.id).where(Pipeline.id == pipeline_id)
+    if (await db.execute(pipeline_stmt)).scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Pipeline not found")
+    
+    until = _naive_utc(to) or datetime.utcnow()
+    since = _naive_utc(from_) or until - timedelta(hours=24)
+    if since >= until:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="'from' must be before 'to'"
+        )
+    
+    return await pipeline_series(db, pipeline_id, since, until, points, method)
+
+@router.get("/pipeline/{pipeline_id}/baseline")
+async def get_pipeline_baseline(pipeline_id: int):
+    """Hour-of-week latency and error-rate profile the pipeline is scored against"""
+    profile = await baseline_job.profile(pipeline_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="No seasonal baseline built for this pipeline yet")
+    return profile
@@ -16,6 +16,7 @@ from app.database import get_db
 from app.models import Pipeline
 from app.schemas import PipelineCreate, PipelineUpdate, PipelineResponse
 from app.services.cache import cache_service
+from app.services.scheduler import check_scheduler
 
 router = APIRouter()
 
@@ -41,7 +42,13 @@ async def create_pipeline(
     await db.commit()
     await db.refresh(db_pipeline)
     
-    await cache_service.delete("pipelines:all")
+    if db_pipeline.is_active:
+        check_scheduler.add(db_pipeline)
+    
+    await cache_service.invalidate("pipelines", "metrics")
+    await cache_service.events.publish("pipeline", {
+        "pipeline_id": db_pipeline.id, "action": "created", "status": db_pipeline.current_status
+    })
     
     return db_pipeline
 
@@ -53,9 +60,9 @@ async def list_pipelines(
     db: AsyncSession = Depends(get_db)
 ):
     """List all pipelines"""
-    cache_key = f"pipelines:list:{skip}:{limit}:{active_only}"
+    cache_key = await cache_service.tagged(f"pipelines:list:{skip}:{limit}:{active_only}", "pipelines")
     cached = await cache_service.get(cache_key)
-    if cached:
+    if cached is not None:
         return cached
     
     stmt = select(Pipeline)
@@ -77,9 +84,9 @@ async def get_pipeline(
     db: AsyncSession = Depends(get_db)
 ):
     """Get pipeline by ID"""
-    cache_key = f"pipeline:{pipeline_id}"
+    cache_key = await cache_service.tagged(f"pipeline:{pipeline_id}", f"pipeline:{pipeline_id}")
     cached = await cache_service.get(cache_key)
-    if cached:
+    if cached is not None:
         return cached
     
     stmt = select(Pipeline).where(Pipeline.id == pipeline_id)
@@ -122,8 +129,13 @@ async def update_pipeline(
     await db.commit()
     await db.refresh(pipeline)
     
-    await cache_service.delete(f"pipeline:{pipeline_id}")
-    await cache_service.delete("pipelines:all")
+    if pipeline.is_active:
+        check_scheduler.add(pipeline)
+    else:
+        check_scheduler.remove(pipeline_id)
+    
+    await cache_service.invalidate("pipelines", f"pipeline:{pipeline_id}", "metrics")
+    await cache_service.events.publish("pipeline", {"pipeline_id": pipeline_id, "action": "updated"})
     
     return pipeline
 
@@ -146,5 +158,7 @@ async def delete_pipeline(
     await db.delete(pipeline)
     await db.commit()
     
-    await cache_service.delete(f"pipeline:{pipeline_id}")
-    await cache_service.delete("pipelines:all")
\ No newline at end of file
+    check_scheduler.remove(pipeline_id)
+    
+    await cache_service.invalidate("pipelines", f"pipeline:{pipeline_id}", "metrics")
+    await cache_service.events.publish("pipeline", {"pipeline_id": pipeline_id, "action": "deleted"})
\ No newline at end of file
@@ -0,0 +1,103 @@
+"""
+Maintenance commands.
+
+    python -m app.cli backfill-rollups [--since 2026-01-01] [--until 2026-01-31]
+    python -m app.cli retention
+    python -m app.cli build-baselines
+    python -m app.cli backtest [--pipelines 1,2,3] [--since 2026-01-01] [--z-thresholds 2,2.5,3]
+"""
+import argparse
+import asyncio
+import json
+from datetime import datetime
+
+from app.database import init_db
+from app.services import rollups
+from app.services.backtest import Backtest
+from app.services.baselines import baseline_job
+from app.services.retention import retention_job
+
+
+async def _backfill_rollups(args):
+    await init_db()
+    since = datetime.fromisoformat(args.since) if args.since else None
+    until = datetime.fromisoformat(args.until) if args.until else None
+    processed = await rollups.backfill(since=since, until=until, chunk_size=args.chunk_size)
+    print(f"Backfilled rollups from {processed} health checks")
+
+
+async def _retention(args):
+    await init_db()
+    await retention_job.run_once()
+
+
+async def _build_baselines(args):
+    await init_db()
+    await baseline_job.run_once()
+
+
+def _floats(value: str):
+    return [float(item) for item in value.split(",")]
+
+
+async def _backtest(args):
+    backtest = Backtest(
+        pipeline_ids=[int(item) for item in args.pipelines.split(",")] if args.pipelines else None,
+        since=datetime.fromisoformat(args.since) if args.since else None,
+        until=datetime.fromisoformat(args.until) if args.until else None,
+        z_thresholds=args.z_thresholds,
+        error_rate_thresholds=args.error_thresholds,
+        seasonal=args.seasonal,
+        min_incident_checks=args.min_incident_checks,
+    )
+    report = await backtest.run()
+    print(json.dumps(report, indent=2, default=str))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="DataPulse maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backfill = commands.add_parser(
+        "backfill-rollups",
+        help="rebuild 1m/1h/1d rollups from raw health checks between --since and --until "
+             "(default: every full day of raw checks still stored, up to the start of today, UTC); "
+             "rollups of days with no raw checks left are never touched"
+    )
+    backfill.add_argument("--since", help="ISO date or datetime, UTC")
+    backfill.add_argument("--until", help="ISO date or datetime, UTC")
+    backfill.add_argument("--chunk-size", type=int, default=5000)
+    backfill.set_defaults(handler=_backfill_rollups)
+
+    retention = commands.add_parser(
+        "retention",
+        help="run one retention pass now (expire raw checks and rollups past their retention)"
+    )
+    retention.set_defaults(handler=_retention)
+
+    baselines = commands.add_parser(
+        "build-baselines",
+        help="rebuild hour-of-week anomaly baselines from the last ANOMALY_BASELINE_DAYS of checks"
+    )
+    baselines.set_defaults(handler=_build_baselines)
+
+    backtest = commands.add_parser(
+        "backtest",
+        help="replay stored health checks through the anomaly detectors and report flag rates, "
+             "alert counts and outage detection latency per threshold"
+    )
+    backtest.add_argument("--pipelines", help="comma-separated pipeline ids (default: all)")
+    backtest.add_argument("--since", help="ISO date or datetime, UTC")
+    backtest.add_argument("--until", help="ISO date or datetime, UTC")
+    backtest.add_argument("--z-thresholds", type=_floats, default=[2.0, 2.5, 3.0, 3.5, 4.0])
+    backtest.add_argument("--error-thresholds", type=_floats, default=[10.0, 20.0, 30.0])
+    backtest.add_argument("--seasonal", action="store_true", help="score against the current seasonal baselines")
+    backtest.add_argument("--min-incident-checks", type=int, default=2)
+    backtest.set_defaults(handler=_backtest)
+
+    args = parser.parse_args()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
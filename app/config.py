@@ -16,6 +16,80 @@ class Settings(BaseSettings):
     HEALTH_CHECK_INTERVAL: int = 60  # seconds
     HEALTH_CHECK_TIMEOUT: int = 10   # seconds
     MAX_CONCURRENT_CHECKS: int = 50
+    SCHEDULER_JITTER: float = 0.1    # +/- fraction of each pipeline's interval
+    
+    # Circuit Breaker
+    CIRCUIT_FAILURE_THRESHOLD: int = 3   # consecutive DOWN checks before backing off
+    CIRCUIT_MAX_INTERVAL: int = 900      # seconds, cap on the backed-off interval
+    CIRCUIT_PROBE_TIMEOUT: int = 3       # seconds, timeout for half-open probes
+    CIRCUIT_CONFIRM_CHECKS: int = 2      # fast checks after a status change
+    CIRCUIT_CONFIRM_INTERVAL: int = 10   # seconds between confirmation checks
+    
+    # Health Check HTTP Client
+    HEALTH_CHECK_HTTP2: bool = False  # requires the 'h2' package
+    MAX_CONNECTIONS_PER_HOST: int = 10
+    HTTP_KEEPALIVE_EXPIRY: float = 90.0  # seconds
+    DNS_CACHE_TTL_SECONDS: int = 300
+    
+    # Health Check Result Writes
+    RESULT_BATCH_SIZE: int = 1000
+    RESULT_FLUSH_INTERVAL: float = 1.0  # seconds
+    RESULT_BUFFER_SIZE: int = 20000
+    RESULT_FLUSH_RETRIES: int = 3
+    
+    # Recent Checks (in-memory, per pipeline)
+    RECENT_CHECKS_PER_PIPELINE: int = 100
+    RECENT_CHECKS_WARM_HOURS: int = 24   # history loaded from the database at worker start
+    
+    # Dashboard (in-memory view, worker process)
+    DASHBOARD_RECONCILE_INTERVAL: int = 60  # seconds between rebuilds from the database
+    
+    # Live Updates (Server-Sent Events, worker process)
+    EVENTS_CLIENT_QUEUE_SIZE: int = 256   # pending events per client; the oldest go first
+    EVENTS_MAX_SUBSCRIBERS: int = 1000    # further clients are told to poll
+    EVENTS_KEEPALIVE_SECONDS: int = 15
+    EVENTS_RETRY_MS: int = 5000           # client reconnect delay after a dropped stream
+    
+    # Worker Coordination
+    LEADER_LEASE_TTL: int = 15          # seconds before a dead leader's lease expires
+    LEADER_HEARTBEAT_INTERVAL: int = 5  # seconds between lease renewals/polls
+    SCHEDULER_RESYNC_INTERVAL: int = 60  # seconds between pipeline config resyncs
+    EMBEDDED_WORKER: bool = True         # False when checks run via `python -m app.worker`
+    WORKER_HEARTBEAT_INTERVAL: int = 5
+    WORKER_MEMBER_TTL: int = 15          # seconds before a silent worker is dropped from the ring
+    
+    # Retention
+    RAW_RETENTION_DAYS: int = 7
+    ROLLUP_1M_RETENTION_DAYS: int = 7
+    ROLLUP_1H_RETENTION_DAYS: int = 90
+    ROLLUP_1D_RETENTION_DAYS: int = 365
+    RETENTION_INTERVAL: int = 3600       # seconds between retention runs
+    RETENTION_DELETE_BATCH: int = 5000   # rows per DELETE transaction
+    RETENTION_BATCH_PAUSE: float = 0.2   # seconds between DELETE batches, leaves the writer room
+    PARTITIONS_AHEAD_DAYS: int = 3       # Postgres: daily health_checks partitions created in advance
+    
+    # Anomaly Detection
+    ANOMALY_Z_THRESHOLD: float = 2.5
+    ANOMALY_MIN_SAMPLES: int = 10
+    ANOMALY_EWMA_SPAN: int = 100              # checks; EWMA alpha = 2 / (span + 1)
+    ANOMALY_ERROR_RATE_THRESHOLD: float = 20.0  # percent
+    ANOMALY_ERROR_BUCKET_SECONDS: int = 3600
+    ANOMALY_ERROR_WINDOW_BUCKETS: int = 24    # sliding error window = buckets x bucket seconds
+    ANOMALY_STATE_PERSIST_INTERVAL: int = 60  # seconds between detector state snapshots
+    ANOMALY_ALERTS: bool = True               # alert as soon as a check turns anomalous
+    ANOMALY_FLEET_RECENT_MINUTES: int = 15    # fleet scan: window scored against the day's baseline
+    ANOMALY_CUSUM_WARMUP: int = 30            # checks that set the latency reference after a start/shift
+    ANOMALY_CUSUM_DRIFT: float = 0.5          # std devs of slack per check; larger ignores smaller shifts
+    ANOMALY_CUSUM_THRESHOLD: float = 8.0      # std devs of accumulated drift that make a shift
+    ANOMALY_PH_DELTA: float = 0.05            # failure-rate change tolerated by Page-Hinkley
+    ANOMALY_PH_THRESHOLD: float = 5.0         # excess failures that make an error-rate shift
+    
+    # Seasonal Baselines (hour-of-week)
+    ANOMALY_BASELINE_DAYS: int = 7            # history per build; at most RAW_RETENTION_DAYS, older checks are gone
+    ANOMALY_BASELINE_INTERVAL: int = 21600    # seconds between rebuilds
+    ANOMALY_BASELINE_MIN_SAMPLES: int = 10    # checks a slot needs before it replaces the streaming baseline
+    ANOMALY_BASELINE_BATCH: int = 500         # pipelines per streamed query
+    ANOMALY_BASELINE_CHUNK: int = 10000       # rows fetched per cursor round trip
     
     # Alerts
     SLACK_WEBHOOK_URL: str = ""
@@ -24,9 +98,28 @@ class Settings(BaseSettings):
     SMTP_PORT: int = 587
     SMTP_USER: str = ""
     SMTP_PASSWORD: str = ""
+    ALERT_QUEUE_SIZE: int = 1000          # alerts waiting for delivery; more are dropped
+    ALERT_DISPATCHERS: int = 4
+    ALERT_RATE_PER_SECOND: float = 1.0    # per channel; Slack webhooks allow about one message a second
+    ALERT_BURST: int = 5
+    ALERT_MAX_ATTEMPTS: int = 5
+    ALERT_RETRY_BASE_SECONDS: float = 1.0 # doubled after every failed attempt
+    ALERT_RETRY_MAX_SECONDS: float = 60.0
+    ALERT_DEDUPE_SECONDS: int = 900       # repeats of a pipeline's status or anomaly alert within this are suppressed
+    ALERT_HTTP_TIMEOUT: float = 10.0
+    ALERT_DRAIN_SECONDS: float = 10.0     # delivery time queued alerts get when the worker stops
+    ALERT_CORRELATION_WINDOW_SECONDS: float = 30.0  # status alerts wait this long to be grouped into outage digests; 0 disables
+    ALERT_CORRELATION_MAX_GROUPS: int = 500         # open outage groups; alerts beyond this go out on their own
+    ALERT_CORRELATION_IDLE_WINDOWS: int = 120       # windows without a join or recovery before a group is forgotten
     
     # Cache TTL
     CACHE_TTL_SECONDS: int = 300
+    CACHE_L1_TTL_SECONDS: int = 10       # in-process copies while pub/sub is down; bounds staleness across replicas
+    CACHE_L1_MAX_ENTRIES: int = 10000
+    CACHE_STALE_SECONDS: int = 30        # expired values served while one refresh runs
+    CACHE_EVENTS_CHANNEL: str = "datapulse:events"  # pub/sub channel for invalidations and pipeline events
+    CACHE_CODEC: str = "json"            # "json" (orjson when installed) or "msgpack" (requires 'msgpack')
+    CACHE_COMPRESS_MIN_BYTES: int = 1024 # larger values are compressed (zstd with 'zstandard', else zlib)
     
     class Config:
         env_file = ".env"
@@ -1,3 +1,4 @@
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from app.config import get_settings
@@ -28,6 +29,59 @@ async def get_db():
         finally:
             await session.close()
 
+# Columns added after a table first shipped: (table, column, value for the
+# rows already there). create_all never alters an existing table, so
+# init_db adds whichever of these a database is missing.
+ADDED_COLUMNS = [
+    ("health_checks", "connect_time_ms", None),
+    ("pipelines", "circuit_state", "CLOSED"),
+    ("pipelines", "consecutive_failures", 0),
+    # Buckets rolled up before this have no sketch; `backfill-rollups` rebuilds those raw checks still cover
+    ("health_check_rollups", "latency_sketch", None),
+    ("alerts", "dedupe_key", None),
+    ("alerts", "channel", None),
+    ("alerts", "delivery_status", None),
+    ("alerts", "attempts", 0),
+    ("alerts", "last_error", None),
+    ("alerts", "sent_at", None),
+]
+
+# Columns the models no longer have: (table, column), dropped when present
+DROPPED_COLUMNS = [
+    ("health_check_rollups", "latency_histogram"),
+]
+
+def upgrade_schema(conn, metadata):
+    """Bring tables created by an older release up to the current models"""
+    inspector = inspect(conn)
+    tables = set(inspector.get_table_names())
+    existing = {name: {column["name"] for column in inspector.get_columns(name)} for name in tables}
+    preparer = conn.dialect.identifier_preparer
+
+    for table_name, column_name, value in ADDED_COLUMNS:
+        if table_name not in tables or column_name in existing[table_name]:
+            continue
+        table = metadata.tables[table_name]
+        column = table.c[column_name]
+        if hasattr(column.type, "create"):
+            # Named types (postgres enums) exist apart from the table
+            column.type.create(conn, checkfirst=True)
+        conn.execute(text(
+            f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} "
+            f"{column.type.compile(dialect=conn.dialect)}"
+        ))
+        if value is not None:
+            conn.execute(table.update().values({column_name: value}))
+        for index in table.indexes:
+            if column_name in index.columns:
+                index.create(conn, checkfirst=True)
+        print(f"  added {table_name}.{column_name}")
+
+    for table_name, column_name in DROPPED_COLUMNS:
+        if table_name in tables and column_name in existing[table_name]:
+            conn.execute(text(f"ALTER TABLE {preparer.quote(table_name)} DROP COLUMN {preparer.quote(column_name)}"))
+            print(f"  dropped {table_name}.{column_name}")
+
 async def init_db():
     """Initialize database - create all tables"""
     from app.models import Base
@@ -36,6 +90,15 @@ async def init_db():
         # await conn.run_sync(Base.metadata.drop_all)
         
         # Create all tables
-        await conn.run_sync(Base.metadata.create_all)
+        if conn.dialect.name == "postgresql":
+            # health_checks is partitioned by day, which create_all can't express
+            from app.services.retention import create_partitioned_health_checks
+            tables = [table for table in Base.metadata.sorted_tables if table.name != "health_checks"]
+            await conn.run_sync(Base.metadata.create_all, tables=tables)
+            await create_partitioned_health_checks(conn)
+        else:
+            await conn.run_sync(Base.metadata.create_all)
+
+        await conn.run_sync(upgrade_schema, Base.metadata)
     
     print("Database initialized successfully!")
\ No newline at end of file
@@ -7,14 +7,22 @@ import asyncio
 
 from app.config import get_settings
 from app.database import init_db
-from app.api import pipelines, health_checks, metrics
+from app.api import pipelines, health_checks, metrics, admin, events
 from app.services.health_checker import HealthCheckWorker
 from app.services.cache import cache_service
+from app.services.leader import leader_elector
+from app.services.recent_checks import recent_checks
+from app.services.dashboard_view import dashboard_view
+from app.services.events import event_hub
+from app.services.retention import retention_job, retention_elector
+from app.services.baselines import baseline_job, baseline_elector
 
 settings = get_settings()
 
-# Background task reference
+# Background task references
 health_check_task = None
+retention_task = None
+baseline_task = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -27,10 +35,22 @@ async def lifespan(app: FastAPI):
     # Connect to Redis (gracefully fails if unavailable)
     await cache_service.connect()
     
-    # Start background health checker
+    # Stream status changes found by workers in any process (this one's come straight from its sink)
+    cache_service.events.subscribe("status", event_hub.relay, remote_only=True)
+    
+    # Start background health checker (only runs while this process is leader)
     global health_check_task
-    worker = HealthCheckWorker()
-    health_check_task = asyncio.create_task(worker.run())
+    if settings.EMBEDDED_WORKER:
+        worker = HealthCheckWorker(recent=recent_checks, dashboard=dashboard_view, events=event_hub)
+        health_check_task = asyncio.create_task(leader_elector.run(worker.run))
+    
+    # Expire old checks and rollups (one API process at a time)
+    global retention_task
+    retention_task = asyncio.create_task(retention_elector.run(retention_job.run))
+    
+    # Rebuild seasonal anomaly baselines (one API process at a time)
+    global baseline_task
+    baseline_task = asyncio.create_task(baseline_elector.run(baseline_job.run))
     
     print("DataPulse started successfully!")
     print(f"Visit: http://localhost:8000")
@@ -39,12 +59,15 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     print("Shutting down...")
-    if health_check_task:
-        health_check_task.cancel()
-        try:
-            await health_check_task
-        except asyncio.CancelledError:
-            pass
+    for task in (health_check_task, retention_task, baseline_task):
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    cache_service.events.unsubscribe("status", event_hub.relay)
+    await cache_service.close()
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -63,6 +86,8 @@ templates = Jinja2Templates(directory="app/templates")
 app.include_router(pipelines.router, prefix="/api/pipelines", tags=["Pipelines"])
 app.include_router(health_checks.router, prefix="/api/health-checks", tags=["Health Checks"])
 app.include_router(metrics.router, prefix="/api/metrics", tags=["Metrics"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
+app.include_router(events.router, prefix="/api/events", tags=["Events"])
 
 # Web routes
 @app.get("/", response_class=HTMLResponse)
@@ -80,7 +105,11 @@ async def pipeline_detail(request: Request, pipeline_id: int):
 async def health():
     return {
         "status": "healthy",
-        "redis": cache_service.redis_available
+        "redis": cache_service.redis_available,
+        "health_checker": (
+            ("leader" if leader_elector.is_leader else "standby")
+            if settings.EMBEDDED_WORKER else "external"
+        )
     }
 
 @app.get("/health")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, Enum, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, Enum, ForeignKey, Text, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -17,6 +17,11 @@ class HealthStatus(str, enum.Enum):
     DOWN = "down"
     UNKNOWN = "unknown"
 
+class CircuitState(str, enum.Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
 class Pipeline(Base):
     __tablename__ = "pipelines"
     
@@ -38,6 +43,8 @@ class Pipeline(Base):
     is_active = Column(Boolean, default=True)
     current_status = Column(Enum(HealthStatus), default=HealthStatus.UNKNOWN)
     last_check_time = Column(DateTime)
+    circuit_state = Column(Enum(CircuitState), default=CircuitState.CLOSED)
+    consecutive_failures = Column(Integer, default=0)
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -46,9 +53,16 @@ class Pipeline(Base):
     # Relationships
     health_checks = relationship("HealthCheck", back_populates="pipeline", cascade="all, delete-orphan")
     alerts = relationship("Alert", back_populates="pipeline", cascade="all, delete-orphan")
+    rollups = relationship("HealthCheckRollup", cascade="all, delete-orphan")
+    anomaly_state = relationship("AnomalyState", uselist=False, cascade="all, delete-orphan")
+    level_shifts = relationship("LevelShift", cascade="all, delete-orphan")
+    seasonal_baseline = relationship("SeasonalBaseline", uselist=False, cascade="all, delete-orphan")
 
 class HealthCheck(Base):
     __tablename__ = "health_checks"
+    __table_args__ = (
+        Index("ix_health_checks_pipeline_checked_at", "pipeline_id", "checked_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     pipeline_id = Column(Integer, ForeignKey("pipelines.id"), nullable=False, index=True)
@@ -56,6 +70,7 @@ class HealthCheck(Base):
     # Check results
     status = Column(Enum(HealthStatus), nullable=False)
     response_time_ms = Column(Float)
+    connect_time_ms = Column(Float)  # TCP/TLS setup, excluded from response_time_ms
     status_code = Column(Integer)
     error_message = Column(Text)
     
@@ -70,6 +85,59 @@ class HealthCheck(Base):
     # Relationships
     pipeline = relationship("Pipeline", back_populates="health_checks")
 
+class HealthCheckRollup(Base):
+    __tablename__ = "health_check_rollups"
+    __table_args__ = (
+        Index("ix_health_check_rollups_resolution_bucket", "resolution", "bucket_start"),
+    )
+    
+    pipeline_id = Column(Integer, ForeignKey("pipelines.id"), primary_key=True)
+    resolution = Column(String(4), primary_key=True)  # 1m, 1h, 1d
+    bucket_start = Column(DateTime, primary_key=True)
+    
+    check_count = Column(Integer, nullable=False, default=0)
+    failed_count = Column(Integer, nullable=False, default=0)
+    
+    # Latency moments over checks that have a response time
+    latency_count = Column(Integer, nullable=False, default=0)
+    latency_sum = Column(Float, default=0.0)
+    latency_sum_sq = Column(Float, default=0.0)
+    latency_min = Column(Float)
+    latency_max = Column(Float)
+    latency_sketch = Column(LargeBinary)  # quantile sketch, see sketches.LatencySketch
+
+class AnomalyState(Base):
+    __tablename__ = "anomaly_states"
+    
+    pipeline_id = Column(Integer, ForeignKey("pipelines.id"), primary_key=True)
+    state = Column(Text, nullable=False)  # JSON per detector, see anomaly_detector.Detector
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class SeasonalBaseline(Base):
+    __tablename__ = "seasonal_baselines"
+    
+    pipeline_id = Column(Integer, ForeignKey("pipelines.id"), primary_key=True)
+    profile = Column(LargeBinary, nullable=False)  # float32 (4, 168), see baselines.build_profile
+    history_since = Column(DateTime)
+    built_at = Column(DateTime, default=datetime.utcnow)
+
+class LevelShift(Base):
+    __tablename__ = "level_shifts"
+    __table_args__ = (
+        Index("ix_level_shifts_pipeline_changed_at", "pipeline_id", "changed_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    pipeline_id = Column(Integer, ForeignKey("pipelines.id"), nullable=False)
+    
+    metric = Column(String(20), nullable=False)   # response_time, error_rate
+    direction = Column(String(4), nullable=False)  # up, down
+    before_value = Column(Float)  # ms for response_time, percent for error_rate
+    after_value = Column(Float)
+    
+    changed_at = Column(DateTime, nullable=False)  # estimated onset
+    detected_at = Column(DateTime, nullable=False)
+
 class Alert(Base):
     __tablename__ = "alerts"
     
@@ -81,9 +149,33 @@ class Alert(Base):
     message = Column(Text, nullable=False)
     is_resolved = Column(Boolean, default=False)
     
+    # Delivery
+    dedupe_key = Column(String(255), index=True)  # "{pipeline_id}:status:down", "{pipeline_id}:anomaly:error_rate"
+    channel = Column(String(20))  # slack; empty when no channel is configured
+    delivery_status = Column(String(20), default="pending")  # pending, sent, failed, suppressed, skipped
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text)
+    sent_at = Column(DateTime)
+    
     # Timestamps
     triggered_at = Column(DateTime, default=datetime.utcnow, index=True)
     resolved_at = Column(DateTime)
     
     # Relationships
-    pipeline = relationship("Pipeline", back_populates="alerts")
\ No newline at end of file
+    pipeline = relationship("Pipeline", back_populates="alerts")
+
+class WorkerLease(Base):
+    __tablename__ = "worker_leases"
+    
+    name = Column(String(100), primary_key=True)
+    holder = Column(String(255), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+class WorkerMember(Base):
+    __tablename__ = "worker_members"
+    
+    worker_id = Column(String(255), primary_key=True)
+    hostname = Column(String(255))
+    pid = Column(Integer)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    heartbeat_at = Column(DateTime, nullable=False, index=True)
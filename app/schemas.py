@@ -14,6 +14,11 @@ class HealthStatus(str, Enum):
     DOWN = "down"
     UNKNOWN = "unknown"
 
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
 # Pipeline Schemas
 class PipelineCreate(BaseModel):
     name: str = Field(..., min_length=1, max_length=255)
@@ -77,6 +82,8 @@ class PipelineResponse(BaseModel):
     is_active: bool
     owner_team: Optional[str]
     last_check_time: Optional[datetime]
+    circuit_state: Optional[CircuitState] = CircuitState.CLOSED
+    consecutive_failures: Optional[int] = 0
     created_at: datetime
     
     class Config:
@@ -88,6 +95,7 @@ class HealthCheckResponse(BaseModel):
     pipeline_id: int
     status: HealthStatus
     response_time_ms: Optional[float]
+    connect_time_ms: Optional[float] = None
     status_code: Optional[int]
     error_message: Optional[str]
     checked_at: datetime
@@ -96,6 +104,12 @@ class HealthCheckResponse(BaseModel):
         from_attributes = True
 
 # Metrics Schemas
+class LatencyPercentiles(BaseModel):
+    p50: float
+    p90: float
+    p95: float
+    p99: float
+
 class PipelineMetrics(BaseModel):
     pipeline_id: int
     pipeline_name: str
@@ -104,12 +118,40 @@ class PipelineMetrics(BaseModel):
     avg_response_time_ms: float
     total_checks: int
     failed_checks: int
+    latency_percentiles: Optional[LatencyPercentiles] = None
     last_24h_checks: List[HealthCheckResponse]
 
+class PipelineSummary(BaseModel):
+    id: int
+    name: str
+    description: Optional[str]
+    pipeline_type: PipelineType
+    current_status: HealthStatus
+    is_active: bool
+    owner_team: Optional[str]
+    last_check_time: Optional[datetime]
+    circuit_state: Optional[CircuitState] = CircuitState.CLOSED
+    consecutive_failures: Optional[int] = 0
+    uptime_percentage: float
+    avg_response_time_ms: float
+    total_checks: int
+    failed_checks: int
+    recent_statuses: List[HealthStatus]  # newest first
+
 class DashboardStats(BaseModel):
     total_pipelines: int
     healthy_pipelines: int
     degraded_pipelines: int
     down_pipelines: int
     total_checks_today: int
-    avg_response_time: float
\ No newline at end of file
+    avg_response_time: float
+
+# Backtest Schemas
+class BacktestRequest(BaseModel):
+    pipeline_ids: Optional[List[int]] = None  # default: every pipeline
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    z_thresholds: List[float] = Field(default=[2.0, 2.5, 3.0, 3.5, 4.0], min_length=1, max_length=50)
+    error_rate_thresholds: List[float] = Field(default=[10.0, 20.0, 30.0], min_length=1, max_length=50)
+    seasonal: bool = False  # score against the current seasonal baselines
+    min_incident_checks: int = Field(default=2, ge=1)
@@ -1,17 +1,144 @@
+"""
+Alert notifications, queued and delivered off the health check path
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, Tuple
+
 import httpx
-from app.models import Pipeline, HealthCheck
+from sqlalchemy import insert, update
+
+from app.database import AsyncSessionLocal
+from app.models import Alert, Pipeline, HealthCheck, HealthStatus
 from app.config import get_settings
+from app.services.correlation import OutageCorrelator
 
 settings = get_settings()
 
+_SEVERITY = {HealthStatus.DOWN: "critical", HealthStatus.DEGRADED: "warning"}
+
+
+class TokenBucket:
+    """`rate` sends per second on average, in bursts of up to `burst`"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        # Waiters take tokens in arrival order
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Hold every sender back `seconds` (the channel asked us to slow down)"""
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+def _retry_after(response: httpx.Response) -> float:
+    try:
+        return float(response.headers.get("retry-after", 1))
+    except ValueError:
+        return 1.0
+
+
 class AlertService:
-    async def send_alert(self, pipeline: Pipeline, health_check: HealthCheck):
-        """Send alert notification"""
-        message = self._format_message(pipeline, health_check)
-        
-        if settings.SLACK_WEBHOOK_URL:
-            await self._send_slack(message)
-    
+    """
+    `send_alert()` and `send_anomaly_alert()` only format the message and
+    put it on a bounded queue, so a slow or failing webhook never holds up
+    a check. Status alerts first pass through an OutageCorrelator, which
+    folds pipelines failing together into one digest. ALERT_DISPATCHERS
+    tasks deliver the queue through one shared HTTP client, each channel
+    limited by a token bucket, retrying failures with exponential backoff.
+
+    An alert repeating a pipeline's status or anomaly within
+    ALERT_DEDUPE_SECONDS is suppressed. Every alert is recorded in the
+    alerts table with its delivery state: pending, sent, failed,
+    suppressed, or skipped when no channel is configured.
+    """
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=settings.ALERT_QUEUE_SIZE)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._tasks = []
+        self._buckets = {"slack": TokenBucket(settings.ALERT_RATE_PER_SECOND, settings.ALERT_BURST)}
+        # dedupe key -> when it was last let through (monotonic clock), oldest first
+        self._last_queued: "OrderedDict[str, float]" = OrderedDict()
+        self.correlator = OutageCorrelator(self._put)
+        self.counters = {"queued": 0, "sent": 0, "failed": 0, "suppressed": 0, "skipped": 0, "dropped": 0}
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._client = httpx.AsyncClient(timeout=settings.ALERT_HTTP_TIMEOUT)
+        self._tasks = [asyncio.create_task(self._dispatch()) for _ in range(settings.ALERT_DISPATCHERS)]
+
+    async def stop(self):
+        """Deliver what is queued (for up to ALERT_DRAIN_SECONDS), then stop the dispatchers"""
+        if not self._tasks:
+            return
+        self.correlator.flush_all()
+        try:
+            await asyncio.wait_for(self._queue.join(), settings.ALERT_DRAIN_SECONDS)
+        except asyncio.TimeoutError:
+            print(f"Abandoning {self._queue.qsize()} undelivered alerts")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while not self._queue.empty():
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self.counters["dropped"] += 1
+        await self._client.aclose()
+        self._client = None
+
+    def send_alert(self, pipeline: Pipeline, health_check: HealthCheck):
+        """Queue a notification for a pipeline that just turned unhealthy, possibly as part of an outage digest"""
+        alert = self._alert(
+            pipeline,
+            _SEVERITY.get(health_check.status, "warning"),
+            f"status:{health_check.status.value}",
+            self._format_message(pipeline, health_check)
+        )
+        if alert["suppressed"] or not self.correlator.add(pipeline, health_check, alert):
+            self._put(alert)
+
+    def send_anomaly_alert(self, pipeline: Pipeline, metric: str, analysis: dict):
+        """Queue a notification for a pipeline that just turned anomalous"""
+        if metric == "response_time":
+            detail = (f"Response time {analysis['current_value']}ms vs mean {analysis['mean']}ms "
+                      f"(z={analysis['z_score']})")
+        elif metric.endswith("_shift"):
+            unit = "ms" if analysis["metric"] == "response_time" else "%"
+            detail = (f"{analysis['metric'].replace('_', ' ').capitalize()} shifted "
+                      f"{analysis['direction']} from {analysis['before_value']}{unit} to "
+                      f"{analysis['after_value']}{unit} "
+                      f"since {analysis['changed_at'].strftime('%Y-%m-%d %H:%M:%S')}")
+        else:
+            detail = (f"Error rate {analysis['error_rate']}% "
+                      f"({analysis['failed_checks']}/{analysis['total_checks']} checks)")
+        message = f"📈 Pipeline Anomaly: {pipeline.name}\n{detail}"
+
+        self._put(self._alert(pipeline, "info", f"anomaly:{metric}", message))
+
+    def resolve(self, pipeline_id: int):
+        """Queue marking a recovered pipeline's open status alerts resolved"""
+        self.correlator.recovered(pipeline_id)
+        self._put({"resolve": pipeline_id, "resolved_at": datetime.utcnow()})
+
     def _format_message(self, pipeline: Pipeline, health_check: HealthCheck) -> str:
         """Format alert message"""
         return f"""
@@ -20,16 +147,159 @@ Status: {health_check.status.value.upper()}
 Error: {health_check.error_message or 'N/A'}
 Time: {health_check.checked_at.strftime('%Y-%m-%d %H:%M:%S')}
         """.strip()
-    
-    async def _send_slack(self, message: str):
-        """Send to Slack"""
+
+    def _alert(self, pipeline: Pipeline, severity: str, kind: str, message: str) -> dict:
+        dedupe_key = f"{pipeline.id}:{kind}"
+        now = time.monotonic()
+        # Keys past the dedupe window can't suppress anything any more
+        while self._last_queued and next(iter(self._last_queued.values())) <= now - settings.ALERT_DEDUPE_SECONDS:
+            self._last_queued.popitem(last=False)
+        suppressed = dedupe_key in self._last_queued
+        if not suppressed:
+            self._last_queued[dedupe_key] = now
+        return {
+            "pipeline_id": pipeline.id,
+            "name": pipeline.name,
+            # (pipeline id, dedupe key, already resolved) of each alerts row; a digest has one per pipeline
+            "rows": [(pipeline.id, dedupe_key, False)],
+            "severity": severity,
+            "message": message,
+            "suppressed": suppressed,
+            "triggered_at": datetime.utcnow(),
+        }
+
+    def _put(self, item: dict):
         try:
-            async with httpx.AsyncClient() as client:
-                await client.post(
-                    settings.SLACK_WEBHOOK_URL,
-                    json={"text": message}
+            self._queue.put_nowait(item)
+            self.counters["queued"] += 1
+        except asyncio.QueueFull:
+            self.counters["dropped"] += 1
+            label = item["message"].splitlines()[0] if "message" in item else f"resolve pipeline {item['resolve']}"
+            print(f"Alert queue full, dropping: {label}")
+
+    async def _dispatch(self):
+        while True:
+            item = await self._queue.get()
+            try:
+                if "resolve" in item:
+                    await self._resolve(item["resolve"], item["resolved_at"])
+                else:
+                    await self._deliver(item)
+            except Exception as e:
+                print(f"Alert dispatch failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, alert: dict):
+        channel = "slack" if settings.SLACK_WEBHOOK_URL else None
+        if alert["suppressed"]:
+            state = "suppressed"
+        elif channel is None:
+            state = "skipped"
+        else:
+            state = "pending"
+
+        alert_ids = await self._record(alert, channel, state)
+        if state != "pending":
+            self.counters[state] += 1
+            return
+
+        attempts, error = await self._send_with_retry(channel, alert["message"])
+        state = "sent" if error is None else "failed"
+        self.counters[state] += 1
+        if error is not None:
+            print(f"Alert '{alert['message'].splitlines()[0]}' failed after {attempts} attempts: {error}")
+        if alert_ids:
+            await self._update(alert_ids, {
+                "delivery_status": state,
+                "attempts": attempts,
+                "last_error": error,
+                "sent_at": datetime.utcnow() if error is None else None,
+            })
+
+    async def _send_with_retry(self, channel: str, message: str) -> Tuple[int, Optional[str]]:
+        """(attempts made, last error or None once delivered)"""
+        bucket = self._buckets[channel]
+        error = None
+        for attempt in range(1, settings.ALERT_MAX_ATTEMPTS + 1):
+            await bucket.acquire()
+            try:
+                response = await self._client.post(settings.SLACK_WEBHOOK_URL, json={"text": message})
+                if response.status_code < 300:
+                    return attempt, None
+                error = f"HTTP {response.status_code}"
+                if response.status_code == 429:
+                    bucket.pause(_retry_after(response))
+                elif response.status_code < 500:
+                    # The request itself is wrong; retrying won't help
+                    return attempt, error
+            except httpx.HTTPError as e:
+                error = str(e) or type(e).__name__
+            if attempt < settings.ALERT_MAX_ATTEMPTS:
+                await asyncio.sleep(min(
+                    settings.ALERT_RETRY_BASE_SECONDS * 2 ** (attempt - 1), settings.ALERT_RETRY_MAX_SECONDS
+                ))
+        return settings.ALERT_MAX_ATTEMPTS, error
+
+    async def _record(self, alert: dict, channel: Optional[str], state: str) -> List[int]:
+        """Insert the alert's rows; none if the database is unavailable (delivery goes ahead)"""
+        if not alert["rows"]:
+            return []
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    insert(Alert).returning(Alert.id),
+                    [
+                        {
+                            "pipeline_id": pipeline_id,
+                            "severity": alert["severity"],
+                            "message": alert["message"],
+                            "triggered_at": alert["triggered_at"],
+                            "dedupe_key": dedupe_key,
+                            "channel": channel,
+                            "delivery_status": state,
+                            "attempts": 0,
+                            "is_resolved": resolved,
+                            "resolved_at": alert["triggered_at"] if resolved else None,
+                        }
+                        for pipeline_id, dedupe_key, resolved in alert["rows"]
+                    ]
                 )
+                alert_ids = list(result.scalars())
+                await db.commit()
+            return alert_ids
+        except Exception as e:
+            print(f"Failed to record alert: {e}")
+            return []
+
+    async def _update(self, alert_ids: List[int], values: dict):
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(update(Alert).where(Alert.id.in_(alert_ids)).values(**values))
+                await db.commit()
         except Exception as e:
-            print(f"Slack alert failed: {e}")
+            print(f"Failed to record alert delivery: {e}")
+
+    async def _resolve(self, pipeline_id: int, resolved_at: datetime):
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Alert)
+                .where(Alert.pipeline_id == pipeline_id)
+                .where(Alert.dedupe_key.like(f"{pipeline_id}:status:%"))
+                .where(Alert.is_resolved == False)
+                .where(Alert.triggered_at <= resolved_at)
+                .values(is_resolved=True, resolved_at=resolved_at)
+            )
+            await db.commit()
+
+    def stats(self) -> dict:
+        return {
+            "running": bool(self._tasks),
+            "outage_groups": len(self.correlator),
+            "digests": self.correlator.digests,
+            "queue_size": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            **self.counters,
+        }
 
-alert_service = AlertService()
\ No newline at end of file
+alert_service = AlertService()
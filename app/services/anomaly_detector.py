@@ -1,24 +1,602 @@
-from typing import List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 from datetime import datetime, timedelta
+from abc import ABC, abstractmethod
+from array import array
+import asyncio
+import itertools
+import json
+import math
+import time
+
+import numpy as np
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-import statistics
+from sqlalchemy import select, insert, case, func, and_, or_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.database import AsyncSessionLocal
+from app.models import AnomalyState, HealthStatus, HealthCheckRollup, LevelShift, Pipeline, PipelineType
+from app.config import get_settings
+from app.services.baselines import SeasonalBaselines, seasonal_baselines
+from app.services.rollups import bucket_start
+
+settings = get_settings()
+
+_EPOCH = datetime(1970, 1, 1)
+_CUSUM_CLIP = 3.0  # standard deviations one check can add to a CUSUM sum
+
+
+def _confidence(z_score: float) -> str:
+    if z_score > 3:
+        return "very_high"
+    elif z_score > 2.5:
+        return "high"
+    elif z_score > 2:
+        return "medium"
+    return "normal"
+
+
+class PipelineStats:
+    """
+    Streaming detector state for one pipeline, updated in O(1) per check:
+
+    - Welford running count / mean / M2 over every response time seen
+    - EWMA mean and variance, the baseline each new response time is scored
+      against unless the pipeline has a seasonal profile for the check's hour
+    - a ring of per-bucket check and failure counts giving the error rate
+      over the last ANOMALY_ERROR_WINDOW_BUCKETS buckets
+    """
+
+    __slots__ = (
+        "count", "mean", "m2", "ewma_mean", "ewma_var",
+        "last_value", "last_z", "last_mean", "last_std", "last_baseline",
+        "expected_error_rate", "bucket_ids", "bucket_checks", "bucket_failures",
+        "latency_flagged", "errors_flagged",
+    )
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.ewma_mean = 0.0
+        self.ewma_var = 0.0
+        # Latest response time and the baseline it was scored against
+        self.last_value = None
+        self.last_z = None
+        self.last_mean = None
+        self.last_std = None
+        self.last_baseline = None  # "seasonal" or "ewma"
+        # Error rate the seasonal profile expects at the latest check, in percent
+        self.expected_error_rate = None
+
+        buckets = settings.ANOMALY_ERROR_WINDOW_BUCKETS
+        self.bucket_ids = array("q", [-1] * buckets)  # epoch seconds // bucket width
+        self.bucket_checks = array("q", [0] * buckets)
+        self.bucket_failures = array("q", [0] * buckets)
+
+        # Whether the last evaluation was anomalous, so alerts fire on the transition only
+        self.latency_flagged = False
+        self.errors_flagged = False
+
+    def update(
+            self,
+            checked_at: datetime,
+            status: HealthStatus,
+            response_time_ms: Optional[float],
+            seasonal: Optional[Tuple[float, float, float]] = None
+    ):
+        """`seasonal` is the (median, scale, error rate) of the check's hour-of-week slot, if any"""
+        median, scale, error_rate = seasonal or (math.nan, math.nan, math.nan)
+        self.expected_error_rate = None if math.isnan(error_rate) else error_rate
+
+        bucket = int((checked_at - _EPOCH).total_seconds()) // settings.ANOMALY_ERROR_BUCKET_SECONDS
+        slot = bucket % len(self.bucket_ids)
+        if self.bucket_ids[slot] != bucket:
+            if self.bucket_ids[slot] > bucket:
+                return  # older than the whole window
+            self.bucket_ids[slot] = bucket
+            self.bucket_checks[slot] = 0
+            self.bucket_failures[slot] = 0
+        self.bucket_checks[slot] += 1
+        if status != HealthStatus.HEALTHY:
+            self.bucket_failures[slot] += 1
+
+        if response_time_ms is None:
+            return
+
+        x = response_time_ms
+        self.last_value = x
+        if not math.isnan(median):
+            self.last_mean = median
+            self.last_std = scale
+            self.last_z = abs(x - median) / scale
+            self.last_baseline = "seasonal"
+        elif self.count >= settings.ANOMALY_MIN_SAMPLES:
+            std = math.sqrt(self.ewma_var)
+            self.last_mean = self.ewma_mean
+            self.last_std = std
+            self.last_z = abs(x - self.ewma_mean) / std if std > 0 else 0.0
+            self.last_baseline = "ewma"
+
+        # Welford
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+        # EWMA mean / variance
+        if self.count == 1:
+            self.ewma_mean = x
+        else:
+            alpha = 2.0 / (settings.ANOMALY_EWMA_SPAN + 1)
+            diff = x - self.ewma_mean
+            increment = alpha * diff
+            self.ewma_mean += increment
+            self.ewma_var = (1 - alpha) * (self.ewma_var + diff * increment)
+
+    def error_counts(self, now: datetime) -> Tuple[int, int]:
+        """(checks, failures) within the sliding window ending at `now`"""
+        current = int((now - _EPOCH).total_seconds()) // settings.ANOMALY_ERROR_BUCKET_SECONDS
+        oldest = current - len(self.bucket_ids) + 1
+        checks = failures = 0
+        for slot, bucket in enumerate(self.bucket_ids):
+            if oldest <= bucket <= current:
+                checks += self.bucket_checks[slot]
+                failures += self.bucket_failures[slot]
+        return checks, failures
+
+    def to_dict(self) -> dict:
+        return {
+            name: list(value) if isinstance(value, array) else value
+            for name in self.__slots__
+            for value in (getattr(self, name),)
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PipelineStats":
+        stats = cls()
+        for name, value in data.items():
+            if name not in cls.__slots__:
+                continue
+            if isinstance(value, list):
+                if len(value) != len(stats.bucket_ids):
+                    continue  # window size changed; start the error window afresh
+                value = array("q", value)
+            setattr(stats, name, value)
+        return stats
+
+
+class _Cusum:
+    """
+    Two-sided CUSUM over response times, standardized against a reference
+    level learned from the first ANOMALY_CUSUM_WARMUP checks after a start
+    or a detected shift. Each side is [sum, checks, latency total, start]
+    of the run since the sum last left zero, so the onset and the new level
+    of a shift come for free.
+    """
+
+    __slots__ = ("ref_n", "ref_mean", "ref_m2", "high", "low")
+
+    def __init__(self):
+        self.restart()
+
+    def restart(self):
+        self.ref_n = 0
+        self.ref_mean = 0.0
+        self.ref_m2 = 0.0
+        self.high = [0.0, 0, 0.0, None]
+        self.low = [0.0, 0, 0.0, None]
+
+    def update(self, x: float, at: float) -> Optional[Tuple[str, float, float, float]]:
+        """Returns (direction, started at, level before, level after) once a shift is detected"""
+        if self.ref_n < settings.ANOMALY_CUSUM_WARMUP:
+            self.ref_n += 1
+            delta = x - self.ref_mean
+            self.ref_mean += delta / self.ref_n
+            self.ref_m2 += delta * (x - self.ref_mean)
+            return None
+
+        std = math.sqrt(self.ref_m2 / (self.ref_n - 1))
+        # Perfectly steady latencies would make every millisecond a shift
+        scale = max(std, 0.01 * abs(self.ref_mean), 1e-9)
+        # Clipping keeps one extreme check from crossing the threshold on its own
+        z = max(-_CUSUM_CLIP, min(_CUSUM_CLIP, (x - self.ref_mean) / scale))
+
+        drift = settings.ANOMALY_CUSUM_DRIFT
+        for direction, side, increment in (("up", self.high, z - drift), ("down", self.low, -z - drift)):
+            total = side[0] + increment
+            if total <= 0:
+                side[:] = [0.0, 0, 0.0, None]
+                continue
+            if not side[1]:
+                side[3] = at
+            side[0] = total
+            side[1] += 1
+            side[2] += x
+            if total > settings.ANOMALY_CUSUM_THRESHOLD:
+                shift = (direction, side[3], self.ref_mean, side[2] / side[1])
+                self.restart()
+                return shift
+        return None
+
+    @property
+    def statistic(self) -> float:
+        return max(self.high[0], self.low[0])
+
+
+class _PageHinkley:
+    """
+    Two-sided Page-Hinkley test over the failure indicator (1 for any
+    non-healthy check). `high` and `low` hold the cumulative deviation from
+    the running failure rate, its extreme so far, and the checks / failures
+    / time at that extreme, which mark where a shift began.
+    """
+
+    __slots__ = ("n", "failures", "high", "low")
+
+    def __init__(self):
+        self.restart()
+
+    def restart(self):
+        self.n = 0
+        self.failures = 0
+        self.high = [0.0, 0.0, 0, 0, None]  # sum, min, n, failures, at
+        self.low = [0.0, 0.0, 0, 0, None]   # sum, max, n, failures, at
+
+    def update(self, failed: bool, at: float) -> Optional[Tuple[str, float, float, float]]:
+        """Returns (direction, started at, rate before, rate after) once a shift is detected"""
+        self.n += 1
+        self.failures += failed
+        deviation = failed - self.failures / self.n
+        delta = settings.ANOMALY_PH_DELTA
+
+        high, low = self.high, self.low
+        high[0] += deviation - delta
+        if high[0] < high[1]:
+            high[1:] = [high[0], self.n, self.failures, at]
+        low[0] += deviation + delta
+        if low[0] > low[1]:
+            low[1:] = [low[0], self.n, self.failures, at]
+
+        for direction, side, excess in (("up", high, high[0] - high[1]), ("down", low, low[1] - low[0])):
+            if excess > settings.ANOMALY_PH_THRESHOLD and self.n > side[2]:
+                before = side[3] / side[2] if side[2] else 0.0
+                after = (self.failures - side[3]) / (self.n - side[2])
+                shift = (direction, side[4] or at, before * 100, after * 100)
+                self.restart()
+                return shift
+        return None
+
+    @property
+    def statistic(self) -> float:
+        return max(self.high[0] - self.high[1], self.low[1] - self.low[0])
+
+
+class ChangePointState:
+    __slots__ = ("latency", "errors", "last_shifts")
+
+    def __init__(self):
+        self.latency = _Cusum()
+        self.errors = _PageHinkley()
+        self.last_shifts: Dict[str, dict] = {}
+
+
+class Detector(ABC):
+    """
+    A streaming detector run by AnomalyDetector over every check result.
+
+    Each detector keeps one state object per pipeline, made by `new_state()`,
+    updated in O(1) time and memory by `update()` and snapshotted through
+    `dump()` / `load()` along with the other detectors' state.
+    """
+
+    name: str = None
+
+    @abstractmethod
+    def new_state(self):
+        """A fresh state for a pipeline seen for the first time"""
+
+    @abstractmethod
+    def update(
+            self,
+            pipeline_id: int,
+            state,
+            checked_at: datetime,
+            status: HealthStatus,
+            response_time_ms: Optional[float]
+    ) -> List[Tuple[str, dict]]:
+        """Fold in one check; returns (metric, analysis) pairs that just became anomalous"""
+
+    @abstractmethod
+    def analyze(self, state, now: datetime) -> dict:
+        """Current analysis per metric; `state` is None when nothing has been observed"""
+
+    @abstractmethod
+    def dump(self, state) -> dict:
+        """`state` as JSON-serializable data"""
+
+    @abstractmethod
+    def load(self, data: dict):
+        """The state `dump()` returned `data` for"""
+
+    async def flush(self, db: AsyncSession):
+        """Write anything buffered since the last snapshot, in the snapshot's transaction"""
+
+    async def sync(self, pipeline_ids: Set[int]):
+        """Called when the set of pipelines scored in this process is (re)established"""
+
+    async def track(self, pipeline_id: int):
+        """Called when one pipeline starts (or keeps) being scored here, between syncs"""
+
+    def untrack(self, pipeline_id: int):
+        """Called when one pipeline stops being scored here, between syncs"""
+
+    def reset(self):
+        """Drop process-local data when the worker stops"""
+
+
+class ZScoreDetector(Detector):
+    """
+    Scores each response time against its hour-of-week seasonal profile
+    (one lookup in `baselines`) or, without one, the EWMA baseline, and
+    tracks the sliding error rate against the rate expected for the hour
+    """
+
+    name = "zscore"
+
+    def __init__(self, z_threshold: float = None, baselines: SeasonalBaselines = None):
+        self.z_threshold = z_threshold or settings.ANOMALY_Z_THRESHOLD
+        self.baselines = baselines
+
+    def new_state(self) -> PipelineStats:
+        return PipelineStats()
+
+    def update(self, pipeline_id, stats, checked_at, status, response_time_ms):
+        seasonal = self.baselines.lookup(pipeline_id, checked_at) if self.baselines else None
+        stats.update(checked_at, status, response_time_ms, seasonal)
+
+        triggered = []
+        latency = self.latency_analysis(stats)
+        if latency["is_anomaly"] and not stats.latency_flagged:
+            triggered.append(("response_time", latency))
+        stats.latency_flagged = latency["is_anomaly"]
+
+        errors = self.error_analysis(stats, checked_at)
+        if errors["is_anomaly"] and not stats.errors_flagged:
+            triggered.append(("error_rate", errors))
+        stats.errors_flagged = errors["is_anomaly"]
+        return triggered
+
+    def analyze(self, stats, now):
+        return {
+            "response_time": self.latency_analysis(stats),
+            "error_rate": self.error_analysis(stats, now),
+        }
+
+    def dump(self, stats):
+        return stats.to_dict()
+
+    async def sync(self, pipeline_ids):
+        if self.baselines is not None:
+            await self.baselines.refresh(pipeline_ids)
+
+    async def track(self, pipeline_id):
+        if self.baselines is not None:
+            await self.baselines.refresh([pipeline_id], prune=False)
+
+    def untrack(self, pipeline_id):
+        if self.baselines is not None:
+            self.baselines.remove(pipeline_id)
+
+    def reset(self):
+        if self.baselines is not None:
+            self.baselines.reset()
+
+    def load(self, data):
+        return PipelineStats.from_dict(data)
+
+    def latency_analysis(self, stats: Optional[PipelineStats]) -> dict:
+        if stats is None or stats.last_z is None:
+            return {
+                "is_anomaly" : False,
+                "current_value" : stats.last_value if stats else None,
+                "mean" : None,
+                "std_dev" : None,
+                "z_score" : None,
+                "threshold" : self.z_threshold,
+                "confidence" : "insufficient_data"
+            }
+
+        return {
+            "is_anomaly": stats.last_z > self.z_threshold,
+            "current_value": round(stats.last_value, 2),
+            "mean": round(stats.last_mean, 2),
+            "std_dev": round(stats.last_std, 2),
+            "z_score": round(stats.last_z, 2),
+            "threshold": self.z_threshold,
+            "confidence": _confidence(stats.last_z),
+            "sample_size": stats.count - 1,
+            "baseline": stats.last_baseline
+        }
+
+    def error_analysis(self, stats: Optional[PipelineStats], now: datetime) -> dict:
+        total_checks, failed_checks = stats.error_counts(now) if stats else (0, 0)
+
+        if total_checks < settings.ANOMALY_MIN_SAMPLES:
+            return {
+                "is_anomaly": False,
+                "error_rate": 0,
+                "confidence": "insufficient_data"
+            }
+
+        error_rate = (failed_checks / total_checks) * 100
+
+        # Threshold above what this hour of the week normally sees
+        expected = stats.expected_error_rate or 0.0
+        is_anomaly = error_rate > expected + settings.ANOMALY_ERROR_RATE_THRESHOLD
+
+        return {
+            "is_anomaly": is_anomaly,
+            "error_rate": round(error_rate, 2),
+            "expected_error_rate": round(expected, 2),
+            "failed_checks": failed_checks,
+            "total_checks": total_checks,
+            "confidence": "high" if is_anomaly else "normal"
+        }
+
+
+class ChangePointDetector(Detector):
+    """
+    Online change-point detection: CUSUM on response times and Page-Hinkley
+    on the failure rate. Unlike the z-score it ignores a lone spike but
+    catches a sustained shift, including a slow creep, and dates where it
+    began. Detected shifts are buffered and written to level_shifts with
+    the next state snapshot; upward shifts are reported as anomalies.
+    """
+
+    name = "changepoint"
+
+    def __init__(self):
+        self.pending: List[dict] = []
+
+    def new_state(self) -> ChangePointState:
+        return ChangePointState()
+
+    def update(self, pipeline_id, state, checked_at, status, response_time_ms):
+        at = (checked_at - _EPOCH).total_seconds()
+        shifts = [("error_rate", state.errors.update(status != HealthStatus.HEALTHY, at))]
+        if response_time_ms is not None:
+            shifts.append(("response_time", state.latency.update(response_time_ms, at)))
+
+        triggered = []
+        for metric, shift in shifts:
+            if shift is None:
+                continue
+            direction, started_at, before, after = shift
+            record = {
+                "metric": metric,
+                "direction": direction,
+                "changed_at": _EPOCH + timedelta(seconds=started_at),
+                "detected_at": checked_at,
+                "before_value": round(before, 2),
+                "after_value": round(after, 2),
+            }
+            state.last_shifts[metric] = record
+            self.pending.append({"pipeline_id": pipeline_id, **record})
+            if direction == "up":
+                triggered.append((f"{metric}_shift", record))
+        return triggered
+
+    def analyze(self, state, now):
+        if state is None:
+            state = ChangePointState()
+        latency, errors = state.latency, state.errors
+        return {
+            "response_time": {
+                "statistic": round(latency.statistic, 2),
+                "threshold": settings.ANOMALY_CUSUM_THRESHOLD,
+                "reference_ms": round(latency.ref_mean, 2) if latency.ref_n else None,
+                "warming_up": latency.ref_n < settings.ANOMALY_CUSUM_WARMUP,
+                "last_shift": state.last_shifts.get("response_time"),
+            },
+            "error_rate": {
+                "statistic": round(errors.statistic, 2),
+                "threshold": settings.ANOMALY_PH_THRESHOLD,
+                "reference_rate": round(errors.failures / errors.n * 100, 2) if errors.n else None,
+                "last_shift": state.last_shifts.get("error_rate"),
+            },
+        }
+
+    def dump(self, state):
+        return {
+            "latency": {name: getattr(state.latency, name) for name in _Cusum.__slots__},
+            "errors": {name: getattr(state.errors, name) for name in _PageHinkley.__slots__},
+            "last_shifts": {
+                metric: {**shift, "changed_at": shift["changed_at"].isoformat(),
+                         "detected_at": shift["detected_at"].isoformat()}
+                for metric, shift in state.last_shifts.items()
+            },
+        }
+
+    def load(self, data):
+        state = ChangePointState()
+        for name, value in data.get("latency", {}).items():
+            setattr(state.latency, name, value)
+        for name, value in data.get("errors", {}).items():
+            setattr(state.errors, name, value)
+        for metric, shift in data.get("last_shifts", {}).items():
+            state.last_shifts[metric] = {
+                **shift,
+                "changed_at": datetime.fromisoformat(shift["changed_at"]),
+                "detected_at": datetime.fromisoformat(shift["detected_at"]),
+            }
+        return state
+
+    async def flush(self, db: AsyncSession):
+        shifts, self.pending = self.pending, []
+        if not shifts:
+            return
+        try:
+            await db.execute(insert(LevelShift), shifts)
+        except Exception:
+            self.pending[:0] = shifts
+            raise
 
-from app.models import HealthCheck, Pipeline, HealthStatus
 
 class AnomalyDetector:
-    def __init__(self, z_threshold: float = 2.5):
-        self.z_threshold = z_threshold
+    """
+    Runs a set of streaming detectors (z-score and change-point by default)
+    side by side over every check the worker makes. `observe()` folds each
+    result into every detector's per-pipeline state as it completes; reads
+    then answer from memory in the worker process, or from the last
+    persisted snapshot (written every ANOMALY_STATE_PERSIST_INTERVAL)
+    anywhere else.
+    """
+
+    def __init__(self, z_threshold: float = None, detectors: List[Detector] = None):
+        self.zscore = ZScoreDetector(z_threshold, baselines=seasonal_baselines)
+        self.z_threshold = self.zscore.z_threshold
+        self.detectors: Dict[str, Detector] = {}
+        for detector in detectors if detectors is not None else [self.zscore, ChangePointDetector()]:
+            self.register(detector)
+        # pipeline id -> detector name -> that detector's state
+        self.states: Dict[int, Dict[str, Any]] = {}
+        self.live = False
+        self._dirty = set()
+
+    def register(self, detector: Detector):
+        """Add a detector; it sees every check observed from now on"""
+        self.detectors[detector.name] = detector
+
+    def observe(
+            self,
+            pipeline_id: int,
+            checked_at: datetime,
+            status: HealthStatus,
+            response_time_ms: Optional[float]
+    ) -> List[Tuple[str, dict]]:
+        """Update a pipeline's state with one check; returns analyses that just became anomalous"""
+        states = self.states.get(pipeline_id)
+        if states is None:
+            states = self.states[pipeline_id] = {}
+        self._dirty.add(pipeline_id)
+
+        triggered = []
+        for name, detector in self.detectors.items():
+            state = states.get(name)
+            if state is None:
+                state = states[name] = detector.new_state()
+            triggered.extend(detector.update(pipeline_id, state, checked_at, status, response_time_ms))
+        return triggered
 
     async def detect_response_time_anomaly(
             self,
             db: AsyncSession,
-            pipeline_id: int,
-            hours_lookback: int = 24
+            pipeline_id: int
     ) -> dict:
         """
         Detect if current response time is anomalous
-        
+
         Returns:
             {
                 "is_anomaly": bool,
@@ -29,112 +607,308 @@ class AnomalyDetector:
                 "threshold": float,
                 "confidence": str
             }
-        
+
         """
+        states = await self._state(db, pipeline_id)
+        return self.zscore.latency_analysis(states.get(self.zscore.name))
+
+    async def detect_error_rate_spike(
+            self,
+            db: AsyncSession,
+            pipeline_id: int
+    ) -> dict:
+        states = await self._state(db, pipeline_id)
+        return self.zscore.error_analysis(states.get(self.zscore.name), datetime.utcnow())
+
+    async def analyze(self, db: AsyncSession, pipeline_id: int) -> dict:
+        """Every registered detector's current analysis of a pipeline, keyed by detector name"""
+        states = await self._state(db, pipeline_id)
+        now = datetime.utcnow()
+        return {
+            name: detector.analyze(states.get(name), now)
+            for name, detector in self.detectors.items()
+        }
+
+    async def level_shifts(
+            self,
+            db: AsyncSession,
+            pipeline_id: int,
+            since: datetime,
+            limit: int = 50
+    ) -> List[dict]:
+        """Recorded shift points of a pipeline since `since`, oldest first"""
+        result = await db.execute(
+            select(LevelShift)
+            .where(LevelShift.pipeline_id == pipeline_id)
+            .where(LevelShift.changed_at >= since)
+            .order_by(LevelShift.changed_at.desc())
+            .limit(limit)
+        )
+        return [
+            {
+                "metric": shift.metric,
+                "direction": shift.direction,
+                "changed_at": shift.changed_at,
+                "detected_at": shift.detected_at,
+                "before_value": shift.before_value,
+                "after_value": shift.after_value,
+            }
+            for shift in reversed(result.scalars().all())
+        ]
+
+    async def scan_fleet(
+            self,
+            db: AsyncSession,
+            owner_team: Optional[str] = None,
+            pipeline_type: Optional[PipelineType] = None,
+            limit: int = 100
+    ) -> dict:
+        """
+        Score every active pipeline at once: the mean response time of the
+        last ANOMALY_FLEET_RECENT_MINUTES is z-scored against the baseline
+        from the start of yesterday (UTC) up to that window, and the recent
+        error rate is compared with the threshold.
+
+        One aggregate query returns a numeric row per pipeline, reading two
+        1d rollups plus the recent 1m rollups each; the baseline is the day
+        totals minus the recent window, since rollups are additive. All
+        scoring is NumPy array arithmetic. Anomalous pipelines come back
+        most severe first.
+        """
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        recent_start = bucket_start(now - timedelta(minutes=settings.ANOMALY_FLEET_RECENT_MINUTES), "1m")
+        baseline_start = bucket_start(now, "1d") - timedelta(days=1)
+
+        rollup = HealthCheckRollup
+        is_recent = rollup.resolution == "1m"
+
+        def recent(column):
+            return func.sum(case((is_recent, column), else_=0))
+
+        def day(column):
+            return func.sum(case((is_recent, 0), else_=column))
+
+        pipelines = select(Pipeline.id).where(Pipeline.is_active == True)
+        if owner_team is not None:
+            pipelines = pipelines.where(Pipeline.owner_team == owner_team)
+        if pipeline_type is not None:
+            pipelines = pipelines.where(Pipeline.pipeline_type == pipeline_type)
 
-        since = datetime.utcnow() - timedelta(hours=hours_lookback)
         stmt = (
-            select(HealthCheck.response_time_ms)
-            .where(HealthCheck.pipeline_id == pipeline_id)
-            .where(HealthCheck.checked_at >= since)
-            .where(HealthCheck.response_time_ms.isnot(None))
-            .order_by(HealthCheck.checked_at.desc())
+            select(
+                rollup.pipeline_id,
+                day(rollup.latency_count),
+                day(rollup.latency_sum),
+                day(rollup.latency_sum_sq),
+                recent(rollup.latency_count),
+                recent(rollup.latency_sum),
+                recent(rollup.latency_sum_sq),
+                recent(rollup.check_count),
+                recent(rollup.failed_count),
+            )
+            .where(rollup.pipeline_id.in_(pipelines))
+            .where(or_(
+                and_(rollup.resolution == "1d", rollup.bucket_start >= baseline_start),
+                and_(is_recent, rollup.bucket_start >= recent_start),
+            ))
+            .group_by(rollup.pipeline_id)
         )
 
+        rows = (await db.execute(stmt)).all()
+        # fromiter over the flattened values avoids NumPy probing each Row object
+        data = np.fromiter(
+            itertools.chain.from_iterable(rows), dtype=np.float64, count=len(rows) * 9
+        ).reshape(-1, 9)
+        ids = data[:, 0].astype(np.int64)
+        day_n, day_sum, day_sum_sq, recent_n, recent_sum, recent_sum_sq, recent_checks, recent_failed = data[:, 1:].T
+        base_n = day_n - recent_n
+        base_sum = day_sum - recent_sum
+        base_sum_sq = day_sum_sq - recent_sum_sq
 
-        result = await db.execute(stmt)
-        response_times = [row[0] for row in result.fetchall()]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            base_mean = base_sum / base_n
+            base_var = np.maximum(base_sum_sq - base_sum * base_mean, 0.0) / (base_n - 1)
+            base_std = np.sqrt(base_var)
+            recent_mean = recent_sum / recent_n
+            z = (recent_mean - base_mean) / base_std
+            error_rate = recent_failed / recent_checks * 100
 
-        if len(response_times) < 10:
-            return {
-                "is_anomaly" : False,
-                "current_value" : response_times[0] if response_times else None,
-                "mean" : None,
-                "std_dev" : None,
-                "z_score" : None,
-                "threshold" : self.z_threshold,
-                "confidence" : "insufficient_data"
-            }
-        
-        current_value = response_times[0]
-        historical_values = response_times[1:]
+        z = np.where((base_n >= settings.ANOMALY_MIN_SAMPLES) & (recent_n > 0) & (base_std > 0), z, np.nan)
+        # A couple of checks are too few for a rate
+        error_rate = np.where(recent_checks >= 3, error_rate, np.nan)
 
-        mean = statistics.mean(historical_values)
-        std_dev = statistics.stdev(historical_values)
+        z_severity = np.nan_to_num(np.abs(z) / self.z_threshold, nan=0.0)
+        error_severity = np.nan_to_num(error_rate / settings.ANOMALY_ERROR_RATE_THRESHOLD, nan=0.0)
+        severity = np.maximum(z_severity, error_severity)
 
-        if std_dev == 0:
-            z_score = 0
+        anomalous = np.flatnonzero(severity > 1.0)
+        ranked = anomalous[np.argsort(-severity[anomalous], kind="stable")][:limit]
 
-        else: 
-            z_score = abs((current_value - mean) / std_dev)
+        details = {}
+        if ranked.size:
+            result = await db.execute(
+                select(Pipeline.id, Pipeline.name, Pipeline.owner_team, Pipeline.pipeline_type)
+                .where(Pipeline.id.in_(ids[ranked].tolist()))
+            )
+            details = {row.id: row for row in result.all()}
 
-        is_anomaly = z_score > self.z_threshold
+        def rounded(values, i):
+            value = values[i]
+            return None if np.isnan(value) else round(float(value), 2)
 
-        if z_score > 3:
-            confidence = "very_high"
-        elif z_score > 2.5:
-            confidence = "high"
-        elif z_score > 2:
-            confidence = "medium"
-        else:
-            confidence = "normal"
+        pipelines = []
+        for rank, i in enumerate(ranked, start=1):
+            pipeline = details.get(int(ids[i]))
+            if pipeline is None:
+                continue
+            pipelines.append({
+                "rank": rank,
+                "pipeline_id": pipeline.id,
+                "pipeline_name": pipeline.name,
+                "owner_team": pipeline.owner_team,
+                "pipeline_type": pipeline.pipeline_type,
+                "severity": rounded(severity, i),
+                "z_score": rounded(z, i),
+                "recent_avg_ms": rounded(recent_mean, i),
+                "baseline_avg_ms": rounded(base_mean, i),
+                "baseline_std_ms": rounded(base_std, i),
+                "error_rate": rounded(error_rate, i),
+                "recent_checks": int(recent_checks[i]),
+            })
 
         return {
-            "is_anomaly": is_anomaly,
-            "current_value": round(current_value, 2),
-            "mean": round(mean, 2),
-            "std_dev": round(std_dev, 2),
-            "z_score": round(z_score, 2),
-            "threshold": self.z_threshold,
-            "confidence": confidence,
-            "sample_size": len(historical_values)
+            "scanned_pipelines": int(ids.size),
+            "anomalous_pipelines": int(anomalous.size),
+            "recent_since": recent_start,
+            "baseline_since": baseline_start,
+            "z_threshold": self.z_threshold,
+            "error_rate_threshold": settings.ANOMALY_ERROR_RATE_THRESHOLD,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            "pipelines": pipelines,
         }
-    
-    async def detect_error_rate_spike(
-            self, 
-            db: AsyncSession,
-            pipeline_id: int,
-            hours_lookback: int = 24
-    ) -> dict:
-        since = datetime.utcnow() - timedelta(hours=hours_lookback)
 
-        total_stmt = select(func.count(HealthCheck.id)).where(
-            HealthCheck.pipeline_id == pipeline_id,
-            HealthCheck.checked_at >= since
+    async def _state(self, db: AsyncSession, pipeline_id: int) -> Dict[str, Any]:
+        if self.live:
+            return self.states.get(pipeline_id, {})
+        result = await db.execute(
+            select(AnomalyState.state).where(AnomalyState.pipeline_id == pipeline_id)
         )
+        data = result.scalar_one_or_none()
+        return self._load(data) if data else {}
 
-        total_result = await db.execute(total_stmt)
-        total_checks = total_result.scalar()
+    def _dump(self, states: Dict[str, Any]) -> str:
+        return json.dumps({
+            name: detector.dump(states[name])
+            for name, detector in self.detectors.items()
+            if name in states
+        })
 
-        failed_stmt = select(func.count(HealthCheck.id)).where(
-            HealthCheck.pipeline_id == pipeline_id,
-            HealthCheck.checked_at >= since,
-            HealthCheck.status != HealthStatus.HEALTHY
-        )
-        failed_result = await db.execute(failed_stmt)
-        failed_checks = failed_result.scalar()
-        
-        if total_checks < 10:
-            return {
-                "is_anomaly": False,
-                "error_rate": 0,
-                "confidence": "insufficient_data"
-            }
-        
-        error_rate = (failed_checks / total_checks) * 100
-        
-        # Simple threshold-based detection
-        is_anomaly = error_rate > 20  # More than 20% errors
-        
+    def _load(self, data: str) -> Dict[str, Any]:
+        snapshot = json.loads(data)
+        if "count" in snapshot:
+            # Written before detectors were pluggable: z-score state only
+            snapshot = {ZScoreDetector.name: snapshot}
         return {
-            "is_anomaly": is_anomaly,
-            "error_rate": round(error_rate, 2),
-            "failed_checks": failed_checks,
-            "total_checks": total_checks,
-            "confidence": "high" if error_rate > 20 else "normal"
+            name: detector.load(snapshot[name])
+            for name, detector in self.detectors.items()
+            if name in snapshot
         }
 
+    async def sync(self, pipeline_ids: Iterable[int]):
+        """
+        Track exactly `pipeline_ids`: snapshot pending changes, drop pipelines
+        no longer checked here and load persisted state for new ones
+        """
+        wanted = set(pipeline_ids)
+        await self.persist()
+        for pipeline_id in set(self.states) - wanted:
+            self.states.pop(pipeline_id, None)
+
+        missing = wanted - set(self.states)
+        if missing:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(AnomalyState.pipeline_id, AnomalyState.state)
+                    .where(AnomalyState.pipeline_id.in_(missing))
+                )
+                for pipeline_id, data in result.all():
+                    self.states[pipeline_id] = self._load(data)
+        for detector in self.detectors.values():
+            await detector.sync(wanted)
+        self.live = True
+
+    async def track(self, pipeline_id: int):
+        """Start scoring one pipeline here (loading its persisted state) without re-syncing the rest"""
+        if pipeline_id not in self.states:
+            async with AsyncSessionLocal() as db:
+                data = (await db.execute(
+                    select(AnomalyState.state).where(AnomalyState.pipeline_id == pipeline_id)
+                )).scalar()
+            # A check may have been observed meanwhile; its state is newer
+            if data is not None and pipeline_id not in self.states:
+                self.states[pipeline_id] = self._load(data)
+        for detector in self.detectors.values():
+            await detector.track(pipeline_id)
+
+    async def untrack(self, pipeline_id: int):
+        """Stop scoring one pipeline here, snapshotting its pending changes first"""
+        if pipeline_id in self._dirty:
+            await self.persist()
+        self.states.pop(pipeline_id, None)
+        for detector in self.detectors.values():
+            detector.untrack(pipeline_id)
+
+    async def persist(self):
+        """Write the state of every pipeline updated since the last snapshot"""
+        dirty = [pipeline_id for pipeline_id in self._dirty if pipeline_id in self.states]
+        self._dirty = set()
+        if not dirty:
+            return
+
+        now = datetime.utcnow()
+        rows = [
+            {"pipeline_id": pipeline_id, "state": self._dump(self.states[pipeline_id]), "updated_at": now}
+            for pipeline_id in dirty
+        ]
+
+        try:
+            async with AsyncSessionLocal() as db:
+                # Upsert: another worker may have written a row for a pipeline
+                # since it moved here, or after we last read it
+                if db.get_bind().dialect.name == "postgresql":
+                    stmt = postgresql_insert(AnomalyState.__table__)
+                else:
+                    stmt = sqlite_insert(AnomalyState.__table__)
+                await db.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=["pipeline_id"],
+                        set_={"state": stmt.excluded.state, "updated_at": stmt.excluded.updated_at}
+                    ),
+                    rows
+                )
+                for detector in self.detectors.values():
+                    await detector.flush(db)
+                await db.commit()
+        except Exception:
+            self._dirty.update(dirty)
+            raise
+
+    async def run_persistence(self):
+        while True:
+            await asyncio.sleep(settings.ANOMALY_STATE_PERSIST_INTERVAL)
+            try:
+                await self.persist()
+            except Exception as e:
+                print(f"Anomaly state snapshot failed: {e}")
+
+    def reset(self):
+        """Forget in-memory state; reads go back to persisted snapshots"""
+        self.live = False
+        self.states.clear()
+        self._dirty.clear()
+        for detector in self.detectors.values():
+            detector.reset()
+
 # Global instance
 anomaly_detector = AnomalyDetector()
-        
-        
\ No newline at end of file
@@ -0,0 +1,379 @@
+"""
+Backtesting: replay stored health checks through the anomaly detectors
+"""
+import asyncio
+import math
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+
+from app.database import AsyncSessionLocal
+from app.models import HealthCheck, HealthStatus, Pipeline, SeasonalBaseline
+from app.config import get_settings
+from app.services import baselines
+from app.services.anomaly_detector import ChangePointDetector
+
+settings = get_settings()
+
+_SECOND_MICROS = 1_000_000
+_BLOCK = 256  # recurrence steps solved per matrix product
+
+
+def _linear_recurrence(u: np.ndarray, decay: float, initial: float) -> np.ndarray:
+    """
+    y[t] = decay * y[t-1] + u[t] with y[-1] = initial, solved a block at a
+    time: within a block y is a lower-triangular matrix product, so the only
+    Python loop is over blocks
+    """
+    n = len(u)
+    if not n:
+        return u.copy()
+    powers = decay ** np.arange(_BLOCK + 1)
+    steps = np.arange(_BLOCK)
+    lags = steps[:, None] - steps[None, :]
+    weights = np.where(lags >= 0, powers[np.clip(lags, 0, _BLOCK)], 0.0)
+
+    blocks = -(-n // _BLOCK)
+    padded = np.zeros(blocks * _BLOCK)
+    padded[:n] = u
+    partial = padded.reshape(blocks, _BLOCK) @ weights.T
+
+    carry_weights = powers[1:]
+    y = np.empty_like(partial)
+    carry = initial
+    for b in range(blocks):
+        y[b] = partial[b] + carry * carry_weights
+        carry = y[b, -1]
+    return y.reshape(-1)[:n]
+
+
+def latency_scores(latency: np.ndarray, seasonal: Optional[tuple] = None) -> np.ndarray:
+    """
+    z-score of every response time exactly as ZScoreDetector computes it
+    check by check: against the slot's median/scale where the seasonal
+    profile has one, else against the EWMA state before the check (NaN
+    while fewer than ANOMALY_MIN_SAMPLES came before)
+    """
+    n = len(latency)
+    z = np.full(n, np.nan)
+    if not n:
+        return z
+    alpha = 2.0 / (settings.ANOMALY_EWMA_SPAN + 1)
+    decay = 1 - alpha
+
+    mean = np.empty(n)
+    mean[0] = latency[0]
+    mean[1:] = _linear_recurrence(alpha * latency[1:], decay, latency[0])
+    diff = latency[1:] - mean[:-1]
+    var = np.empty(n)
+    var[0] = 0.0
+    var[1:] = _linear_recurrence(decay * alpha * diff * diff, decay, 0.0)
+
+    std = np.sqrt(np.maximum(var[:-1], 0.0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ewma_z = np.where(std > 0, np.abs(diff) / std, 0.0)
+    z[1:] = ewma_z
+    z[:settings.ANOMALY_MIN_SAMPLES] = np.nan
+
+    if seasonal is not None:
+        median, scale = seasonal
+        known = ~np.isnan(median)
+        z[known] = np.abs(latency[known] - median[known]) / scale[known]
+    return z
+
+
+def error_rates(micros: np.ndarray, failed: np.ndarray) -> np.ndarray:
+    """
+    Error rate (%) of the sliding bucket window as of every check, as the
+    streaming detector sees it; NaN while the window holds fewer than
+    ANOMALY_MIN_SAMPLES checks
+    """
+    width = settings.ANOMALY_ERROR_BUCKET_SECONDS * _SECOND_MICROS
+    buckets = micros // width
+    # Index of the first check inside each check's window
+    first = np.searchsorted(buckets, buckets - settings.ANOMALY_ERROR_WINDOW_BUCKETS + 1, side="left")
+    failures = np.concatenate(([0.0], np.cumsum(failed)))
+    index = np.arange(1, len(micros) + 1)
+    checks = index - first
+    window_failures = failures[index] - failures[first]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rates = window_failures / checks * 100
+    rates[checks < settings.ANOMALY_MIN_SAMPLES] = np.nan
+    return rates
+
+
+def shift_alerts(
+        detector: ChangePointDetector, pipeline_id: int, micros: np.ndarray, latency: np.ndarray, failed: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """
+    Which checks raise a `response_time_shift` / `error_rate_shift` alert,
+    replayed check by check through the live change-point detector: CUSUM
+    and Page-Hinkley restart after every shift, so unlike the z-score they
+    have no closed form to vectorize
+    """
+    state = detector.new_state()
+    alerts = {"response_time_shift": np.zeros(len(micros), bool), "error_rate_shift": np.zeros(len(micros), bool)}
+    checked_at = micros.astype("datetime64[us]").tolist()
+    for i, (at, response_time_ms, down) in enumerate(zip(checked_at, latency.tolist(), failed.tolist())):
+        status = HealthStatus.DOWN if down else HealthStatus.HEALTHY
+        response_time_ms = None if math.isnan(response_time_ms) else response_time_ms
+        for alert_type, _ in detector.update(pipeline_id, state, at, status, response_time_ms):
+            alerts[alert_type][i] = True
+    # Shifts found in a replay are not written to level_shifts
+    detector.pending.clear()
+    return alerts
+
+
+def incidents(micros: np.ndarray, failed: np.ndarray, min_checks: int) -> np.ndarray:
+    """(start, end) epoch micros of every run of at least `min_checks` consecutive non-healthy checks"""
+    edges = np.diff(np.concatenate(([0], failed.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)  # exclusive
+    long_enough = ends - starts >= min_checks
+    starts, ends = starts[long_enough], ends[long_enough]
+    return np.stack([micros[starts], micros[ends - 1]], axis=1) if starts.size else np.empty((0, 2), np.int64)
+
+
+class _Tally:
+    """Per-threshold totals for one metric across every replayed pipeline"""
+
+    def __init__(self, thresholds: Sequence[float]):
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        count = len(thresholds)
+        self.scored = 0
+        self.flagged = np.zeros(count, np.int64)
+        self.alerts = np.zeros(count, np.int64)
+        self.incidents = 0
+        self.detected = np.zeros(count, np.int64)
+        self.latencies: List[List[np.ndarray]] = [[] for _ in range(count)]
+
+    def add(self, values: np.ndarray, times: np.ndarray, limits: np.ndarray, outages: np.ndarray):
+        """`limits` is the (thresholds, checks) matrix each value is compared against"""
+        scored = ~np.isnan(values)
+        values, times, limits = values[scored], times[scored], limits[:, scored]
+        self.scored += values.size
+        self.incidents += len(outages)
+        if not values.size:
+            return
+
+        flags = values[None, :] > limits
+        self.flagged += flags.sum(axis=1)
+        # Alerts fire when a metric turns anomalous
+        rising = flags & ~np.concatenate([np.zeros((len(flags), 1), bool), flags[:, :-1]], axis=1)
+        self.alerts += rising.sum(axis=1)
+
+        if not len(outages):
+            return
+        for i, row in enumerate(flags):
+            flag_times = times[row]
+            if not flag_times.size:
+                continue
+            # First flagged check at or after each outage start, if before it ends
+            first = np.searchsorted(flag_times, outages[:, 0], side="left")
+            hit = first < flag_times.size
+            hit[hit] &= flag_times[first[hit]] <= outages[hit, 1]
+            self.detected[i] += hit.sum()
+            self.latencies[i].append((flag_times[first[hit]] - outages[hit, 0]) / _SECOND_MICROS)
+
+    def report(self) -> List[dict]:
+        rows = []
+        for i, threshold in enumerate(self.thresholds.tolist()):
+            latencies = np.concatenate(self.latencies[i]) if self.latencies[i] else np.empty(0)
+            rows.append({
+                "threshold": threshold,
+                "scored_checks": self.scored,
+                "flagged_checks": int(self.flagged[i]),
+                "flag_rate": round(float(self.flagged[i] / self.scored * 100), 3) if self.scored else None,
+                "alerts": int(self.alerts[i]),
+                "incidents": self.incidents,
+                "incidents_detected": int(self.detected[i]),
+                "detection_latency_seconds": {
+                    "mean": round(float(latencies.mean()), 1),
+                    "p50": round(float(np.percentile(latencies, 50)), 1),
+                    "p90": round(float(np.percentile(latencies, 90)), 1),
+                } if latencies.size else None,
+            })
+        return rows
+
+
+class Backtest:
+    """
+    Replays stored health checks of the selected pipelines and time range
+    through the z-score latency and error-rate detectors for every
+    threshold at once, and through the CUSUM / Page-Hinkley change-point
+    detector at its configured thresholds. Checks stream one pipeline at a
+    time through a server-side cursor; the z-score and error-rate
+    recurrences run as array operations over the whole pipeline rather
+    than check by check.
+
+    Raw checks only go back RAW_RETENTION_DAYS, so the window is clamped
+    to the checks actually stored and the report gives both the requested
+    and the replayed range.
+
+    Detection latency is measured against outages: runs of at least
+    `min_incident_checks` consecutive non-healthy checks. An outage counts
+    as detected when a check between its first and last one is flagged.
+    """
+
+    def __init__(
+            self,
+            pipeline_ids: Optional[List[int]] = None,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+            z_thresholds: Sequence[float] = (2.0, 2.5, 3.0, 3.5, 4.0),
+            error_rate_thresholds: Sequence[float] = (10.0, 20.0, 30.0),
+            seasonal: bool = False,
+            min_incident_checks: int = 2,
+    ):
+        self.pipeline_ids = pipeline_ids
+        self.since = since
+        self.until = until
+        self.z_thresholds = sorted(z_thresholds)
+        self.error_rate_thresholds = sorted(error_rate_thresholds)
+        self.seasonal = seasonal
+        self.min_incident_checks = min_incident_checks
+        self.progress = {"pipelines": 0, "checks": 0}
+
+    async def run(self) -> dict:
+        started = time.perf_counter()
+        pipeline_ids = self.pipeline_ids
+        if pipeline_ids is None:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(select(Pipeline.id).order_by(Pipeline.id))
+                pipeline_ids = result.scalars().all()
+        profiles = await self._profiles(pipeline_ids) if self.seasonal else {}
+        since, until = await self._stored_range()
+
+        latency_tally = _Tally(self.z_thresholds)
+        error_tally = _Tally(self.error_rate_thresholds)
+        z_limits = np.asarray(self.z_thresholds)[:, None]
+        error_limits = np.asarray(self.error_rate_thresholds)[:, None]
+        change_points = ChangePointDetector()
+        shift_tallies = {
+            "response_time_shift": _Tally([settings.ANOMALY_CUSUM_THRESHOLD]),
+            "error_rate_shift": _Tally([settings.ANOMALY_PH_THRESHOLD]),
+        }
+
+        batch_size = settings.ANOMALY_BASELINE_BATCH
+        for offset in range(0, len(pipeline_ids), batch_size):
+            batch = list(pipeline_ids[offset:offset + batch_size])
+            stream = baselines.stream_checks(batch, since, self.until)
+            async for pipeline_id, micros, latency, failed in stream:
+                outages = incidents(micros, failed, self.min_incident_checks)
+                profile = profiles.get(pipeline_id)
+                slots = baselines.slots_of(micros) if profile is not None else None
+
+                measured = ~np.isnan(latency)
+                seasonal = None
+                if profile is not None:
+                    seasonal = (profile[baselines.MEDIAN, slots[measured]],
+                                profile[baselines.SCALE, slots[measured]])
+                z = latency_scores(latency[measured], seasonal)
+                latency_tally.add(
+                    z, micros[measured], np.broadcast_to(z_limits, (len(z_limits), z.size)), outages
+                )
+
+                rates = error_rates(micros, failed)
+                limits = error_limits
+                if profile is not None:
+                    expected = np.nan_to_num(profile[baselines.ERROR_RATE, slots], nan=0.0)
+                    limits = error_limits + expected[None, :]
+                error_tally.add(
+                    rates, micros, np.broadcast_to(limits, (len(error_limits), rates.size)), outages
+                )
+
+                shifts = shift_alerts(change_points, pipeline_id, micros, latency, failed)
+                for alert_type, tally in shift_tallies.items():
+                    # Each alerting check scores above the threshold, every other one below it
+                    values = np.where(shifts[alert_type], np.inf, -np.inf)
+                    if alert_type == "response_time_shift":
+                        values[~measured] = np.nan  # CUSUM only sees checks with a response time
+                    tally.add(values, micros, np.broadcast_to(tally.thresholds[:, None], (1, values.size)), outages)
+
+                self.progress["pipelines"] += 1
+                self.progress["checks"] += len(micros)
+                # Let the API keep serving while a long replay runs
+                await asyncio.sleep(0)
+
+        elapsed = time.perf_counter() - started
+        return {
+            "pipelines": self.progress["pipelines"],
+            "checks": self.progress["checks"],
+            "requested_since": self.since,
+            "requested_until": self.until,
+            # First and last stored check inside the requested window
+            "since": since,
+            "until": until,
+            "clamped": (since is None
+                        or (self.since is not None and since > self.since)
+                        or (self.until is not None and until < self.until)),
+            "seasonal": self.seasonal,
+            "elapsed_seconds": round(elapsed, 2),
+            "checks_per_second": round(self.progress["checks"] / elapsed) if elapsed else None,
+            "response_time": latency_tally.report(),
+            "error_rate": error_tally.report(),
+            **{alert_type: tally.report() for alert_type, tally in shift_tallies.items()},
+        }
+
+    async def _stored_range(self) -> Tuple[Optional[datetime], Optional[datetime]]:
+        stmt = select(func.min(HealthCheck.checked_at), func.max(HealthCheck.checked_at))
+        if self.pipeline_ids is not None:
+            stmt = stmt.where(HealthCheck.pipeline_id.in_(self.pipeline_ids))
+        if self.since is not None:
+            stmt = stmt.where(HealthCheck.checked_at >= self.since)
+        if self.until is not None:
+            stmt = stmt.where(HealthCheck.checked_at < self.until)
+        async with AsyncSessionLocal() as db:
+            first, last = (await db.execute(stmt)).one()
+        if first is not None and self.since is not None and first > self.since:
+            print(f"Backtest: no checks stored before {first}, replaying from there")
+        return first, last
+
+    async def _profiles(self, pipeline_ids: Sequence[int]) -> Dict[int, np.ndarray]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(SeasonalBaseline.pipeline_id, SeasonalBaseline.profile)
+                .where(SeasonalBaseline.pipeline_id.in_(list(pipeline_ids)))
+            )
+            return {
+                pipeline_id: np.frombuffer(profile, dtype=np.float32).reshape(4, baselines.SLOTS)
+                for pipeline_id, profile in result.all()
+            }
+
+
+class BacktestRunner:
+    """Runs one backtest at a time in the background for the admin API"""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self.current: Optional[Backtest] = None
+        self.status = {"started_at": None, "finished_at": None, "error": None, "report": None}
+
+    @property
+    def is_running(self) -> bool:
+        return self._lock.locked()
+
+    async def run(self, backtest: Backtest):
+        async with self._lock:
+            self.current = backtest
+            self.status.update(started_at=datetime.utcnow(), finished_at=None, error=None, report=None)
+            try:
+                self.status["report"] = await backtest.run()
+            except Exception as e:
+                self.status["error"] = str(e)
+                print(f"Backtest failed: {e}")
+            finally:
+                self.status["finished_at"] = datetime.utcnow()
+
+    def report(self) -> dict:
+        return {
+            **self.status,
+            "running": self.is_running,
+            "progress": self.current.progress if self.current else None,
+        }
+
+
+backtest_runner = BacktestRunner()
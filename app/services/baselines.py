@@ -0,0 +1,317 @@
+"""
+Seasonal baselines: hour-of-week latency and error-rate profiles per pipeline
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import case, delete, insert, select
+
+from app.database import AsyncSessionLocal, engine
+from app.models import HealthCheck, HealthStatus, Pipeline, SeasonalBaseline
+from app.config import get_settings
+from app.services.leader import LeaderElector
+
+settings = get_settings()
+
+SLOTS = 7 * 24  # hour-of-week, Monday 00:00 UTC first
+MEDIAN, SCALE, ERROR_RATE, SAMPLES = range(4)
+
+_HOUR_MICROS = 3600 * 1_000_000
+_EPOCH = datetime(1970, 1, 1)
+_MAD_TO_STD = 1.4826  # MAD of a normal distribution times this is its standard deviation
+
+
+def slot_of(ts: datetime) -> int:
+    return ts.weekday() * 24 + ts.hour
+
+
+def slots_of(micros: np.ndarray) -> np.ndarray:
+    hours = micros // _HOUR_MICROS
+    # 1970-01-01 was a Thursday
+    return ((hours // 24 + 3) % 7) * 24 + hours % 24
+
+
+def _grouped_median(values: np.ndarray, starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Median of each run values[start:start + count]; every run sorted, empty runs give NaN"""
+    medians = np.full(len(counts), np.nan)
+    present = counts > 0
+    lower = starts[present] + (counts[present] - 1) // 2
+    upper = starts[present] + counts[present] // 2
+    medians[present] = (values[lower] + values[upper]) / 2
+    return medians
+
+
+def build_profile(micros: np.ndarray, latency: np.ndarray, failed: np.ndarray) -> np.ndarray:
+    """
+    One pipeline's profile from its checks: a (4, SLOTS) float32 array of
+    latency median, MAD-based scale, error rate (%) and latency sample count
+    per hour-of-week slot. Slots with fewer than ANOMALY_BASELINE_MIN_SAMPLES
+    checks are NaN and fall back to the streaming baseline.
+    """
+    slots = slots_of(micros)
+    profile = np.full((4, SLOTS), np.nan)
+    min_samples = settings.ANOMALY_BASELINE_MIN_SAMPLES
+
+    checks = np.bincount(slots, minlength=SLOTS)
+    failures = np.bincount(slots, weights=failed, minlength=SLOTS)
+    enough = checks >= min_samples
+    profile[ERROR_RATE, enough] = failures[enough] / checks[enough] * 100
+
+    measured = ~np.isnan(latency)
+    slots, latency = slots[measured], latency[measured]
+    order = np.lexsort((latency, slots))
+    slots, latency = slots[order], latency[order]
+    counts = np.bincount(slots, minlength=SLOTS)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    medians = _grouped_median(latency, starts, counts)
+    # slots is sorted, so sorting deviations within it keeps each run in place
+    deviations = np.abs(latency - medians[slots])
+    deviations = deviations[np.lexsort((deviations, slots))]
+    scale = _grouped_median(deviations, starts, counts) * _MAD_TO_STD
+    # Perfectly steady latencies would make any change infinitely unusual
+    scale = np.maximum(scale, np.maximum(0.01 * np.abs(medians), 1e-6))
+
+    enough = counts >= min_samples
+    profile[MEDIAN, enough] = medians[enough]
+    profile[SCALE, enough] = scale[enough]
+    profile[SAMPLES] = counts
+    return profile.astype(np.float32)
+
+
+async def stream_checks(
+        pipeline_ids: List[int],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        chunk_size: int = None
+) -> AsyncIterator[Tuple[int, np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Yield (pipeline id, checked_at as epoch micros, response time with NaN
+    for missing, 1.0 for a non-healthy check) arrays per pipeline, in
+    checked_at order. Rows come through a server-side cursor `chunk_size`
+    at a time, so only one pipeline's checks are held in memory.
+    """
+    stmt = (
+        select(
+            HealthCheck.pipeline_id,
+            HealthCheck.checked_at,
+            HealthCheck.response_time_ms,
+            case((HealthCheck.status == HealthStatus.HEALTHY, 0), else_=1),
+        )
+        .where(HealthCheck.pipeline_id.in_(pipeline_ids))
+        .order_by(HealthCheck.pipeline_id, HealthCheck.checked_at)
+        .execution_options(yield_per=chunk_size or settings.ANOMALY_BASELINE_CHUNK)
+    )
+    if since is not None:
+        stmt = stmt.where(HealthCheck.checked_at >= since)
+    if until is not None:
+        stmt = stmt.where(HealthCheck.checked_at < until)
+
+    current, parts = None, []
+
+    def joined():
+        micros, latency, failed = (np.concatenate(column) for column in zip(*parts))
+        return current, micros, latency, failed
+
+    async with engine.connect() as conn:
+        result = await conn.stream(stmt)
+        async for rows in result.partitions():
+            ids, checked_at, latency, failed = zip(*rows)
+            ids = np.array(ids, dtype=np.int64)
+            micros = (np.array(checked_at, dtype="datetime64[us]") - np.datetime64(_EPOCH, "us")).astype(np.int64)
+            latency = np.array(latency, dtype=np.float64)  # None becomes NaN
+            failed = np.array(failed, dtype=np.float64)
+
+            bounds = [0, *(np.flatnonzero(np.diff(ids)) + 1).tolist(), len(ids)]
+            for start, end in zip(bounds, bounds[1:]):
+                if ids[start] != current:
+                    if parts:
+                        yield joined()
+                    current, parts = int(ids[start]), []
+                parts.append((micros[start:end], latency[start:end], failed[start:end]))
+    if parts:
+        yield joined()
+
+
+class SeasonalBaselines:
+    """
+    Profiles of the pipelines this process scores, loaded from
+    seasonal_baselines and refreshed whenever the build job has written
+    newer ones. `lookup()` is a single array index per check.
+    """
+
+    def __init__(self):
+        self.profiles: Dict[int, np.ndarray] = {}
+        self._built_at: Dict[int, datetime] = {}
+
+    def lookup(self, pipeline_id: int, ts: datetime) -> Optional[Tuple[float, float, float]]:
+        """(median ms, scale ms, error rate %) of the check's slot; NaN where history is thin"""
+        profile = self.profiles.get(pipeline_id)
+        if profile is None:
+            return None
+        median, scale, error_rate, _ = profile[:, slot_of(ts)].tolist()
+        return median, scale, error_rate
+
+    async def refresh(self, pipeline_ids: Iterable[int], prune: bool = True):
+        """Load profiles of `pipeline_ids` that are new or were rebuilt; with `prune`, track exactly those"""
+        wanted = set(pipeline_ids)
+        stmt = select(SeasonalBaseline.pipeline_id, SeasonalBaseline.built_at)
+        if prune:
+            for pipeline_id in set(self.profiles) - wanted:
+                self.remove(pipeline_id)
+        else:
+            stmt = stmt.where(SeasonalBaseline.pipeline_id.in_(wanted))
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(stmt)
+            stale = [
+                pipeline_id for pipeline_id, built_at in result.all()
+                if pipeline_id in wanted and self._built_at.get(pipeline_id) != built_at
+            ]
+            if not stale:
+                return
+            result = await db.execute(
+                select(SeasonalBaseline.pipeline_id, SeasonalBaseline.profile, SeasonalBaseline.built_at)
+                .where(SeasonalBaseline.pipeline_id.in_(stale))
+            )
+            for pipeline_id, profile, built_at in result.all():
+                self.profiles[pipeline_id] = np.frombuffer(profile, dtype=np.float32).reshape(4, SLOTS)
+                self._built_at[pipeline_id] = built_at
+
+    def remove(self, pipeline_id: int):
+        self.profiles.pop(pipeline_id, None)
+        self._built_at.pop(pipeline_id, None)
+
+    def reset(self):
+        self.profiles.clear()
+        self._built_at.clear()
+
+
+class BaselineJob:
+    """
+    Rebuilds every active pipeline's profile from the last
+    ANOMALY_BASELINE_DAYS of raw checks in a single pass: pipelines are
+    taken ANOMALY_BASELINE_BATCH at a time, their checks streamed in
+    pipeline order through a server-side cursor and each profile computed
+    with array operations as soon as its rows are in. A build reaching
+    past RAW_RETENTION_DAYS is refused rather than silently profiled from
+    fewer days than it claims.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._run_requested = asyncio.Event()
+        self.status = {
+            "last_started_at": None,
+            "last_finished_at": None,
+            "last_error": None,
+            "pipelines": 0,
+            "checks": 0,
+        }
+
+    @property
+    def is_running(self) -> bool:
+        return self._lock.locked()
+
+    def request_run(self):
+        """Have the scheduled loop start its next build now"""
+        self._run_requested.set()
+
+    async def run(self):
+        """Rebuild baselines every ANOMALY_BASELINE_INTERVAL seconds, or sooner when asked"""
+        while True:
+            self._run_requested.clear()
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Baseline build failed: {e}")
+            try:
+                await asyncio.wait_for(self._run_requested.wait(), settings.ANOMALY_BASELINE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_once(self, now: Optional[datetime] = None):
+        async with self._lock:
+            now = now or datetime.utcnow()
+            since = now - timedelta(days=settings.ANOMALY_BASELINE_DAYS)
+            status = self.status
+            status.update(last_started_at=now, last_error=None, pipelines=0, checks=0)
+            try:
+                if settings.ANOMALY_BASELINE_DAYS > settings.RAW_RETENTION_DAYS:
+                    raise ValueError(
+                        f"ANOMALY_BASELINE_DAYS={settings.ANOMALY_BASELINE_DAYS} reaches past "
+                        f"RAW_RETENTION_DAYS={settings.RAW_RETENTION_DAYS}; checks that old are deleted"
+                    )
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(
+                        select(Pipeline.id).where(Pipeline.is_active == True).order_by(Pipeline.id)
+                    )
+                    pipeline_ids = result.scalars().all()
+
+                batch_size = settings.ANOMALY_BASELINE_BATCH
+                for offset in range(0, len(pipeline_ids), batch_size):
+                    batch = pipeline_ids[offset:offset + batch_size]
+                    profiles = await self._build(batch, since)
+                    await self._save(profiles, since, now)
+                    status["pipelines"] += len(profiles)
+            except Exception as e:
+                status["last_error"] = str(e)
+                raise
+            finally:
+                status["last_finished_at"] = datetime.utcnow()
+
+            print(f"Seasonal baselines: {status['pipelines']} pipelines from {status['checks']} checks")
+
+    async def _build(self, pipeline_ids: List[int], since: datetime) -> Dict[int, np.ndarray]:
+        # Rows are written only after the cursor closes, so SQLite never sees
+        # a writer waiting on this reader
+        profiles = {}
+        async for pipeline_id, micros, latency, failed in stream_checks(pipeline_ids, since):
+            profiles[pipeline_id] = build_profile(micros, latency, failed)
+            self.status["checks"] += len(micros)
+        return profiles
+
+    async def _save(self, profiles: Dict[int, np.ndarray], since: datetime, now: datetime):
+        if not profiles:
+            return
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                delete(SeasonalBaseline).where(SeasonalBaseline.pipeline_id.in_(list(profiles)))
+            )
+            await db.execute(insert(SeasonalBaseline), [
+                {"pipeline_id": pipeline_id, "profile": profile.tobytes(),
+                 "history_since": since, "built_at": now}
+                for pipeline_id, profile in profiles.items()
+            ])
+            await db.commit()
+
+    async def profile(self, pipeline_id: int) -> Optional[dict]:
+        """A pipeline's stored profile as lists indexed by hour-of-week slot"""
+        async with AsyncSessionLocal() as db:
+            row = (await db.execute(
+                select(SeasonalBaseline).where(SeasonalBaseline.pipeline_id == pipeline_id)
+            )).scalar_one_or_none()
+        if row is None:
+            return None
+        profile = np.frombuffer(row.profile, dtype=np.float32).reshape(4, SLOTS)
+
+        def values(index, digits=2):
+            return [None if np.isnan(value) else round(float(value), digits) for value in profile[index]]
+
+        return {
+            "pipeline_id": pipeline_id,
+            "built_at": row.built_at,
+            "history_since": row.history_since,
+            "median_ms": values(MEDIAN),
+            "scale_ms": values(SCALE),
+            "error_rate": values(ERROR_RATE),
+            "samples": [int(value) for value in profile[SAMPLES]],
+        }
+
+
+# Global baselines: the store scores checks in the worker, the job rebuilds them in one process
+seasonal_baselines = SeasonalBaselines()
+baseline_job = BaselineJob()
+baseline_elector = LeaderElector("baselines")
@@ -1,70 +1,535 @@
 """
-Redis caching service with graceful fallback
+Two-tier cache: in-process LRU in front of Redis, with graceful fallback
 """
+import asyncio
+import inspect
 import json
-from typing import Optional, Any
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel
+
 from app.config import get_settings
+from app.services.cache_codec import CacheCodec
 
 settings = get_settings()
 
+_MISSING = object()
+_GENERATION_PREFIX = "cache:generation:"
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+class LocalCache:
+    """
+    Size-bounded LRU of decoded values. Each entry is fresh until its TTL
+    and may then be served stale for a while longer by `get_or_set()`.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # key -> (value, fresh until, stale until) on the monotonic clock
+        self._entries: "OrderedDict[str, Tuple[Any, float, float]]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, key: str) -> Tuple[Any, bool]:
+        """(value, fresh); value is _MISSING when absent or past its stale window"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING, False
+        value, fresh_until, stale_until = entry
+        now = time.monotonic()
+        if now >= stale_until:
+            del self._entries[key]
+            return _MISSING, False
+        self._entries.move_to_end(key)
+        return value, now < fresh_until
+
+    def set(self, key: str, value: Any, ttl: float, stale_ttl: float = 0):
+        now = time.monotonic()
+        self._entries[key] = (value, now + ttl, now + ttl + stale_ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class EventBus:
+    """
+    Events every replica applies to its own in-process state (caches,
+    dashboard view, recent checks, schedulers). `publish()` runs this
+    process's handlers right away and, with Redis connected, sends the
+    event over pub/sub to every other replica, whose listener runs theirs.
+    Without Redis it is an in-process loopback, which is all a single node
+    needs.
+
+    `connected` is True only while the pub/sub subscription is up; events
+    published while it is down are lost, so `on_reconnect` callbacks run
+    after a reconnect to drop whatever state may have missed one.
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self.redis_client: Optional[Any] = None
+        self.connected = False
+        self.on_reconnect: List[Callable[[], None]] = []
+        self._handlers: Dict[str, List[Tuple[Callable, bool]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {"published": 0, "received": 0}
+
+    def subscribe(self, event_type: str, handler: Callable[[dict], Any], remote_only: bool = False):
+        """Run `handler(data)` (plain or async) for every `event_type` event, or only other replicas' ones"""
+        self._handlers.setdefault(event_type, []).append((handler, remote_only))
+
+    def unsubscribe(self, event_type: str, handler: Callable[[dict], Any]):
+        self._handlers[event_type] = [
+            entry for entry in self._handlers.get(event_type, []) if entry[0] != handler
+        ]
+
+    async def publish(self, event_type: str, data: dict):
+        self.counters["published"] += 1
+        await self._dispatch(event_type, data, remote=False)
+        if self.redis_client is None:
+            return
+        try:
+            message = json.dumps({"type": event_type, "origin": self.origin, "data": data}, default=_default)
+            await self.redis_client.publish(self.channel, message)
+        except Exception as e:
+            print(f"Event publish error: {e}")
+
+    async def _dispatch(self, event_type: str, data: dict, remote: bool):
+        for handler, remote_only in list(self._handlers.get(event_type, [])):
+            if remote_only and not remote:
+                continue
+            try:
+                result = handler(data)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"Event handler for {event_type} failed: {e}")
+
+    def start(self, redis_client):
+        self.redis_client = redis_client
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.redis_client = None
+
+    async def _listen(self):
+        lost = False
+        while True:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                self.connected = True
+                if lost:
+                    for callback in self.on_reconnect:
+                        callback()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    event = json.loads(message["data"])
+                    if event["origin"] == self.origin:
+                        continue
+                    self.counters["received"] += 1
+                    await self._dispatch(event["type"], event["data"], remote=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Event bus connection lost: {e}")
+            finally:
+                self.connected = False
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            lost = True
+            await asyncio.sleep(1)
+
+
 class CacheService:
+    """
+    Values are cached in this process (L1) and in Redis (L2, shared). With
+    Redis down the L1 keeps working on its own. While the event bus is
+    subscribed, invalidations from every replica arrive as they happen and
+    L1 entries live as long as their TTL; otherwise at most
+    CACHE_L1_TTL_SECONDS, so other replicas' writes show up soon.
+
+    `get_or_set()` computes a missing value once however many requests ask
+    for it at the same time, and keeps serving an expired value for up to
+    `stale_ttl` seconds while a single background refresh replaces it.
+
+    Keys built with `tagged()` carry the current generation of each of
+    their tags, so `invalidate(tag)` retires every key of the family with
+    one INCR shared by all replicas; the old entries simply expire.
+    Generations are remembered in-process for as long as L1 entries.
+    """
+
     def __init__(self):
         self.redis_client: Optional[Any] = None
         self.redis_available = False
-    
+        self.local = LocalCache(settings.CACHE_L1_MAX_ENTRIES)
+        self.codec = CacheCodec()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshes = set()
+        # tag -> (generation, known until on the monotonic clock)
+        self._generations: Dict[str, Tuple[int, float]] = {}
+        self.counters = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "coalesced": 0, "stale_served": 0}
+        self.events = EventBus(settings.CACHE_EVENTS_CHANNEL)
+        self.events.subscribe("invalidate", self._apply_invalidation, remote_only=True)
+        self.events.on_reconnect.append(self._forget_local)
+
     async def connect(self):
         """Connect to Redis - gracefully fail if not available"""
         try:
             import redis.asyncio as redis
             self.redis_client = await redis.from_url(
                 settings.REDIS_URL,
-                encoding="utf-8",
-                decode_responses=True,
+                # Values are codec bytes; generations and events decode themselves
+                decode_responses=False,
                 socket_connect_timeout=2
             )
             # Test connection
             await self.redis_client.ping()
             self.redis_available = True
+            self.events.start(self.redis_client)
             print("Redis connected successfully")
         except Exception as e:
             print(f" Redis not available: {e}")
-            print("   Cache will be disabled (app will still work)")
+            print("   Caching in-process only (app will still work)")
             self.redis_client = None
             self.redis_available = False
-    
+
+    async def close(self):
+        await self.events.stop()
+
+    def _local_ttl(self, ttl: int) -> float:
+        if self.events.connected:
+            return ttl
+        return min(ttl, settings.CACHE_L1_TTL_SECONDS)
+
+    def _forget_local(self):
+        """Invalidations may have been missed; start over from Redis"""
+        self.local.clear()
+        self._generations.clear()
+
     async def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
+        value, fresh = self.local.lookup(key)
+        if value is not _MISSING and fresh:
+            self.counters["l1_hits"] += 1
+            return value
+
+        value = await self._get_remote(key)
+        if value is None:
+            self.counters["misses"] += 1
+            return None
+        self.counters["l2_hits"] += 1
+        return value
+
+    async def _get_remote(self, key: str) -> Optional[Any]:
         if not self.redis_available or not self.redis_client:
             return None
-        
+
         try:
-            value = await self.redis_client.get(key)
-            return json.loads(value) if value else None
+            # Value and remaining TTL in one round trip
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                value, ttl = await pipe.get(key).ttl(key).execute()
+            if not value:
+                return None
+            value = self.codec.decode(value)
         except Exception as e:
             print(f"Cache get error: {e}")
             return None
-    
-    async def set(self, key: str, value: Any, ttl: int = None):
+
+        if ttl and ttl > 0:
+            self.local.set(key, value, self._local_ttl(ttl))
+        return value
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """Values of `keys` in order (None when missing), with one Redis round trip for all L1 misses"""
+        values: List[Optional[Any]] = [None] * len(keys)
+        remote = []
+        for i, key in enumerate(keys):
+            value, fresh = self.local.lookup(key)
+            if value is not _MISSING and fresh:
+                self.counters["l1_hits"] += 1
+                values[i] = value
+            else:
+                remote.append(i)
+
+        if remote and self.redis_available and self.redis_client:
+            try:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    for i in remote:
+                        pipe.get(keys[i]).ttl(keys[i])
+                    replies = await pipe.execute()
+            except Exception as e:
+                print(f"Cache get error: {e}")
+                replies = []
+            for i, data, ttl in zip(remote, replies[::2], replies[1::2]):
+                if not data:
+                    continue
+                try:
+                    values[i] = self.codec.decode(data)
+                except Exception as e:
+                    print(f"Cache decode error for {keys[i]}: {e}")
+                    continue
+                if ttl and ttl > 0:
+                    self.local.set(keys[i], values[i], self._local_ttl(ttl))
+
+        for i in remote:
+            self.counters["l2_hits" if values[i] is not None else "misses"] += 1
+        return values
+
+    async def set(self, key: str, value: Any, ttl: int = None, stale_ttl: int = 0):
         """Set value in cache"""
+        ttl = ttl or settings.CACHE_TTL_SECONDS
+        self.local.set(key, value, self._local_ttl(ttl), stale_ttl)
+
         if not self.redis_available or not self.redis_client:
             return
-        
+
         try:
-            ttl = ttl or settings.CACHE_TTL_SECONDS
-            serialized = json.dumps(value, default=str)
-            await self.redis_client.setex(key, ttl, serialized)
+            await self.redis_client.setex(key, ttl, self.codec.encode(value))
         except Exception as e:
             print(f"Cache set error: {e}")
-    
+
+    async def set_many(self, items: Dict[str, Any], ttl: int = None):
+        """Set several keys with one Redis round trip"""
+        ttl = ttl or settings.CACHE_TTL_SECONDS
+        for key, value in items.items():
+            self.local.set(key, value, self._local_ttl(ttl))
+
+        if not items or not self.redis_available or not self.redis_client:
+            return
+
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.setex(key, ttl, self.codec.encode(value))
+                await pipe.execute()
+        except Exception as e:
+            print(f"Cache set error: {e}")
+
     async def delete(self, key: str):
         """Delete key from cache"""
+        self.local.delete(key)
+
         if not self.redis_available or not self.redis_client:
             return
-        
+
         try:
             await self.redis_client.delete(key)
         except Exception as e:
             print(f"Cache delete error: {e}")
 
+    async def get_or_set(
+            self,
+            key: str,
+            compute: Callable[[], Awaitable[Any]],
+            ttl: int = None,
+            stale_ttl: int = None
+    ) -> Any:
+        """
+        Cached value of `key`, else the result of `compute()`, which must not
+        depend on the calling request (it may run after the request is done)
+        """
+        ttl = ttl or settings.CACHE_TTL_SECONDS
+        stale_ttl = settings.CACHE_STALE_SECONDS if stale_ttl is None else stale_ttl
+
+        value, fresh = self.local.lookup(key)
+        if value is not _MISSING:
+            if fresh:
+                self.counters["l1_hits"] += 1
+            else:
+                self.counters["stale_served"] += 1
+                self._refresh_in_background(key, compute, ttl, stale_ttl)
+            return value
+
+        return await self._load(key, compute, ttl, stale_ttl)
+
+    async def _load(self, key: str, compute, ttl: int, stale_ttl: int) -> Any:
+        """Single flight: concurrent callers for one key share the first caller's load"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.counters["coalesced"] += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The loading request went away; load it ourselves
+                return await self._load(key, compute, ttl, stale_ttl)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._get_remote(key)
+            if value is not None:
+                self.counters["l2_hits"] += 1
+                # Keep serving it a while past the L1 TTL while a refresh runs
+                self.local.set(key, value, self._local_ttl(ttl), stale_ttl)
+            else:
+                self.counters["misses"] += 1
+                value = await compute()
+                await self.set(key, value, ttl, stale_ttl)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieve it so an unawaited failure isn't reported at garbage collection
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def _refresh_in_background(self, key: str, compute, ttl: int, stale_ttl: int):
+        if key in self._inflight:
+            return
+
+        async def refresh():
+            try:
+                await self._load(key, compute, ttl, stale_ttl)
+            except Exception as e:
+                print(f"Cache refresh of {key} failed: {e}")
+
+        task = asyncio.create_task(refresh())
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    async def tagged(self, key: str, *tags: str) -> str:
+        """`key` versioned by the generation of every tag it depends on"""
+        generations = await self._get_generations(tags)
+        return key + "#" + ",".join(f"{tag}={generation}" for tag, generation in zip(tags, generations))
+
+    async def _get_generations(self, tags: Iterable[str]) -> List[int]:
+        tags = list(tags)
+        now = time.monotonic()
+        known = {}
+        for tag in tags:
+            entry = self._generations.get(tag)
+            if entry is not None and (now < entry[1] or not self.redis_available):
+                known[tag] = entry[0]
+
+        missing = [tag for tag in tags if tag not in known]
+        if missing and self.redis_available and self.redis_client:
+            try:
+                values = await self.redis_client.mget([_GENERATION_PREFIX + tag for tag in missing])
+            except Exception as e:
+                print(f"Cache generation read error: {e}")
+                values = [None] * len(missing)
+            for tag, value in zip(missing, values):
+                known[tag] = int(value or 0)
+                self._generations[tag] = (known[tag], now + self._local_ttl(settings.CACHE_TTL_SECONDS))
+        return [known.get(tag, 0) for tag in tags]
+
+    async def invalidate(self, *tags: str):
+        """Retire every key built with any of `tags`"""
+        if not tags:
+            return
+        generations = None
+        if self.redis_available and self.redis_client:
+            try:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    for tag in tags:
+                        pipe.incr(_GENERATION_PREFIX + tag)
+                    generations = [int(generation) for generation in await pipe.execute()]
+            except Exception as e:
+                print(f"Cache invalidate error: {e}")
+        if generations is None:
+            generations = [self._generations.get(tag, (0, 0))[0] + 1 for tag in tags]
+        self._apply_invalidation({"generations": dict(zip(tags, generations))})
+        await self.events.publish("invalidate", {"generations": dict(zip(tags, generations))})
+
+    def _apply_invalidation(self, data: dict):
+        lifetime = self._local_ttl(settings.CACHE_TTL_SECONDS)
+        now = time.monotonic()
+        for tag, generation in data["generations"].items():
+            current = self._generations.get(tag)
+            if current is None or generation >= current[0]:
+                self._generations[tag] = (generation, now + lifetime)
+
+    def stats(self) -> dict:
+        return {
+            "redis": self.redis_available,
+            "codec": self.codec.format,
+            "events_connected": self.events.connected,
+            **{f"events_{name}": count for name, count in self.events.counters.items()},
+            "local_entries": len(self.local),
+            "local_max_entries": self.local.max_entries,
+            **self.counters,
+        }
+
+
+class ResultInvalidator:
+    """
+    Result sink listener: when a committed batch changes a pipeline's status,
+    invalidates the cached pipeline, pipeline lists and dashboard metrics
+    that show it, and publishes a "status" event for other replicas.
+    Check-by-check details (last check time, today's counts) stay cached
+    until their TTL.
+    """
+
+    def __init__(self, cache: CacheService):
+        self.cache = cache
+        self._statuses: Dict[int, Any] = {}
+        self._tasks = set()
+
+    def apply(self, rows: Iterable[dict]):
+        tags = set()
+        transitions = []
+        for row in sorted(rows, key=lambda row: row["checked_at"]):
+            pipeline_id = row["pipeline_id"]
+            previous = self._statuses.get(pipeline_id)
+            if previous != row["status"]:
+                tags.update(("pipelines", f"pipeline:{pipeline_id}", "metrics"))
+                if previous is not None:
+                    transitions.append({
+                        "pipeline_id": pipeline_id,
+                        "status": row["status"],
+                        "previous_status": previous,
+                        "checked_at": row["checked_at"],
+                    })
+            self._statuses[pipeline_id] = row["status"]
+        if tags:
+            task = asyncio.create_task(self._publish(sorted(tags), transitions))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _publish(self, tags: List[str], transitions: List[dict]):
+        await self.cache.invalidate(*tags)
+        for transition in transitions:
+            await self.cache.events.publish("status", transition)
+
+    def reset(self):
+        self._statuses.clear()
+
+
 # Global cache service instance
-cache_service = CacheService()
\ No newline at end of file
+cache_service = CacheService()
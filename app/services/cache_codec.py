@@ -0,0 +1,142 @@
+"""
+Cache value encoding: JSON (orjson when installed) or msgpack, compressed above a size threshold
+"""
+import json
+import zlib
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Dict, Type
+
+from pydantic import BaseModel
+
+from app import schemas
+from app.config import get_settings
+
+settings = get_settings()
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Every value starts with two bytes: the format, then the compression
+_JSON, _MSGPACK = b"j", b"m"
+_PLAIN, _ZLIB, _ZSTD = b"-", b"z", b"s"
+
+_MODEL = "__model__"
+_DATETIME = "__datetime__"
+_DATE = "__date__"
+
+
+class CacheCodec:
+    """
+    Turns cached values into bytes and back. Pydantic models come back as
+    the same model class and datetimes as datetimes (both are tagged on the
+    way in), so a value read from Redis is the value that was cached.
+
+    Writes use the configured format; reads accept any format or
+    compression another replica may have written, and values written
+    before the header existed are read as plain JSON.
+    """
+
+    def __init__(self, format: str = None, compress_min_bytes: int = None):
+        format = format or settings.CACHE_CODEC
+        if format == "msgpack" and msgpack is None:
+            print(" CACHE_CODEC=msgpack but 'msgpack' is not installed, using JSON")
+            format = "json"
+        if format not in ("json", "msgpack"):
+            raise ValueError(f"Unknown cache codec {format!r}")
+        self.format = format
+        self.compress_min_bytes = (
+            settings.CACHE_COMPRESS_MIN_BYTES if compress_min_bytes is None else compress_min_bytes
+        )
+        self._models: Dict[str, Type[BaseModel]] = {
+            name: value for name, value in vars(schemas).items()
+            if isinstance(value, type) and issubclass(value, BaseModel) and value is not BaseModel
+        }
+        self._zstd_compressor = zstandard.ZstdCompressor(level=3) if zstandard else None
+        self._zstd_decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+    def register(self, model: Type[BaseModel]):
+        """Rebuild cached instances of `model` (models in app.schemas are registered already)"""
+        self._models[model.__name__] = model
+
+    def encode(self, value: Any) -> bytes:
+        if self.format == "msgpack":
+            header, body = _MSGPACK, msgpack.packb(value, default=self._tag, use_bin_type=True)
+        elif orjson is not None:
+            header, body = _JSON, orjson.dumps(
+                value, default=self._tag,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+            )
+        else:
+            header, body = _JSON, json.dumps(value, default=self._tag, separators=(",", ":")).encode()
+
+        if len(body) >= self.compress_min_bytes:
+            if self._zstd_compressor is not None:
+                compressed, compression = self._zstd_compressor.compress(body), _ZSTD
+            else:
+                compressed, compression = zlib.compress(body, 1), _ZLIB
+            if len(compressed) < len(body):
+                return header + compression + compressed
+        return header + _PLAIN + body
+
+    def decode(self, data: bytes) -> Any:
+        header, compression, body = data[:1], data[1:2], data[2:]
+        if header not in (_JSON, _MSGPACK):
+            return json.loads(data)
+
+        if compression == _ZSTD:
+            if self._zstd_decompressor is None:
+                raise ValueError("Cached value is zstd-compressed but 'zstandard' is not installed")
+            body = self._zstd_decompressor.decompress(body)
+        elif compression == _ZLIB:
+            body = zlib.decompress(body)
+
+        if header == _MSGPACK:
+            if msgpack is None:
+                raise ValueError("Cached value is msgpack but 'msgpack' is not installed")
+            return msgpack.unpackb(body, object_hook=self._untag, raw=False, strict_map_key=False)
+        if orjson is None:
+            return json.loads(body, object_hook=self._untag)
+        value = orjson.loads(body)
+        # Only walk the value when something in it was tagged
+        return self._untag_all(value) if b'"__' in body else value
+
+    def _tag(self, value: Any) -> Any:
+        if isinstance(value, BaseModel):
+            return {_MODEL: type(value).__name__, "fields": value.model_dump(mode="json")}
+        if isinstance(value, datetime):
+            return {_DATETIME: value.isoformat()}
+        if isinstance(value, date):
+            return {_DATE: value.isoformat()}
+        if isinstance(value, Enum):
+            return value.value
+        return str(value)
+
+    def _untag(self, value: dict) -> Any:
+        if _MODEL in value:
+            model = self._models.get(value[_MODEL])
+            return model.model_validate(value["fields"]) if model is not None else value["fields"]
+        if _DATETIME in value:
+            return datetime.fromisoformat(value[_DATETIME])
+        if _DATE in value:
+            return date.fromisoformat(value[_DATE])
+        return value
+
+    def _untag_all(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            return self._untag({key: self._untag_all(item) for key, item in value.items()})
+        if isinstance(value, list):
+            return [self._untag_all(item) for item in value]
+        return value
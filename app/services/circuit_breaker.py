@@ -0,0 +1,72 @@
+"""
+Per-pipeline circuit breaker that backs off checks of failing endpoints
+"""
+from app.models import CircuitState
+from app.config import get_settings
+
+settings = get_settings()
+
+
+class CircuitBreaker:
+    """
+    CLOSED: checks run on the pipeline's own interval.
+    OPEN: after CIRCUIT_FAILURE_THRESHOLD consecutive failures the interval
+          doubles with every further failure, capped at CIRCUIT_MAX_INTERVAL.
+    HALF_OPEN: the check that ends an OPEN wait is a probe with a short
+          timeout; success closes the breaker, failure reopens it.
+
+    After any status change the next CIRCUIT_CONFIRM_CHECKS checks run at
+    most CIRCUIT_CONFIRM_INTERVAL apart so the new status is confirmed quickly.
+    """
+
+    __slots__ = ("state", "consecutive_failures", "confirm_remaining")
+
+    def __init__(self, state: CircuitState = None, consecutive_failures: int = 0):
+        self.state = state or CircuitState.CLOSED
+        self.consecutive_failures = consecutive_failures or 0
+        self.confirm_remaining = 0
+
+    @property
+    def is_probe(self) -> bool:
+        return self.state == CircuitState.HALF_OPEN
+
+    def before_check(self):
+        """Called when a check is dispatched; an expired OPEN wait becomes a probe"""
+        if self.state == CircuitState.OPEN:
+            self.state = CircuitState.HALF_OPEN
+
+    def check_timeout(self, timeout: float) -> float:
+        if self.is_probe:
+            return min(timeout, settings.CIRCUIT_PROBE_TIMEOUT)
+        return timeout
+
+    def record(self, success: bool, status_changed: bool = False) -> bool:
+        """Update state from a check result; returns True when the state changed"""
+        previous = self.state
+
+        if success:
+            self.consecutive_failures = 0
+            self.state = CircuitState.CLOSED
+        else:
+            self.consecutive_failures += 1
+            if (self.state == CircuitState.HALF_OPEN
+                    or self.consecutive_failures >= settings.CIRCUIT_FAILURE_THRESHOLD):
+                self.state = CircuitState.OPEN
+
+        if status_changed:
+            self.confirm_remaining = settings.CIRCUIT_CONFIRM_CHECKS
+
+        return self.state != previous
+
+    def next_interval(self, base_interval: float) -> float:
+        """Seconds until the next check given the pipeline's configured interval"""
+        if self.state == CircuitState.OPEN:
+            exponent = self.consecutive_failures - settings.CIRCUIT_FAILURE_THRESHOLD + 1
+            backoff = base_interval * (2 ** min(exponent, 16))
+            return max(base_interval, min(backoff, settings.CIRCUIT_MAX_INTERVAL))
+
+        if self.confirm_remaining > 0:
+            self.confirm_remaining -= 1
+            return min(base_interval, settings.CIRCUIT_CONFIRM_INTERVAL)
+
+        return base_interval
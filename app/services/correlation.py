@@ -0,0 +1,228 @@
+"""
+Groups pipeline failures that share a cause into outage digests
+"""
+import asyncio
+import re
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from app.models import HealthCheck
+from app.config import get_settings
+
+settings = get_settings()
+
+# Pipelines named in one message; the rest are only counted
+_MAX_NAMES = 20
+
+_QUOTED = re.compile(r"'[^']*'|\"[^\"]*\"")
+_NUMBER = re.compile(r"\d+")
+
+# (owner team, endpoint host, error signature)
+GroupKey = Tuple[str, str, str]
+
+
+def error_signature(health_check: HealthCheck) -> str:
+    """The status and error with variable parts (numbers, quoted values) blanked, so one cause maps to one string"""
+    status = health_check.status.value.upper()
+    if health_check.status_code is not None:
+        return f"{status} HTTP {health_check.status_code}"
+    message = _NUMBER.sub("#", _QUOTED.sub("'…'", health_check.error_message or "no response"))
+    return f"{status} {message[:120]}"
+
+
+def _host(url: str) -> str:
+    try:
+        return urlsplit(url).hostname or ""
+    except ValueError:
+        return ""
+
+
+def _names(names: List[str]) -> str:
+    listed = ", ".join(names[:_MAX_NAMES])
+    if len(names) > _MAX_NAMES:
+        listed += f" and {len(names) - _MAX_NAMES} more"
+    return listed
+
+
+class _Outage:
+    __slots__ = ("key", "status", "severity", "since", "members", "joined", "recovered",
+                 "announced", "digest", "timer", "active_at")
+
+    def __init__(self, key: GroupKey, status: str, severity: str, since: datetime):
+        self.key = key
+        self.status = status
+        self.severity = severity
+        self.since = since
+        self.members: Dict[int, str] = {}   # unhealthy pipelines, id -> name
+        self.joined: Dict[int, dict] = {}   # alerts held since the last message
+        self.recovered: List[str] = []      # names recovered since the last message
+        self.announced = False
+        self.digest = False
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.active_at = time.monotonic()  # last join or recovery
+
+
+class OutageCorrelator:
+    """
+    Holds each pipeline's status alert for ALERT_CORRELATION_WINDOW_SECONDS
+    in a group keyed by owner team, endpoint host and error signature, then
+    emits one message per group: the pipeline's own alert when it failed
+    alone, otherwise a digest listing every affected pipeline.
+
+    A group stays open while any member is unhealthy. Later joins, and
+    recoveries once a digest went out, are batched into one update per
+    window, and a digest ends with an all-recovered message, so each group
+    costs at most one outgoing message per window. At most
+    ALERT_CORRELATION_MAX_GROUPS groups are open; alerts that would open
+    another go out on their own.
+
+    Pipelines deleted or no longer checked by this worker are released
+    without a message, and a group with no join or recovery for
+    ALERT_CORRELATION_IDLE_WINDOWS windows is forgotten.
+    """
+
+    def __init__(self, emit: Callable[[dict], None], window: float = None, max_groups: int = None,
+                 idle_windows: int = None):
+        self.emit = emit
+        self.window = settings.ALERT_CORRELATION_WINDOW_SECONDS if window is None else window
+        self.max_groups = max_groups or settings.ALERT_CORRELATION_MAX_GROUPS
+        self.idle_windows = idle_windows or settings.ALERT_CORRELATION_IDLE_WINDOWS
+        self._groups: Dict[GroupKey, _Outage] = {}
+        self._member_of: Dict[int, GroupKey] = {}
+        self.digests = 0
+
+    def __len__(self):
+        return len(self._groups)
+
+    def add(self, pipeline, health_check: HealthCheck, alert: dict) -> bool:
+        """Hold `alert` for its group; False when it should be sent on its own right away"""
+        if self.window <= 0:
+            return False
+        self._expire_idle()
+        key = (pipeline.owner_team or "", _host(pipeline.endpoint_url), error_signature(health_check))
+        group = self._groups.get(key)
+        if group is None:
+            if len(self._groups) >= self.max_groups:
+                self._leave(pipeline.id)
+                return False
+            group = self._groups[key] = _Outage(
+                key, health_check.status.value.upper(), alert["severity"], alert["triggered_at"]
+            )
+        if self._member_of.get(pipeline.id) != key:
+            self._leave(pipeline.id)
+        group.members[pipeline.id] = pipeline.name
+        group.joined[pipeline.id] = alert
+        group.active_at = time.monotonic()
+        self._member_of[pipeline.id] = key
+        self._schedule(group)
+        return True
+
+    def recovered(self, pipeline_id: int):
+        key = self._member_of.pop(pipeline_id, None)
+        if key is None:
+            return
+        group = self._groups[key]
+        group.recovered.append(group.members.pop(pipeline_id))
+        group.active_at = time.monotonic()
+        self._schedule(group)
+
+    def release(self, pipeline_ids: Iterable[int]):
+        """Drop pipelines from their groups, held alerts included, without reporting them recovered"""
+        for pipeline_id in pipeline_ids:
+            key = self._member_of.get(pipeline_id)
+            if key is not None:
+                self._groups[key].joined.pop(pipeline_id, None)
+                self._leave(pipeline_id)
+
+    def sync(self, pipeline_ids: Iterable[int]):
+        """Keep only the pipelines this worker checks, and forget idle groups"""
+        wanted = set(pipeline_ids)
+        self.release([pipeline_id for pipeline_id in self._member_of if pipeline_id not in wanted])
+        self._expire_idle()
+
+    def flush_all(self):
+        """Emit every pending message now and forget all groups (the worker is stopping)"""
+        for key in list(self._groups):
+            group = self._groups[key]
+            if group.timer is not None:
+                group.timer.cancel()
+                self._flush(key)
+        self._groups.clear()
+        self._member_of.clear()
+
+    def _leave(self, pipeline_id: int):
+        """A pipeline failing differently moves to another group without counting as recovered"""
+        key = self._member_of.pop(pipeline_id, None)
+        if key is None:
+            return
+        group = self._groups[key]
+        group.members.pop(pipeline_id, None)
+        if not group.members and group.timer is None:
+            del self._groups[key]
+
+    def _expire_idle(self):
+        cutoff = time.monotonic() - self.window * self.idle_windows
+        for key, group in list(self._groups.items()):
+            if group.timer is None and group.active_at < cutoff:
+                for pipeline_id in group.members:
+                    self._member_of.pop(pipeline_id, None)
+                del self._groups[key]
+
+    def _schedule(self, group: _Outage):
+        if group.timer is None:
+            group.timer = asyncio.get_running_loop().call_later(self.window, self._flush, group.key)
+
+    def _flush(self, key: GroupKey):
+        group = self._groups[key]
+        group.timer = None
+        joined, recovered = list(group.joined.values()), group.recovered
+        group.joined, group.recovered = {}, []
+        for alert in joined:
+            # Rows of pipelines that recovered within the window are stored resolved
+            alert["rows"] = [
+                (pipeline_id, dedupe_key, pipeline_id not in self._member_of)
+                for pipeline_id, dedupe_key, _ in alert["rows"]
+            ]
+
+        if not group.announced and len(joined) == 1:
+            self.emit(joined[0])
+        elif joined or (group.digest and recovered):
+            group.digest = True
+            self.digests += 1
+            self.emit(self._digest(group, joined, recovered))
+        group.announced = True
+
+        if not group.members:
+            del self._groups[key]
+
+    def _digest(self, group: _Outage, joined: List[dict], recovered: List[str]) -> dict:
+        team, host, signature = group.key
+        cause = [f"Error: {signature.split(' ', 1)[1]}"]
+        if host:
+            cause.insert(0, f"Host: {host}")
+        if team:
+            cause.insert(0, f"Team: {team}")
+
+        if not group.members:
+            title = "✅ Outage resolved: all pipelines recovered"
+        elif not group.announced:
+            title = f"🚨 Outage: {len(group.members)} pipelines {group.status}"
+        else:
+            title = f"🚨 Outage update: {len(group.members)} pipelines {group.status}"
+        lines = [title, " · ".join(cause)]
+        if joined:
+            label = "New" if group.announced else "Pipelines"
+            lines.append(f"{label}: {_names([group.members.get(a['pipeline_id'], a['name']) for a in joined])}")
+        if recovered:
+            lines.append(f"Recovered: {_names(recovered)}")
+        lines.append(f"Since: {group.since.strftime('%Y-%m-%d %H:%M:%S')}")
+
+        return {
+            "rows": [row for alert in joined for row in alert["rows"]],
+            "severity": group.severity if group.members else "info",
+            "message": "\n".join(lines),
+            "suppressed": False,
+            "triggered_at": datetime.utcnow(),
+        }
@@ -0,0 +1,218 @@
+"""
+In-memory materialized view of the dashboard numbers
+"""
+import asyncio
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models import HealthCheck, HealthCheckRollup, HealthStatus, Pipeline
+from app.schemas import DashboardStats
+from app.config import get_settings
+
+settings = get_settings()
+
+
+def _today() -> datetime:
+    return datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _status_count(status: HealthStatus):
+    return func.coalesce(func.sum(case((Pipeline.current_status == status, 1), else_=0)), 0)
+
+
+def _today_total(column, today: datetime):
+    return (
+        select(func.coalesce(func.sum(column), 0))
+        .where(HealthCheckRollup.resolution == "1d")
+        .where(HealthCheckRollup.bucket_start == today)
+        .scalar_subquery()
+    )
+
+
+async def query_dashboard(db: AsyncSession, today: datetime = None) -> dict:
+    """
+    Status counts and today's check totals in one statement: conditional
+    sums over pipelines plus scalar subqueries on today's 1d rollups. Also
+    returns the highest health check id, so a caller can tell which
+    results the snapshot already includes.
+    """
+    today = today or _today()
+    stmt = select(
+        func.count(Pipeline.id).label("total_pipelines"),
+        _status_count(HealthStatus.HEALTHY).label("healthy_pipelines"),
+        _status_count(HealthStatus.DEGRADED).label("degraded_pipelines"),
+        _status_count(HealthStatus.DOWN).label("down_pipelines"),
+        _today_total(HealthCheckRollup.check_count, today).label("checks_today"),
+        _today_total(HealthCheckRollup.latency_count, today).label("latency_count"),
+        _today_total(HealthCheckRollup.latency_sum, today).label("latency_sum"),
+        select(func.coalesce(func.max(HealthCheck.id), 0)).scalar_subquery().label("max_check_id"),
+    )
+    return (await db.execute(stmt)).one()._asdict()
+
+
+def to_stats(values: dict) -> DashboardStats:
+    latency_count = values["latency_count"]
+    return DashboardStats(
+        total_pipelines=values["total_pipelines"],
+        healthy_pipelines=values["healthy_pipelines"],
+        degraded_pipelines=values["degraded_pipelines"],
+        down_pipelines=values["down_pipelines"],
+        total_checks_today=values["checks_today"],
+        avg_response_time=round(values["latency_sum"] / latency_count, 2) if latency_count else 0.0
+    )
+
+
+class DashboardView:
+    """
+    Status counts and today's check totals kept current by the worker: the
+    result sink hands every committed batch to `apply()` and the pipelines
+    API reports creations and deletions. `stats()` then answers without
+    touching the database.
+
+    Every DASHBOARD_RECONCILE_INTERVAL seconds the view is rebuilt from
+    `query_dashboard()` to correct any drift. Results committed while that
+    query ran are replayed on top if their id is past the snapshot's.
+
+    Only the process running the worker sees every result, so elsewhere
+    `live` stays False and `stats()` returns None.
+    """
+
+    def __init__(self):
+        self.live = False
+        # pipeline id -> (current status, checked_at of the result that set it)
+        self._statuses: Dict[int, Tuple[HealthStatus, Optional[datetime]]] = {}
+        self._counts: Counter = Counter()
+        self._day: Optional[datetime] = None
+        self._checks_today = 0
+        self._latency_count = 0
+        self._latency_sum = 0.0
+        # Rows applied while a reconciliation query is in flight
+        self._during_reconcile: Optional[List[dict]] = None
+        self.last_reconciled_at: Optional[datetime] = None
+        self.last_drift: Dict[str, float] = {}
+
+    def apply(self, rows: Iterable[dict]):
+        """Fold in committed health check rows (sink listener)"""
+        rows = list(rows)
+        if self._during_reconcile is not None:
+            self._during_reconcile.extend(rows)
+        self._apply(rows)
+
+    def _apply(self, rows: List[dict]):
+        for row in rows:
+            checked_at = row["checked_at"]
+            day = checked_at.replace(hour=0, minute=0, second=0, microsecond=0)
+            if self._day is None or day > self._day:
+                self._start_day(day)
+            if day == self._day:
+                self._checks_today += 1
+                if row["response_time_ms"] is not None:
+                    self._latency_count += 1
+                    self._latency_sum += row["response_time_ms"]
+
+            # Deleted pipelines stay deleted; the database ignores their late results too
+            current = self._statuses.get(row["pipeline_id"])
+            if current is None or (current[1] is not None and checked_at < current[1]):
+                continue
+            self._set_status(row["pipeline_id"], row["status"], checked_at)
+
+    def _start_day(self, day: datetime):
+        self._day = day
+        self._checks_today = 0
+        self._latency_count = 0
+        self._latency_sum = 0.0
+
+    def _set_status(self, pipeline_id: int, status: HealthStatus, checked_at: Optional[datetime]):
+        previous = self._statuses.get(pipeline_id)
+        if previous is not None:
+            self._counts[previous[0]] -= 1
+        self._statuses[pipeline_id] = (status, checked_at)
+        self._counts[status] += 1
+
+    def pipeline_added(self, pipeline_id: int, status: HealthStatus = HealthStatus.UNKNOWN):
+        if pipeline_id not in self._statuses:
+            self._set_status(pipeline_id, status, None)
+
+    def pipeline_removed(self, pipeline_id: int):
+        """Drop a deleted pipeline's status; its checks leave today's totals at the next reconciliation"""
+        previous = self._statuses.pop(pipeline_id, None)
+        if previous is not None:
+            self._counts[previous[0]] -= 1
+
+    def stats(self) -> Optional[DashboardStats]:
+        if not self.live:
+            return None
+        today = _today()
+        current_day = self._day == today
+        return to_stats({
+            "total_pipelines": len(self._statuses),
+            "healthy_pipelines": self._counts[HealthStatus.HEALTHY],
+            "degraded_pipelines": self._counts[HealthStatus.DEGRADED],
+            "down_pipelines": self._counts[HealthStatus.DOWN],
+            "checks_today": self._checks_today if current_day else 0,
+            "latency_count": self._latency_count if current_day else 0,
+            "latency_sum": self._latency_sum if current_day else 0.0,
+        })
+
+    async def reconcile(self):
+        """Rebuild the view from the database and go live"""
+        before = self.stats()
+        self._during_reconcile = []
+        try:
+            today = _today()
+            async with AsyncSessionLocal() as db:
+                values = await query_dashboard(db, today)
+                result = await db.execute(
+                    select(Pipeline.id, Pipeline.current_status, Pipeline.last_check_time)
+                )
+                statuses = {
+                    pipeline_id: (status or HealthStatus.UNKNOWN, last_check_time)
+                    for pipeline_id, status, last_check_time in result.all()
+                }
+            missed = [row for row in self._during_reconcile if row["id"] > values["max_check_id"]]
+        finally:
+            self._during_reconcile = None
+
+        self._statuses = statuses
+        self._counts = Counter(status for status, _ in statuses.values())
+        self._day = today
+        self._checks_today = values["checks_today"]
+        self._latency_count = values["latency_count"]
+        self._latency_sum = values["latency_sum"]
+        self._apply(missed)
+        self.live = True
+        self.last_reconciled_at = datetime.utcnow()
+
+        if before is not None:
+            after = self.stats()
+            self.last_drift = {
+                field: getattr(after, field) - getattr(before, field)
+                for field in DashboardStats.model_fields
+                if getattr(after, field) != getattr(before, field)
+            }
+            if self.last_drift:
+                print(f"Dashboard view corrected by reconciliation: {self.last_drift}")
+
+    async def run(self):
+        """Reconcile every DASHBOARD_RECONCILE_INTERVAL seconds"""
+        while True:
+            await asyncio.sleep(settings.DASHBOARD_RECONCILE_INTERVAL)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                print(f"Dashboard reconciliation failed: {e}")
+
+    def reset(self):
+        self.live = False
+        self._statuses.clear()
+        self._counts.clear()
+        self._day = None
+
+
+# Global view, fed by the embedded worker
+dashboard_view = DashboardView()
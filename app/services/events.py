@@ -0,0 +1,166 @@
+"""
+In-process fan-out of live events (check results, status changes, dashboard counters)
+"""
+import asyncio
+import json
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.models import HealthStatus
+from app.schemas import HealthCheckResponse
+from app.config import get_settings
+from app.services.dashboard_view import DashboardView, dashboard_view
+
+settings = get_settings()
+
+# (event type, JSON payload)
+Event = Tuple[str, str]
+
+_CLOSED: Event = ("close", "")
+
+
+def encode(data) -> str:
+    return json.dumps(data, default=lambda value: value.isoformat() if isinstance(value, datetime) else str(value))
+
+
+class Subscription:
+    """
+    One client's queue of pending events, at most `maxsize` long: when a
+    slow client falls that far behind, the oldest events are dropped and
+    counted so the client can be told to refetch.
+
+    Watching a pipeline delivers that pipeline's check results and status
+    changes; otherwise status changes and dashboard counters for all.
+    """
+
+    def __init__(self, pipeline_id: Optional[int] = None, maxsize: int = None):
+        self.pipeline_id = pipeline_id
+        self._events: Deque[Event] = deque(maxlen=maxsize or settings.EVENTS_CLIENT_QUEUE_SIZE)
+        self._ready = asyncio.Event()
+        self.dropped = 0
+
+    def wants(self, event_type: str, pipeline_id: Optional[int]) -> bool:
+        if self.pipeline_id is None:
+            return event_type != "checks"
+        return pipeline_id == self.pipeline_id
+
+    def push(self, event: Event):
+        if len(self._events) == self._events.maxlen:
+            self.dropped += 1
+        self._events.append(event)
+        self._ready.set()
+
+    async def get(self, timeout: float) -> List[Event]:
+        """Every pending event, waiting up to `timeout` seconds for one; [] on timeout"""
+        if not self._events:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        events = list(self._events)
+        self._events.clear()
+        self._ready.clear()
+        return events
+
+
+class EventHub:
+    """
+    Turns the worker's committed results into events and hands each one to
+    every interested subscriber without waiting on any of them. Each event
+    is encoded once however many clients receive it.
+
+    `apply()` is a result sink listener; `seed()` gives it the statuses the
+    worker starts from so the first result of a pipeline can be told apart
+    from a change. `relay()` passes on status changes other processes
+    publish on the event bus, so every replica can stream those; check
+    results and dashboard counters only exist where the worker runs, and
+    `live` is False elsewhere.
+    """
+
+    def __init__(self, dashboard: Optional[DashboardView] = None):
+        self.live = False
+        self.dashboard = dashboard
+        self.subscribers: Set[Subscription] = set()
+        self._statuses: Dict[int, HealthStatus] = {}
+        self._dashboard_values: Dict[str, float] = {}
+        self.published = 0
+
+    def subscribe(self, pipeline_id: Optional[int] = None) -> Subscription:
+        subscription = Subscription(pipeline_id)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+
+    def publish(self, event_type: str, data, pipeline_id: Optional[int] = None):
+        event = None
+        for subscription in self.subscribers:
+            if subscription.wants(event_type, pipeline_id):
+                if event is None:
+                    event = (event_type, encode(data))
+                subscription.push(event)
+        self.published += 1
+
+    def relay(self, event: dict):
+        """Publish a status change another worker process found (event bus handler)"""
+        pipeline_id = event["pipeline_id"]
+        self._statuses[pipeline_id] = HealthStatus(event["status"])
+        self.publish("status", event, pipeline_id)
+
+    def seed(self, statuses: Iterable[Tuple[int, HealthStatus]]):
+        for pipeline_id, status in statuses:
+            self._statuses.setdefault(pipeline_id, status or HealthStatus.UNKNOWN)
+
+    def dashboard_snapshot(self) -> Optional[dict]:
+        stats = self.dashboard.stats() if self.dashboard is not None else None
+        return stats.model_dump() if stats is not None else None
+
+    def apply(self, rows: Iterable[dict]):
+        """Publish a committed batch: checks per watched pipeline, status changes, dashboard deltas"""
+        by_pipeline: Dict[int, List[dict]] = {}
+        for row in sorted(rows, key=lambda row: row["checked_at"]):
+            by_pipeline.setdefault(row["pipeline_id"], []).append(row)
+
+        watched = {s.pipeline_id for s in self.subscribers if s.pipeline_id is not None}
+        for pipeline_id, pipeline_rows in by_pipeline.items():
+            if pipeline_id in watched:
+                self.publish(
+                    "checks",
+                    [HealthCheckResponse.model_validate(row).model_dump(mode="json") for row in pipeline_rows],
+                    pipeline_id
+                )
+            latest = pipeline_rows[-1]
+            previous = self._statuses.get(pipeline_id)
+            self._statuses[pipeline_id] = latest["status"]
+            if previous is not None and previous != latest["status"]:
+                self.publish("status", {
+                    "pipeline_id": pipeline_id,
+                    "status": latest["status"],
+                    "previous_status": previous,
+                    "checked_at": latest["checked_at"],
+                }, pipeline_id)
+
+        values = self.dashboard_snapshot()
+        if values is not None:
+            changed = {
+                field: value for field, value in values.items()
+                if self._dashboard_values.get(field) != value
+            }
+            self._dashboard_values = values
+            if changed:
+                self.publish("dashboard", changed)
+
+    def reset(self):
+        """Stop producing and end every open stream, so clients reconnect and learn what is left"""
+        self.live = False
+        for subscription in self.subscribers:
+            subscription.push(_CLOSED)
+        self.subscribers.clear()
+        self._statuses.clear()
+        self._dashboard_values = {}
+
+
+# Global hub, fed by the embedded worker and the event bus
+event_hub = EventHub(dashboard=dashboard_view)
@@ -1,5 +1,4 @@
 import asyncio
-import httpx
 from datetime import datetime
 from sqlalchemy import select
 
@@ -7,102 +6,294 @@ from app.database import AsyncSessionLocal
 from app.models import Pipeline, HealthCheck, HealthStatus
 from app.config import get_settings
 from app.services.alerts import alert_service
+from app.services.anomaly_detector import anomaly_detector
+from app.services.cache import ResultInvalidator, cache_service
+from app.services.http_pool import CheckHttpClient
+from app.services.result_sink import ResultSink
+from app.services.scheduler import check_scheduler
 
 settings = get_settings()
 
 class HealthCheckWorker:
-    def __init__(self):
+    def __init__(self, scheduler=check_scheduler, shard=None, recent=None, dashboard=None, events=None):
         self.running = False
+        self.scheduler = scheduler
+        self.shard = shard
+        self.recent = recent
+        self.dashboard = dashboard
+        self.events = events
+        self.http = CheckHttpClient()
+        self.sink = ResultSink()
+        self.invalidator = ResultInvalidator(cache_service)
+        self.resync_requested = asyncio.Event()
+        self._tasks = set()
     
     async def run(self):
         """Main worker loop"""
         self.running = True
         print(" Health check worker started")
         
-        while self.running:
+        sem = asyncio.Semaphore(settings.MAX_CONCURRENT_CHECKS)
+        try:
+            await alert_service.start()
+            await self.sink.start()
+            self.sink.listeners.append(self.invalidator.apply)
+            cache_service.events.subscribe("pipeline", self.on_pipeline_event)
+            # Pipeline events published while the bus was down are lost
+            cache_service.events.on_reconnect.append(self.resync_requested.set)
+            if self.recent is not None:
+                self.sink.listeners.append(self.recent.add)
+                await self.recent.warm()
+            if self.dashboard is not None:
+                self.sink.listeners.append(self.dashboard.apply)
+                await self.dashboard.reconcile()
+                self._start_background(self.dashboard.run())
+            if self.events is not None:
+                # After the dashboard listener, so counter deltas include each batch
+                self.sink.listeners.append(self.events.apply)
+                self.events.live = True
+            if self.shard is not None:
+                await self.shard.heartbeat()
+                self._start_background(self.shard.run())
+            await self.load_pipelines()
+            self._start_background(self._resync_loop())
+            self._start_background(anomaly_detector.run_persistence())
+            
+            while self.running:
+                try:
+                    due_pipelines = await self.scheduler.wait_due()
+                    
+                    for pipeline, due in due_pipelines:
+                        await sem.acquire()
+                        task = asyncio.create_task(self._bounded_check(pipeline, due, sem))
+                        self._tasks.add(task)
+                        task.add_done_callback(self._tasks.discard)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"Worker error: {e}")
+                    await asyncio.sleep(10)
+        finally:
+            self.running = False
+            for task in list(self._tasks):
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            await self.http.aclose()
+            await self.sink.stop()
+            await alert_service.stop()
+            self.sink.listeners.remove(self.invalidator.apply)
+            self.invalidator.reset()
+            cache_service.events.unsubscribe("pipeline", self.on_pipeline_event)
+            cache_service.events.on_reconnect.remove(self.resync_requested.set)
             try:
-                await self.check_all_pipelines()
-                await asyncio.sleep(settings.HEALTH_CHECK_INTERVAL)
+                await anomaly_detector.persist()
             except Exception as e:
-                print(f"Worker error: {e}")
-                await asyncio.sleep(10)
+                print(f"Failed to save anomaly state: {e}")
+            anomaly_detector.reset()
+            if self.recent is not None:
+                self.sink.listeners.remove(self.recent.add)
+                self.recent.reset()
+            if self.dashboard is not None:
+                self.sink.listeners.remove(self.dashboard.apply)
+                self.dashboard.reset()
+            if self.events is not None:
+                self.sink.listeners.remove(self.events.apply)
+                self.events.reset()
+            if self.shard is not None:
+                try:
+                    await self.shard.leave()
+                except Exception as e:
+                    print(f"Failed to leave worker membership: {e}")
+    
+    def _start_background(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def load_pipelines(self):
+        """Load all active pipelines into the scheduler once at startup"""
+        pipelines = await self._fetch_active_pipelines()
+        
+        self.scheduler.clear()
+        self.scheduler.sync(pipelines)
+        await anomaly_detector.sync(p.id for p in pipelines)
+        if self.events is not None:
+            self.events.seed((p.id, p.current_status) for p in pipelines)
+        
+        print(f"⏰ Scheduled {len(pipelines)} pipelines")
+    
+    async def on_pipeline_event(self, event: dict):
+        """A pipeline was created, updated or deleted through any API replica"""
+        pipeline_id = event["pipeline_id"]
+        if self.dashboard is not None:
+            if event["action"] == "created":
+                self.dashboard.pipeline_added(pipeline_id, HealthStatus(event["status"]))
+            elif event["action"] == "deleted":
+                self.dashboard.pipeline_removed(pipeline_id)
+        if event["action"] == "deleted" and self.recent is not None:
+            self.recent.remove(pipeline_id)
+        try:
+            await self.refresh_pipeline(pipeline_id)
+        except Exception as e:
+            print(f"Pipeline {pipeline_id} refresh failed, resyncing: {e}")
+            self.resync_requested.set()
+    
+    async def refresh_pipeline(self, pipeline_id: int):
+        """Apply one pipeline's edit, deactivation or deletion without resyncing the rest"""
+        pipelines = await self._fetch_active_pipelines(pipeline_id)
+        if pipelines:
+            pipeline = pipelines[0]
+            self.scheduler.add(pipeline)
+            await anomaly_detector.track(pipeline_id)
+            if self.events is not None:
+                self.events.seed([(pipeline_id, pipeline.current_status)])
+        else:
+            self.scheduler.remove(pipeline_id)
+            await anomaly_detector.untrack(pipeline_id)
+            alert_service.correlator.release([pipeline_id])
     
-    async def check_all_pipelines(self):
-        """Check all active pipelines"""
+    async def _wait_for_resync(self):
+        """Until a shard rebalance, a lost pipeline event or SCHEDULER_RESYNC_INTERVAL passes"""
+        flags = [self.resync_requested]
+        if self.shard is not None:
+            flags.append(self.shard.changed)
+        waiters = [asyncio.create_task(flag.wait()) for flag in flags]
+        try:
+            await asyncio.wait(
+                waiters, timeout=settings.SCHEDULER_RESYNC_INTERVAL, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+    
+    async def _resync_loop(self):
+        """Pick up pipeline edits made through other processes and shard rebalances"""
+        while True:
+            await self._wait_for_resync()
+            self.resync_requested.clear()
+            if self.shard is not None and self.shard.changed.is_set():
+                self.shard.changed.clear()
+                # Rollup buckets cached for pipelines another worker may
+                # have written meanwhile can no longer be trusted
+                self.sink.rollups.clear()
+            try:
+                pipelines = await self._fetch_active_pipelines()
+                self.scheduler.sync(pipelines)
+                await anomaly_detector.sync(p.id for p in pipelines)
+                alert_service.correlator.sync(p.id for p in pipelines)
+                if self.events is not None:
+                    self.events.seed((p.id, p.current_status) for p in pipelines)
+            except Exception as e:
+                print(f"Scheduler resync failed: {e}")
+    
+    async def _fetch_active_pipelines(self, pipeline_id: int = None):
         async with AsyncSessionLocal() as db:
-            stmt = select(Pipeline).where(Pipeline.is_active == True)
+            stmt = select(
+                Pipeline.id,
+                Pipeline.name,
+                Pipeline.endpoint_url,
+                Pipeline.check_interval,
+                Pipeline.timeout,
+                Pipeline.current_status,
+                Pipeline.owner_team,
+                Pipeline.circuit_state,
+                Pipeline.consecutive_failures
+            ).where(Pipeline.is_active == True)
+            if pipeline_id is not None:
+                stmt = stmt.where(Pipeline.id == pipeline_id)
             result = await db.execute(stmt)
-            pipelines = result.scalars().all()
-            
-            if not pipelines:
-                return
-            
-            print(f"⏰ Checking {len(pipelines)} pipelines...")
-            
-            tasks = [
-                self.check_pipeline(pipeline, db)
-                for pipeline in pipelines
-            ]
-            
-            sem = asyncio.Semaphore(settings.MAX_CONCURRENT_CHECKS)
-            async def bounded_check(task):
-                async with sem:
-                    return await task
-            
-            await asyncio.gather(*[bounded_check(task) for task in tasks])
-    
-    async def check_pipeline(self, pipeline: Pipeline, db):
-        """Check single pipeline"""
-        start_time = datetime.utcnow()
+            pipelines = result.all()
         
+        if self.shard is not None:
+            pipelines = [p for p in pipelines if self.shard.owns(p.id)]
+        return pipelines
+    
+    async def _bounded_check(self, pipeline, due: float, sem: asyncio.Semaphore):
+        pipeline.breaker.before_check()
         try:
-            async with httpx.AsyncClient(timeout=pipeline.timeout) as client:
-                response = await client.get(str(pipeline.endpoint_url))
-                
-                response_time_ms = (datetime.utcnow() - start_time).total_seconds() * 1000
-                
-                if response.status_code == 200:
-                    status = HealthStatus.HEALTHY
-                elif 200 <= response.status_code < 300:
-                    status = HealthStatus.HEALTHY
-                elif 400 <= response.status_code < 500:
-                    status = HealthStatus.DEGRADED
-                else:
-                    status = HealthStatus.DOWN
-                
-                health_check = HealthCheck(
-                    pipeline_id=pipeline.id,
-                    status=status,
-                    response_time_ms=response_time_ms,
-                    status_code=response.status_code,
-                    checked_at=datetime.utcnow()
-                )
-                
-                db.add(health_check)
-                
-                old_status = pipeline.current_status
-                pipeline.current_status = status
-                pipeline.last_check_time = datetime.utcnow()
-                
-                await db.commit()
-                
-                if old_status != status and status != HealthStatus.HEALTHY:
-                    await alert_service.send_alert(pipeline, health_check)
-                
-                print(f"  {pipeline.name}: {status.value} ({response_time_ms:.0f}ms)")
-                
+            await self.check_pipeline(pipeline)
         except Exception as e:
-            health_check = HealthCheck(
-                pipeline_id=pipeline.id,
-                status=HealthStatus.DOWN,
-                error_message=str(e),
-                checked_at=datetime.utcnow()
+            print(f"{pipeline.name}: check failed - {e}")
+        finally:
+            sem.release()
+            # The next slot counts from the due time, not from when this check
+            # finished, so slow checks don't drift the schedule; the breaker
+            # stretches it while the endpoint keeps failing
+            self.scheduler.reschedule(
+                pipeline.id, due, pipeline.breaker.next_interval(pipeline.check_interval)
+            )
+    
+    async def check_pipeline(self, pipeline):
+        """Check single pipeline"""
+        try:
+            response = await self.http.get(
+                pipeline.endpoint_url,
+                timeout=pipeline.breaker.check_timeout(pipeline.timeout)
             )
             
-            db.add(health_check)
-            pipeline.current_status = HealthStatus.DOWN
-            pipeline.last_check_time = datetime.utcnow()
+            if response.status_code == 200:
+                status = HealthStatus.HEALTHY
+            elif 200 <= response.status_code < 300:
+                status = HealthStatus.HEALTHY
+            elif 400 <= response.status_code < 500:
+                status = HealthStatus.DEGRADED
+            else:
+                status = HealthStatus.DOWN
             
-            await db.commit()
+            await self._record(
+                pipeline,
+                status=status,
+                response_time_ms=response.response_time_ms,
+                connect_time_ms=response.connect_time_ms,
+                status_code=response.status_code
+            )
+            
+            print(f"  {pipeline.name}: {status.value} "
+                  f"({response.response_time_ms:.0f}ms + {response.connect_time_ms:.0f}ms connect)")
             
-            print(f"{pipeline.name}: DOWN - {str(e)}")
\ No newline at end of file
+        except Exception as e:
+            await self._record(pipeline, status=HealthStatus.DOWN, error_message=str(e))
+            
+            print(f"{pipeline.name}: DOWN - {str(e)}")
+    
+    async def _record(
+            self,
+            pipeline,
+            status: HealthStatus,
+            response_time_ms: float = None,
+            connect_time_ms: float = None,
+            status_code: int = None,
+            error_message: str = None
+    ):
+        """Hand a result to the write-behind sink and alert on status changes"""
+        result = {
+            "pipeline_id": pipeline.id,
+            "status": status,
+            "response_time_ms": response_time_ms,
+            "connect_time_ms": connect_time_ms,
+            "status_code": status_code,
+            "error_message": error_message,
+            "checked_at": datetime.utcnow(),
+        }
+        old_status = pipeline.current_status
+        pipeline.current_status = status
+        
+        breaker = pipeline.breaker
+        if breaker.record(status != HealthStatus.DOWN, status_changed=old_status != status):
+            print(f"{pipeline.name}: circuit {breaker.state.value}")
+        
+        await self.sink.put(result, {
+            "circuit_state": breaker.state,
+            "consecutive_failures": breaker.consecutive_failures
+        })
+        
+        if old_status != status and status != HealthStatus.HEALTHY:
+            alert_service.send_alert(pipeline, HealthCheck(**result))
+        elif old_status in (HealthStatus.DOWN, HealthStatus.DEGRADED) and status == HealthStatus.HEALTHY:
+            alert_service.resolve(pipeline.id)
+        
+        # Score the check against the pipeline's streaming baseline right away
+        anomalies = anomaly_detector.observe(pipeline.id, result["checked_at"], status, response_time_ms)
+        if settings.ANOMALY_ALERTS:
+            for metric, analysis in anomalies:
+                alert_service.send_anomaly_alert(pipeline, metric, analysis)
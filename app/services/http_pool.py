@@ -0,0 +1,188 @@
+"""
+Shared HTTP client for health checks with keep-alive, DNS caching
+and per-host concurrency limits
+"""
+import asyncio
+import ipaddress
+import socket
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import httpcore
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+class DNSCache:
+    """TTL cache in front of getaddrinfo; concurrent lookups for one host share a single query"""
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, int], Tuple[float, str]] = {}
+        self._pending: Dict[Tuple[str, int], asyncio.Future] = {}
+
+    async def resolve(self, host: str, port: int) -> str:
+        try:
+            ipaddress.ip_address(host)
+            return host
+        except ValueError:
+            pass
+
+        key = (host, port)
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                host, port, type=socket.SOCK_STREAM
+            )
+            address = infos[0][4][0]
+            self._entries[key] = (time.monotonic() + self.ttl, address)
+            future.set_result(address)
+            return address
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so waiter-less failures don't log warnings
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+
+    def clear(self):
+        self._entries.clear()
+
+
+class _CachedDNSBackend(httpcore.AsyncNetworkBackend):
+    """Network backend that connects to cached addresses; TLS still uses the original hostname for SNI"""
+
+    def __init__(self, dns: DNSCache, backend: httpcore.AsyncNetworkBackend):
+        self._dns = dns
+        self._backend = backend
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            address = await self._dns.resolve(host, port)
+        except OSError as e:
+            raise httpcore.ConnectError(f"DNS lookup failed for {host}: {e}") from e
+        return await self._backend.connect_tcp(
+            address, port,
+            timeout=timeout,
+            local_address=local_address,
+            socket_options=socket_options
+        )
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(
+            path, timeout=timeout, socket_options=socket_options
+        )
+
+    async def sleep(self, seconds: float):
+        await self._backend.sleep(seconds)
+
+
+class CheckResponse:
+    """Outcome of one probe with connection setup split out of request latency"""
+
+    __slots__ = ("status_code", "connect_time_ms", "response_time_ms")
+
+    def __init__(self, status_code: int, connect_time_ms: float, response_time_ms: float):
+        self.status_code = status_code
+        self.connect_time_ms = connect_time_ms
+        self.response_time_ms = response_time_ms
+
+
+class CheckHttpClient:
+    """Long-lived client pool owned by the health check worker"""
+
+    def __init__(self):
+        self.dns = DNSCache(settings.DNS_CACHE_TTL_SECONDS)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    def _build_client(self) -> httpx.AsyncClient:
+        http2 = settings.HEALTH_CHECK_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print(" HTTP/2 requested but 'h2' is not installed, using HTTP/1.1")
+                http2 = False
+
+        limits = httpx.Limits(
+            max_connections=settings.MAX_CONCURRENT_CHECKS,
+            max_keepalive_connections=settings.MAX_CONCURRENT_CHECKS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+        )
+        transport = httpx.AsyncHTTPTransport(limits=limits, http2=http2)
+        # httpx has no public hook for the resolver, so swap the pool's
+        # network backend (httpx and httpcore are pinned in requirements.txt)
+        pool = transport._pool
+        if not hasattr(pool, "_network_backend"):
+            raise RuntimeError(
+                f"{type(pool).__name__} has no _network_backend; the DNS cache needs the "
+                "httpcore version pinned in requirements.txt"
+            )
+        pool._network_backend = _CachedDNSBackend(self.dns, pool._network_backend)
+
+        return httpx.AsyncClient(
+            transport=transport,
+            timeout=settings.HEALTH_CHECK_TIMEOUT,
+            follow_redirects=False
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
+
+    def _host_limit(self, url: httpx.URL) -> asyncio.Semaphore:
+        key = f"{url.host}:{url.port or url.scheme}"
+        sem = self._host_limits.get(key)
+        if sem is None:
+            sem = asyncio.Semaphore(settings.MAX_CONNECTIONS_PER_HOST)
+            self._host_limits[key] = sem
+        return sem
+
+    async def get(self, url: str, timeout: float) -> CheckResponse:
+        """GET url, timing TCP/TLS setup separately from the request itself"""
+        url = httpx.URL(url)
+        connect_spans: List[float] = []
+
+        async def trace(event: str, info: dict):
+            if event in ("connection.connect_tcp.started", "connection.start_tls.started"):
+                connect_spans.append(-time.perf_counter())
+            elif event in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+                connect_spans[-1] += time.perf_counter()
+
+        async with self._host_limit(url):
+            start = time.perf_counter()
+            response = await self.client.get(
+                url, timeout=timeout, extensions={"trace": trace}
+            )
+            total_ms = (time.perf_counter() - start) * 1000
+
+        connect_ms = sum(span for span in connect_spans if span > 0) * 1000
+        return CheckResponse(
+            status_code=response.status_code,
+            connect_time_ms=connect_ms,
+            response_time_ms=max(total_ms - connect_ms, 0.0)
+        )
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,195 @@
+"""
+Leader election so only one process runs the health check scheduler
+"""
+import asyncio
+import hashlib
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import insert, text, update
+from sqlalchemy.exc import IntegrityError
+
+from app.database import AsyncSessionLocal, engine
+from app.models import WorkerLease
+from app.config import get_settings
+
+settings = get_settings()
+
+
+class _AdvisoryLock:
+    """Postgres session-level advisory lock held on a dedicated connection"""
+
+    def __init__(self, name: str):
+        digest = hashlib.sha1(name.encode()).digest()
+        self.key = int.from_bytes(digest[:8], "big", signed=True)
+        self._conn = None
+
+    async def acquire(self) -> bool:
+        if self._conn is None:
+            self._conn = await engine.connect()
+        result = await self._conn.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}
+        )
+        acquired = bool(result.scalar())
+        await self._conn.commit()
+        if not acquired:
+            await self._close()
+        return acquired
+
+    async def renew(self) -> bool:
+        # The lock lives as long as the connection, so the heartbeat only
+        # has to prove the connection is still alive
+        try:
+            await self._conn.execute(text("SELECT 1"))
+            await self._conn.commit()
+            return True
+        except Exception as e:
+            print(f"Leader lock connection lost: {e}")
+            await self._close()
+            return False
+
+    async def release(self):
+        if self._conn is None:
+            return
+        try:
+            await self._conn.execute(
+                text("SELECT pg_advisory_unlock(:key)"), {"key": self.key}
+            )
+            await self._conn.commit()
+        finally:
+            await self._close()
+
+    async def _close(self):
+        if self._conn is not None:
+            try:
+                await self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+
+class _LeaseRow:
+    """Expiring lease row in worker_leases, for SQLite and other databases"""
+
+    def __init__(self, name: str, holder: str, ttl: int):
+        self.name = name
+        self.holder = holder
+        self.ttl = ttl
+
+    async def acquire(self) -> bool:
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(WorkerLease)
+                .where(WorkerLease.name == self.name)
+                .where((WorkerLease.holder == self.holder) | (WorkerLease.expires_at < now))
+                .values(holder=self.holder, expires_at=expires_at)
+            )
+            if result.rowcount:
+                await db.commit()
+                return True
+
+            try:
+                await db.execute(
+                    insert(WorkerLease).values(
+                        name=self.name, holder=self.holder, expires_at=expires_at
+                    )
+                )
+                await db.commit()
+                return True
+            except IntegrityError:
+                await db.rollback()
+                return False
+
+    async def renew(self) -> bool:
+        try:
+            return await self.acquire()
+        except Exception as e:
+            print(f"Leader lease renewal failed: {e}")
+            return False
+
+    async def release(self):
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(WorkerLease)
+                .where(WorkerLease.name == self.name)
+                .where(WorkerLease.holder == self.holder)
+                .values(expires_at=datetime.utcnow())
+            )
+            await db.commit()
+
+
+class LeaderElector:
+    """
+    Runs a coroutine only while this process holds the leadership lease.
+
+    Every process polls for the lease each heartbeat; the holder renews it
+    on the same cadence. If the holder dies its lease expires (or, on
+    Postgres, its connection and advisory lock go away) and a standby takes
+    over on its next poll.
+    """
+
+    def __init__(self, name: str = "health-checker"):
+        self.name = name
+        self.holder_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self.heartbeat_interval = settings.LEADER_HEARTBEAT_INTERVAL
+
+        if engine.dialect.name == "postgresql":
+            self._lock = _AdvisoryLock(name)
+        else:
+            self._lock = _LeaseRow(name, self.holder_id, settings.LEADER_LEASE_TTL)
+
+    async def run(self, work: Callable[[], Awaitable]):
+        """Start `work()` on becoming leader and cancel it on losing the lease"""
+        task: Optional[asyncio.Task] = None
+        try:
+            while True:
+                if not self.is_leader:
+                    try:
+                        self.is_leader = await self._lock.acquire()
+                    except Exception as e:
+                        print(f"Leader election error: {e}")
+                    if self.is_leader:
+                        print(f"Became {self.name} leader ({self.holder_id})")
+                elif not await self._lock.renew():
+                    print(f"Lost {self.name} leadership")
+                    self.is_leader = False
+                    await self._stop(task)
+                    task = None
+
+                if task is not None and task.done():
+                    await self._stop(task)
+                    task = None
+                if self.is_leader and task is None:
+                    task = asyncio.create_task(work())
+
+                await asyncio.sleep(self.heartbeat_interval)
+        finally:
+            await self._stop(task)
+            if self.is_leader:
+                self.is_leader = False
+                try:
+                    await self._lock.release()
+                except Exception as e:
+                    print(f"Leader release failed: {e}")
+
+    async def _stop(self, task: Optional[asyncio.Task]):
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"{self.name} stopped with error: {e}")
+
+
+# Global elector for the health check worker
+leader_elector = LeaderElector()
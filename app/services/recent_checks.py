@@ -0,0 +1,229 @@
+"""
+Process-local ring buffers of each pipeline's most recent health checks
+"""
+import heapq
+import math
+import sys
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func, select
+
+from app.database import AsyncSessionLocal
+from app.models import HealthCheck, HealthStatus
+from app.config import get_settings
+
+settings = get_settings()
+
+_STATUSES = list(HealthStatus)
+_STATUS_INDEX = {status: index for index, status in enumerate(_STATUSES)}
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _to_micros(ts: datetime) -> int:
+    return (ts - _EPOCH) // _MICROSECOND
+
+
+def _from_micros(micros: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=micros)
+
+
+class _Ring:
+    """
+    One pipeline's last `capacity` checks as parallel typed arrays.
+    Missing floats are stored as NaN and a missing status code as 0.
+    """
+
+    __slots__ = (
+        "ids", "checked_at", "status", "response_time_ms", "connect_time_ms",
+        "status_code", "error_message", "head", "size",
+    )
+
+    def __init__(self, capacity: int):
+        self.ids = array("q", bytes(8 * capacity))
+        self.checked_at = array("q", bytes(8 * capacity))  # microseconds since epoch, UTC
+        self.status = array("b", bytes(capacity))
+        self.response_time_ms = array("d", bytes(8 * capacity))
+        self.connect_time_ms = array("d", bytes(8 * capacity))
+        self.status_code = array("h", bytes(2 * capacity))
+        self.error_message: List[Optional[str]] = [None] * capacity
+        self.head = 0  # next slot to write
+        self.size = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self.ids)
+
+    def append(self, row: dict):
+        i = self.head
+        self.ids[i] = row["id"]
+        self.checked_at[i] = _to_micros(row["checked_at"])
+        self.status[i] = _STATUS_INDEX[row["status"]]
+        response_time_ms, connect_time_ms = row["response_time_ms"], row.get("connect_time_ms")
+        self.response_time_ms[i] = math.nan if response_time_ms is None else response_time_ms
+        self.connect_time_ms[i] = math.nan if connect_time_ms is None else connect_time_ms
+        self.status_code[i] = row.get("status_code") or 0
+        self.error_message[i] = row.get("error_message")
+        self.head = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def slots(self) -> Iterable[int]:
+        """Slot indexes, newest first"""
+        capacity = self.capacity
+        return ((self.head - 1 - n) % capacity for n in range(self.size))
+
+    def oldest_micros(self) -> Optional[int]:
+        if not self.size:
+            return None
+        return self.checked_at[(self.head - self.size) % self.capacity]
+
+    def row(self, pipeline_id: int, i: int) -> dict:
+        response_time_ms = self.response_time_ms[i]
+        connect_time_ms = self.connect_time_ms[i]
+        return {
+            "id": self.ids[i],
+            "pipeline_id": pipeline_id,
+            "status": _STATUSES[self.status[i]],
+            "response_time_ms": None if math.isnan(response_time_ms) else response_time_ms,
+            "connect_time_ms": None if math.isnan(connect_time_ms) else connect_time_ms,
+            "status_code": self.status_code[i] or None,
+            "error_message": self.error_message[i],
+            "checked_at": _from_micros(self.checked_at[i]),
+        }
+
+    def nbytes(self) -> int:
+        columns = (self.ids, self.checked_at, self.status, self.response_time_ms,
+                   self.connect_time_ms, self.status_code)
+        return sum(column.itemsize * len(column) for column in columns) + sys.getsizeof(self.error_message)
+
+
+class RecentChecks:
+    """
+    Holds the last RECENT_CHECKS_PER_PIPELINE checks of every pipeline in
+    fixed-size ring buffers, fed by the result sink after each flush and
+    warmed from the database when the worker starts.
+
+    The buffers are only complete in the process that runs the worker, so
+    readers get None (and should query the database) unless `live` is set,
+    or when the request reaches past what the buffer is known to hold.
+    """
+
+    def __init__(self, capacity: int = None):
+        self.capacity = capacity or settings.RECENT_CHECKS_PER_PIPELINE
+        self.live = False
+        # Checks older than this may be missing from rings that are not full
+        self._complete_since_micros = 0
+        self._rings: Dict[int, _Ring] = {}
+
+    async def warm(self, hours: int = None):
+        """Load each pipeline's newest checks from the last `hours` and go live"""
+        since = datetime.utcnow() - timedelta(hours=hours or settings.RECENT_CHECKS_WARM_HOURS)
+        ranked = (
+            select(
+                HealthCheck.id,
+                HealthCheck.pipeline_id,
+                HealthCheck.status,
+                HealthCheck.response_time_ms,
+                HealthCheck.connect_time_ms,
+                HealthCheck.status_code,
+                HealthCheck.error_message,
+                HealthCheck.checked_at,
+                func.row_number().over(
+                    partition_by=HealthCheck.pipeline_id,
+                    order_by=HealthCheck.checked_at.desc()
+                ).label("rank")
+            )
+            .where(HealthCheck.checked_at >= since)
+            .subquery()
+        )
+        stmt = (
+            select(ranked)
+            .where(ranked.c.rank <= self.capacity)
+            .order_by(ranked.c.pipeline_id, ranked.c.checked_at)
+        )
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(stmt)
+            rows = [row._asdict() for row in result.all()]
+
+        self._rings.clear()
+        self.add(rows)
+        self._complete_since_micros = _to_micros(since)
+        self.live = True
+        print(f"Recent checks warmed: {len(rows)} checks for {len(self._rings)} pipelines")
+
+    def reset(self):
+        """Drop everything and stop answering reads (e.g. when the worker stops)"""
+        self.live = False
+        self._rings.clear()
+
+    def add(self, rows: Iterable[dict]):
+        """Append persisted rows (with ids) in checked_at order"""
+        for row in rows:
+            ring = self._rings.get(row["pipeline_id"])
+            if ring is None:
+                ring = self._rings[row["pipeline_id"]] = _Ring(self.capacity)
+            ring.append(row)
+
+    def remove(self, pipeline_id: int):
+        self._rings.pop(pipeline_id, None)
+
+    def _covers(self, ring: Optional[_Ring], limit: int, since: Optional[datetime]) -> bool:
+        if not self.live:
+            return False
+        if ring is not None and limit <= ring.size:
+            return True
+        if ring is not None and ring.size == ring.capacity:
+            # Anything older than the oldest buffered check has been evicted
+            return since is not None and _to_micros(since) >= ring.oldest_micros()
+        # Everything since warm-up is buffered; older checks may not be
+        return since is not None and _to_micros(since) >= self._complete_since_micros
+
+    def latest(self, pipeline_id: int, limit: int, since: Optional[datetime] = None) -> Optional[List[dict]]:
+        """Newest-first checks of one pipeline, or None if the database has to answer"""
+        ring = self._rings.get(pipeline_id)
+        if not self._covers(ring, limit, since):
+            return None
+        if ring is None:
+            return []
+
+        cutoff = _to_micros(since) if since is not None else None
+        rows = []
+        for i in ring.slots():
+            if len(rows) >= limit or (cutoff is not None and ring.checked_at[i] < cutoff):
+                break
+            rows.append(ring.row(pipeline_id, i))
+        return rows
+
+    def recent(self, limit: int) -> Optional[List[dict]]:
+        """Newest-first checks across all pipelines"""
+        if not self.live or limit > self.capacity:
+            return None
+
+        def newest_first(pipeline_id: int, ring: _Ring):
+            for i in ring.slots():
+                yield -ring.checked_at[i], pipeline_id, i
+
+        merged = heapq.merge(*(newest_first(pid, ring) for pid, ring in self._rings.items()))
+        rows = []
+        for _, pipeline_id, i in merged:
+            if len(rows) >= limit:
+                break
+            rows.append(self._rings[pipeline_id].row(pipeline_id, i))
+        # Fewer than `limit` buffered checks: older ones may exist from before warm-up
+        return rows if len(rows) == limit else None
+
+    def stats(self) -> dict:
+        ring_bytes = sum(ring.nbytes() for ring in self._rings.values())
+        return {
+            "live": self.live,
+            "pipelines": len(self._rings),
+            "capacity_per_pipeline": self.capacity,
+            "checks": sum(ring.size for ring in self._rings.values()),
+            "bytes": ring_bytes + sys.getsizeof(self._rings),
+        }
+
+
+# Global store, fed by the embedded worker
+recent_checks = RecentChecks()
@@ -0,0 +1,190 @@
+"""
+Write-behind buffer that persists health check results in batches
+"""
+import asyncio
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, insert, select, update
+
+from app.database import AsyncSessionLocal
+from app.models import Pipeline, HealthCheck
+from app.config import get_settings
+from app.services.rollups import RollupWriter
+
+settings = get_settings()
+
+_STOP = object()
+
+
+class ResultSink:
+    """
+    Check coroutines push result rows with `put()`; a single writer task
+    flushes them as one bulk INSERT into health_checks plus one bulk UPDATE
+    of pipeline status per batch, folding them into the rollups in the
+    same transaction. A batch is written when it reaches
+    `batch_size` rows or `flush_interval` seconds after its first row,
+    whichever comes first. `put()` blocks once `max_buffer` rows are
+    waiting, which slows the checkers down instead of growing memory.
+
+    Callables in `listeners` receive each batch's rows, with their new
+    ids, once the batch is committed. Results of pipelines deleted before
+    the flush are dropped, and a batch that still fails after its retries
+    is split up until only the rows failing on their own are dropped.
+    """
+
+    def __init__(
+            self,
+            batch_size: int = None,
+            flush_interval: float = None,
+            max_buffer: int = None
+    ):
+        self.batch_size = batch_size or settings.RESULT_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.RESULT_FLUSH_INTERVAL
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffer or settings.RESULT_BUFFER_SIZE)
+        self._task: Optional[asyncio.Task] = None
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.rollups = RollupWriter()
+        self.listeners: List[Callable[[List[dict]], None]] = []
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything still buffered and stop the writer"""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def put(self, result: dict, pipeline_values: dict = None):
+        """Queue one health_checks row plus any extra Pipeline columns to update with it"""
+        await self._queue.put((result, pipeline_values or {}))
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            first = await self._queue.get()
+            if first is _STOP:
+                break
+
+            batch = [first]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush_with_retry(batch)
+
+    async def _flush_with_retry(self, batch: List[Tuple[dict, dict]]):
+        for attempt in range(settings.RESULT_FLUSH_RETRIES):
+            try:
+                rows = await self._flush(batch)
+                self.rows_written += len(rows)
+                self.rows_dropped += len(batch) - len(rows)
+                self._notify(rows)
+                return
+            except Exception as e:
+                print(f"Result flush failed ({len(batch)} rows, attempt {attempt + 1}): {e}")
+                # The transaction rolled back, so cached rollup buckets are ahead of the database
+                self.rollups.clear()
+                await asyncio.sleep(2 ** attempt)
+
+        # Keep whatever part of the batch can still be written
+        await self._flush_isolating(batch)
+
+    async def _flush_isolating(self, batch: List[Tuple[dict, dict]]):
+        """Write the batch in halves, recursively, dropping only the rows that fail on their own"""
+        try:
+            rows = await self._flush(batch)
+        except Exception as e:
+            self.rollups.clear()
+            if len(batch) == 1:
+                self.rows_dropped += 1
+                print(f"Dropped health check result for pipeline {batch[0][0]['pipeline_id']}: {e}")
+                return
+            middle = len(batch) // 2
+            await self._flush_isolating(batch[:middle])
+            await self._flush_isolating(batch[middle:])
+            return
+        self.rows_written += len(rows)
+        self.rows_dropped += len(batch) - len(rows)
+        self._notify(rows)
+
+    def _notify(self, rows: List[dict]):
+        for listener in self.listeners:
+            try:
+                listener(rows)
+            except Exception as e:
+                print(f"Result listener failed: {e}")
+
+    async def _flush(self, batch: List[Tuple[dict, dict]]) -> List[dict]:
+        """Write the batch in one transaction; returns the rows written, with their ids"""
+        async with AsyncSessionLocal() as db:
+            # Results of pipelines deleted since their check would fail the
+            # whole insert (foreign key) and have nothing left to update
+            pipeline_ids = {row["pipeline_id"] for row, _ in batch}
+            existing = set((await db.execute(
+                select(Pipeline.id).where(Pipeline.id.in_(pipeline_ids))
+            )).scalars())
+            if len(existing) < len(pipeline_ids):
+                batch = [(row, values) for row, values in batch if row["pipeline_id"] in existing]
+                if not batch:
+                    return []
+
+            # Only the newest result per pipeline decides its current state
+            latest = {}
+            for row, pipeline_values in batch:
+                current = latest.get(row["pipeline_id"])
+                if current is None or row["checked_at"] >= current[0]["checked_at"]:
+                    latest[row["pipeline_id"]] = (row, pipeline_values)
+
+            rows = [row for row, _ in batch]
+            result = await db.execute(
+                insert(HealthCheck).returning(HealthCheck.id, sort_by_parameter_order=True), rows
+            )
+            ids = result.scalars().all()
+            await self.rollups.apply(db, rows)
+            # A Core executemany UPDATE, unlike the ORM's bulk update by
+            # primary key, doesn't fail when a pipeline was deleted meanwhile.
+            # One statement per set of columns, since each must be uniform.
+            updates: Dict[frozenset, List[dict]] = {}
+            for pipeline_id, (row, pipeline_values) in latest.items():
+                values = {
+                    "current_status": row["status"],
+                    "last_check_time": row["checked_at"],
+                    **pipeline_values
+                }
+                updates.setdefault(frozenset(values), []).append({"pipeline_id_": pipeline_id, **values})
+            pipelines = Pipeline.__table__
+            for params in updates.values():
+                await db.execute(
+                    update(pipelines).where(pipelines.c.id == bindparam("pipeline_id_")),
+                    params
+                )
+            await db.commit()
+
+        for row, row_id in zip(rows, ids):
+            row["id"] = row_id
+        return rows
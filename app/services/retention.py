@@ -0,0 +1,309 @@
+"""
+Retention of raw health checks and rollups, and daily partitioning of
+health_checks on Postgres
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, func, select, text, tuple_
+from sqlalchemy.schema import CreateIndex
+
+from app.database import AsyncSessionLocal, engine
+from app.models import HealthCheck, HealthCheckRollup
+from app.config import get_settings
+from app.services import rollups
+from app.services.leader import LeaderElector
+
+settings = get_settings()
+
+PARTITION_PREFIX = "health_checks_p"
+DEFAULT_PARTITION = "health_checks_default"
+
+
+def _partition_name(day: datetime) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+async def create_partitioned_health_checks(conn):
+    """
+    Create health_checks as a table partitioned by day on checked_at, plus
+    its indexes, a default partition and the upcoming daily partitions.
+    Runs before create_all on Postgres; an existing table is left as is.
+    """
+    table = HealthCheck.__table__
+    columns = ["id BIGSERIAL"]
+    for column in table.columns:
+        if column.name == "id":
+            continue
+        definition = f"{column.name} {column.type.compile(dialect=conn.dialect)}"
+        if not column.nullable or column.name == "checked_at":
+            definition += " NOT NULL"
+        for foreign_key in column.foreign_keys:
+            definition += f" REFERENCES {foreign_key.column.table.name}({foreign_key.column.name})"
+        columns.append(definition)
+    # The partition key has to be part of the primary key
+    columns.append("PRIMARY KEY (id, checked_at)")
+
+    await conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {table.name} ({', '.join(columns)}) "
+        f"PARTITION BY RANGE (checked_at)"
+    ))
+    for index in table.indexes:
+        await conn.execute(CreateIndex(index, if_not_exists=True))
+    await conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {table.name} DEFAULT"
+    ))
+    await ensure_partitions(conn)
+
+
+async def ensure_partitions(conn, ahead_days: int = None):
+    """Create daily partitions from today through `ahead_days` days ahead"""
+    if ahead_days is None:
+        ahead_days = settings.PARTITIONS_AHEAD_DAYS
+    today = rollups.bucket_start(datetime.utcnow(), "1d")
+    for offset in range(ahead_days + 1):
+        day = today + timedelta(days=offset)
+        await conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {_partition_name(day)} PARTITION OF health_checks "
+            f"FOR VALUES FROM ('{day:%Y-%m-%d}') TO ('{day + timedelta(days=1):%Y-%m-%d}')"
+        ))
+
+
+async def _is_partitioned(conn) -> bool:
+    result = await conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = 'health_checks'"
+    ))
+    return result.scalar() is not None
+
+
+async def _daily_partitions(conn) -> List[str]:
+    result = await conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'health_checks'"
+    ))
+    return sorted(name for (name,) in result.all() if name.startswith(PARTITION_PREFIX))
+
+
+class RetentionJob:
+    """
+    Expires data past its retention window, oldest first:
+
+    1. Compaction: every raw day about to expire is checked against its 1d
+       rollups and rolled up again if they do not account for all its checks,
+       so no history is lost when the raw rows go.
+    2. Raw checks: on a partitioned Postgres table whole daily partitions are
+       dropped; otherwise rows are deleted in small batches with a pause
+       between transactions so the result writer is never held up for long.
+    3. Rollups, per resolution, in the same batched way.
+
+    `status` describes the current or last run for the admin endpoint.
+    Runs asked for through `request_run()` happen in the scheduled loop, so
+    they too only run while this process holds the retention lease.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._run_requested = asyncio.Event()
+        self.status = {
+            "phase": None,
+            "storage": None,
+            "last_started_at": None,
+            "last_finished_at": None,
+            "last_error": None,
+            "raw": {},
+            "rollups": {},
+            "compaction": {},
+        }
+
+    @property
+    def is_running(self) -> bool:
+        return self._lock.locked()
+
+    def policy(self) -> dict:
+        return {
+            "raw_days": settings.RAW_RETENTION_DAYS,
+            "rollup_days": {
+                "1m": settings.ROLLUP_1M_RETENTION_DAYS,
+                "1h": settings.ROLLUP_1H_RETENTION_DAYS,
+                "1d": settings.ROLLUP_1D_RETENTION_DAYS,
+            },
+            "interval_seconds": settings.RETENTION_INTERVAL,
+        }
+
+    def request_run(self):
+        """Have the scheduled loop start its next run now"""
+        self._run_requested.set()
+
+    async def run(self):
+        """Run retention every RETENTION_INTERVAL seconds, or sooner when asked"""
+        while True:
+            self._run_requested.clear()
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Retention run failed: {e}")
+            try:
+                await asyncio.wait_for(self._run_requested.wait(), settings.RETENTION_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_once(self, now: Optional[datetime] = None):
+        async with self._lock:
+            now = now or datetime.utcnow()
+            today = rollups.bucket_start(now, "1d")
+            status = self.status
+            status.update(
+                last_started_at=now, last_error=None,
+                raw={}, rollups={}, compaction={}
+            )
+            try:
+                raw_cutoff = today - timedelta(days=settings.RAW_RETENTION_DAYS)
+
+                status["phase"] = "compaction"
+                await self._compact(raw_cutoff)
+
+                status["phase"] = "raw"
+                await self._expire_raw(raw_cutoff)
+
+                status["phase"] = "rollups"
+                for resolution, days in self.policy()["rollup_days"].items():
+                    await self._expire_rollups(resolution, today - timedelta(days=days))
+            except Exception as e:
+                status["last_error"] = str(e)
+                raise
+            finally:
+                status.update(phase=None, last_finished_at=datetime.utcnow())
+
+            print(
+                f"Retention: {status['raw'].get('deleted', 0)} raw checks and "
+                f"{sum(status['rollups'].values())} rollup rows expired"
+            )
+
+    async def _compact(self, cutoff: datetime):
+        progress = self.status["compaction"]
+        progress.update(days_checked=0, days_rolled_up=0, checks_rolled_up=0)
+
+        async with AsyncSessionLocal() as db:
+            oldest = (await db.execute(
+                select(func.min(HealthCheck.checked_at)).where(HealthCheck.checked_at < cutoff)
+            )).scalar()
+        if oldest is None:
+            return
+
+        day = rollups.bucket_start(oldest, "1d")
+        while day < cutoff:
+            next_day = day + timedelta(days=1)
+            async with AsyncSessionLocal() as db:
+                raw_count = (await db.execute(
+                    select(func.count(HealthCheck.id))
+                    .where(HealthCheck.checked_at >= day)
+                    .where(HealthCheck.checked_at < next_day)
+                )).scalar()
+                rolled_up = (await db.execute(
+                    select(func.coalesce(func.sum(HealthCheckRollup.check_count), 0))
+                    .where(HealthCheckRollup.resolution == "1d")
+                    .where(HealthCheckRollup.bucket_start == day)
+                )).scalar()
+
+            progress["days_checked"] += 1
+            # More rolled up than stored means the day's raw checks are partly gone already
+            if raw_count and rolled_up < raw_count:
+                progress["checks_rolled_up"] += await rollups.backfill(since=day, until=next_day)
+                progress["days_rolled_up"] += 1
+            day = next_day
+
+    async def _expire_raw(self, cutoff: datetime):
+        progress = self.status["raw"]
+        progress.update(cutoff=cutoff, deleted=0)
+
+        partitioned = False
+        if engine.dialect.name == "postgresql":
+            async with engine.begin() as conn:
+                partitioned = await _is_partitioned(conn)
+                if partitioned:
+                    await ensure_partitions(conn)
+        self.status["storage"] = "daily partitions" if partitioned else "batched delete"
+
+        if partitioned:
+            progress["partitions_dropped"] = await self._drop_partitions(cutoff)
+        # With partitions this only finds rows that landed in the default partition
+        await self._delete_batched(
+            HealthCheck.__table__,
+            [HealthCheck.id],
+            HealthCheck.checked_at < cutoff,
+            progress
+        )
+
+    async def _drop_partitions(self, cutoff: datetime) -> List[str]:
+        dropped = []
+        async with engine.connect() as conn:
+            for name in await _daily_partitions(conn):
+                day = datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d")
+                if day + timedelta(days=1) > cutoff:
+                    continue
+                # One short transaction per partition keeps the parent lock brief
+                await conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                await conn.commit()
+                dropped.append(name)
+        return dropped
+
+    async def _expire_rollups(self, resolution: str, cutoff: datetime):
+        progress = {"deleted": 0}
+        await self._delete_batched(
+            HealthCheckRollup.__table__,
+            [HealthCheckRollup.pipeline_id, HealthCheckRollup.resolution, HealthCheckRollup.bucket_start],
+            (HealthCheckRollup.resolution == resolution) & (HealthCheckRollup.bucket_start < cutoff),
+            progress
+        )
+        self.status["rollups"][resolution] = progress["deleted"]
+
+    async def _delete_batched(self, table, key_columns, condition, progress: dict):
+        """DELETE matching rows RETENTION_DELETE_BATCH at a time, one short transaction each"""
+        key = key_columns[0] if len(key_columns) == 1 else tuple_(*key_columns)
+        progress.setdefault("deleted", 0)
+        batch_size = settings.RETENTION_DELETE_BATCH
+
+        while True:
+            batch = select(*key_columns).where(condition).limit(batch_size)
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(delete(table).where(key.in_(batch)))
+                await db.commit()
+
+            progress["deleted"] += result.rowcount
+            if result.rowcount < batch_size:
+                return
+            await asyncio.sleep(settings.RETENTION_BATCH_PAUSE)
+
+    async def report(self) -> dict:
+        """Policy, progress of the current/last run, and what is stored now"""
+        async with AsyncSessionLocal() as db:
+            oldest_check = (await db.execute(select(func.min(HealthCheck.checked_at)))).scalar()
+            result = await db.execute(
+                select(HealthCheckRollup.resolution, func.min(HealthCheckRollup.bucket_start))
+                .group_by(HealthCheckRollup.resolution)
+            )
+            oldest_rollups = dict(result.all())
+
+        partitions = None
+        if engine.dialect.name == "postgresql":
+            async with engine.connect() as conn:
+                if await _is_partitioned(conn):
+                    partitions = await _daily_partitions(conn)
+
+        return {
+            "policy": self.policy(),
+            **self.status,
+            "running": self.is_running,
+            "oldest_check_at": oldest_check,
+            "oldest_rollup_at": oldest_rollups,
+            "partitions": partitions,
+        }
+
+
+# Global retention job, run by one process at a time
+retention_job = RetentionJob()
+retention_elector = LeaderElector("retention")
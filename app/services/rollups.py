@@ -0,0 +1,550 @@
+"""
+Multi-resolution (1m / 1h / 1d) rollups of health check results
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, case, delete, func, insert, literal, or_, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models import HealthCheck, HealthCheckRollup, HealthStatus
+from app.services.sketches import LatencySketch, percentiles
+
+RESOLUTIONS = ("1m", "1h", "1d")
+_STEPS = {"1m": timedelta(minutes=1), "1h": timedelta(hours=1), "1d": timedelta(days=1)}
+
+
+def bucket_start(ts: datetime, resolution: str) -> datetime:
+    if resolution == "1m":
+        return ts.replace(second=0, microsecond=0)
+    if resolution == "1h":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_boundary(ts: datetime, resolution: str) -> datetime:
+    start = bucket_start(ts, resolution)
+    if start == ts:
+        return ts
+    return start + _STEPS[resolution]
+
+
+def cover(since: datetime, until: Optional[datetime] = None) -> List[Tuple[str, datetime, Optional[datetime]]]:
+    """
+    Split [since, until) into (resolution, start, end) segments using the
+    coarsest buckets that fit, e.g. minutes up to the first full hour, hours
+    up to the first full day, then days. `until=None` means "up to now";
+    the newest bucket of each resolution is kept current at write time, so
+    the open-ended tail is covered by the coarsest resolution.
+    """
+    since = bucket_start(since, "1m")
+    hour = _next_boundary(since, "1h")
+    day = _next_boundary(hour, "1d")
+
+    if until is None:
+        return [("1m", since, hour), ("1h", hour, day), ("1d", day, None)]
+
+    until = bucket_start(until, "1m")
+    until_hour = bucket_start(until, "1h")
+    until_day = bucket_start(until_hour, "1d")
+
+    if day <= until_day:
+        segments = [
+            ("1m", since, hour), ("1h", hour, day), ("1d", day, until_day),
+            ("1h", until_day, until_hour), ("1m", until_hour, until),
+        ]
+    elif hour <= until_hour:
+        segments = [("1m", since, hour), ("1h", hour, until_hour), ("1m", until_hour, until)]
+    else:
+        segments = [("1m", since, until)]
+    return [segment for segment in segments if segment[1] < segment[2]]
+
+
+class WindowStats:
+    """Aggregated check counts and latency moments for one pipeline (or the fleet) over a window"""
+
+    __slots__ = (
+        "check_count", "failed_count", "latency_count",
+        "latency_sum", "latency_sum_sq", "latency_min", "latency_max",
+    )
+
+    def __init__(self, check_count=0, failed_count=0, latency_count=0,
+                 latency_sum=0.0, latency_sum_sq=0.0, latency_min=None, latency_max=None):
+        self.check_count = check_count or 0
+        self.failed_count = failed_count or 0
+        self.latency_count = latency_count or 0
+        self.latency_sum = latency_sum or 0.0
+        self.latency_sum_sq = latency_sum_sq or 0.0
+        self.latency_min = latency_min
+        self.latency_max = latency_max
+
+    @property
+    def uptime_percentage(self) -> float:
+        if not self.check_count:
+            return 100.0
+        return (self.check_count - self.failed_count) / self.check_count * 100
+
+    @property
+    def avg_response_time_ms(self) -> float:
+        return self.latency_sum / self.latency_count if self.latency_count else 0.0
+
+    def merge(self, other: "WindowStats"):
+        self.check_count += other.check_count
+        self.failed_count += other.failed_count
+        self.latency_count += other.latency_count
+        self.latency_sum += other.latency_sum
+        self.latency_sum_sq += other.latency_sum_sq
+        if other.latency_min is not None:
+            self.latency_min = other.latency_min if self.latency_min is None else min(self.latency_min, other.latency_min)
+        if other.latency_max is not None:
+            self.latency_max = other.latency_max if self.latency_max is None else max(self.latency_max, other.latency_max)
+
+
+class _Bucket:
+    __slots__ = ("check_count", "failed_count", "latency_count", "latency_sum",
+                 "latency_sum_sq", "latency_min", "latency_max", "sketch")
+
+    def __init__(self):
+        self.check_count = 0
+        self.failed_count = 0
+        self.latency_count = 0
+        self.latency_sum = 0.0
+        self.latency_sum_sq = 0.0
+        self.latency_min = None
+        self.latency_max = None
+        self.sketch = LatencySketch()
+
+    def add(self, status: HealthStatus, response_time_ms: Optional[float]):
+        self.check_count += 1
+        if status != HealthStatus.HEALTHY:
+            self.failed_count += 1
+        if response_time_ms is not None:
+            self.latency_count += 1
+            self.latency_sum += response_time_ms
+            self.latency_sum_sq += response_time_ms * response_time_ms
+            self.latency_min = response_time_ms if self.latency_min is None else min(self.latency_min, response_time_ms)
+            self.latency_max = response_time_ms if self.latency_max is None else max(self.latency_max, response_time_ms)
+            self.sketch.add(response_time_ms)
+
+    def merge(self, other: "_Bucket"):
+        self.check_count += other.check_count
+        self.failed_count += other.failed_count
+        self.latency_count += other.latency_count
+        self.latency_sum += other.latency_sum
+        self.latency_sum_sq += other.latency_sum_sq
+        for value in (other.latency_min, other.latency_max):
+            if value is not None:
+                self.latency_min = value if self.latency_min is None else min(self.latency_min, value)
+                self.latency_max = value if self.latency_max is None else max(self.latency_max, value)
+        self.sketch.merge(other.sketch)
+
+    @classmethod
+    def from_row(cls, row) -> "_Bucket":
+        bucket = cls()
+        bucket.check_count = row.check_count
+        bucket.failed_count = row.failed_count
+        bucket.latency_count = row.latency_count
+        bucket.latency_sum = row.latency_sum or 0.0
+        bucket.latency_sum_sq = row.latency_sum_sq or 0.0
+        bucket.latency_min = row.latency_min
+        bucket.latency_max = row.latency_max
+        bucket.sketch = LatencySketch.from_bytes(row.latency_sketch)
+        return bucket
+
+    def values(self) -> dict:
+        return {
+            "check_count": self.check_count,
+            "failed_count": self.failed_count,
+            "latency_count": self.latency_count,
+            "latency_sum": self.latency_sum,
+            "latency_sum_sq": self.latency_sum_sq,
+            "latency_min": self.latency_min,
+            "latency_max": self.latency_max,
+            "latency_sketch": self.sketch.to_bytes(),
+        }
+
+
+_rollups = HealthCheckRollup.__table__
+
+_update_bucket = (
+    _rollups.update()
+    .where(_rollups.c.pipeline_id == bindparam("key_pipeline_id"))
+    .where(_rollups.c.resolution == bindparam("key_resolution"))
+    .where(_rollups.c.bucket_start == bindparam("key_bucket_start"))
+)
+
+
+class RollupWriter:
+    """
+    Folds health_checks rows into every resolution's buckets inside the
+    caller's transaction.
+
+    The writer keeps each pipeline's newest bucket per resolution in memory,
+    so steady-state batches need no reads: one bulk INSERT for new buckets
+    and one bulk UPDATE for existing ones. Only buckets it has not seen
+    (after a restart, or late rows for an older bucket) are read first.
+    The cache assumes this writer is the only one writing these pipelines;
+    call `clear()` when pipeline ownership changes.
+    """
+
+    def __init__(self):
+        self._open: Dict[Tuple[int, str], Tuple[datetime, _Bucket]] = {}
+
+    def clear(self):
+        self._open.clear()
+
+    async def apply(self, db: AsyncSession, rows: Iterable[dict]):
+        batch: Dict[Tuple[int, str, datetime], _Bucket] = {}
+        for row in rows:
+            for resolution in RESOLUTIONS:
+                key = (row["pipeline_id"], resolution, bucket_start(row["checked_at"], resolution))
+                bucket = batch.get(key)
+                if bucket is None:
+                    bucket = batch[key] = _Bucket()
+                bucket.add(row["status"], row["response_time_ms"])
+
+        cached, missing = {}, []
+        for key in batch:
+            entry = self._open.get(key[:2])
+            if entry is not None and entry[0] == key[2]:
+                cached[key] = entry[1]
+            else:
+                missing.append(key)
+
+        existing = await self._load(db, missing)
+
+        inserts, updates = [], []
+        for key, bucket in batch.items():
+            current = cached.get(key) or existing.get(key)
+            if current is not None:
+                bucket.merge(current)
+
+            values = bucket.values()
+            if current is not None:
+                updates.append({
+                    "key_pipeline_id": key[0],
+                    "key_resolution": key[1],
+                    "key_bucket_start": key[2],
+                    **values
+                })
+            else:
+                inserts.append({
+                    "pipeline_id": key[0],
+                    "resolution": key[1],
+                    "bucket_start": key[2],
+                    **values
+                })
+
+            open_entry = self._open.get(key[:2])
+            if open_entry is None or open_entry[0] <= key[2]:
+                self._open[key[:2]] = (key[2], bucket)
+
+        if inserts:
+            await db.execute(insert(_rollups), inserts)
+        if updates:
+            await db.execute(_update_bucket, updates)
+
+    async def _load(self, db: AsyncSession, keys: List[Tuple[int, str, datetime]]) -> Dict[Tuple[int, str, datetime], _Bucket]:
+        existing = {}
+        wanted = set(keys)
+        for resolution in RESOLUTIONS:
+            resolution_keys = [key for key in keys if key[1] == resolution]
+            if not resolution_keys:
+                continue
+            result = await db.execute(
+                select(_rollups)
+                .where(_rollups.c.resolution == resolution)
+                .where(_rollups.c.pipeline_id.in_({key[0] for key in resolution_keys}))
+                .where(_rollups.c.bucket_start.in_({key[2] for key in resolution_keys}))
+            )
+            for row in result.all():
+                key = (row.pipeline_id, row.resolution, row.bucket_start)
+                if key in wanted:
+                    existing[key] = _Bucket.from_row(row)
+        return existing
+
+
+def _failed():
+    return func.sum(case((HealthCheck.status != HealthStatus.HEALTHY, 1), else_=0))
+
+
+async def window_stats(
+        db: AsyncSession,
+        since: datetime,
+        until: Optional[datetime] = None,
+        pipeline_ids: Optional[List[int]] = None,
+        per_pipeline: bool = True
+) -> Dict[Optional[int], WindowStats]:
+    """
+    Check counts and latency moments over [since, until), read from rollups
+    with one aggregate query. Parts of the window no rollup covers (e.g.
+    before the first backfill) are read from raw health_checks.
+    Keys are pipeline ids, or None for fleet-wide totals when per_pipeline=False.
+    """
+    stmt = select(
+        *_key(HealthCheckRollup.pipeline_id, per_pipeline),
+        func.sum(HealthCheckRollup.check_count),
+        func.sum(HealthCheckRollup.failed_count),
+        func.sum(HealthCheckRollup.latency_count),
+        func.sum(HealthCheckRollup.latency_sum),
+        func.sum(HealthCheckRollup.latency_sum_sq),
+        func.min(HealthCheckRollup.latency_min),
+        func.max(HealthCheckRollup.latency_max),
+    ).where(or_(*_segments(since, until)))
+    if pipeline_ids is not None:
+        stmt = stmt.where(HealthCheckRollup.pipeline_id.in_(pipeline_ids))
+    if per_pipeline:
+        stmt = stmt.group_by(HealthCheckRollup.pipeline_id)
+
+    stats = _collect(await db.execute(stmt), per_pipeline)
+    gaps = await _uncovered(db, since, until, pipeline_ids)
+    if not gaps:
+        return stats
+
+    stmt = select(
+        *_key(HealthCheck.pipeline_id, per_pipeline),
+        func.count(HealthCheck.id),
+        _failed(),
+        func.count(HealthCheck.response_time_ms),
+        func.sum(HealthCheck.response_time_ms),
+        func.sum(HealthCheck.response_time_ms * HealthCheck.response_time_ms),
+        func.min(HealthCheck.response_time_ms),
+        func.max(HealthCheck.response_time_ms),
+    ).where(_raw_ranges(gaps))
+    if pipeline_ids is not None:
+        stmt = stmt.where(HealthCheck.pipeline_id.in_(pipeline_ids))
+    if per_pipeline:
+        stmt = stmt.group_by(HealthCheck.pipeline_id)
+
+    for key, raw in _collect(await db.execute(stmt), per_pipeline).items():
+        if key in stats:
+            stats[key].merge(raw)
+        else:
+            stats[key] = raw
+    return stats
+
+
+async def latency_percentiles(
+        db: AsyncSession,
+        since: datetime,
+        until: Optional[datetime] = None,
+        pipeline_ids: Optional[List[int]] = None,
+        per_pipeline: bool = True
+) -> Dict[Optional[int], Dict[str, float]]:
+    """
+    p50/p90/p95/p99 response times over [since, until), merged from the
+    rollup buckets' latency sketches rather than sorted from raw checks.
+    Keys as in `window_stats()`; pipelines without latencies are left out.
+    Raw health_checks are sketched for parts of the window no rollup covers.
+    """
+    stmt = select(
+        HealthCheckRollup.pipeline_id,
+        HealthCheckRollup.latency_sketch,
+        HealthCheckRollup.latency_min,
+        HealthCheckRollup.latency_max,
+    ).where(or_(*_segments(since, until))).where(
+        HealthCheckRollup.latency_count > 0, HealthCheckRollup.latency_sketch.isnot(None)
+    )
+    if pipeline_ids is not None:
+        stmt = stmt.where(HealthCheckRollup.pipeline_id.in_(pipeline_ids))
+
+    grouped: Dict[Optional[int], list] = {}
+    for pipeline_id, sketch, latency_min, latency_max in (await db.execute(stmt)).all():
+        grouped.setdefault(pipeline_id if per_pipeline else None, []).append((sketch, latency_min, latency_max))
+
+    gaps = await _uncovered(db, since, until, pipeline_ids)
+    if gaps:
+        stmt = (
+            select(HealthCheck.pipeline_id, HealthCheck.response_time_ms)
+            .where(_raw_ranges(gaps))
+            .where(HealthCheck.response_time_ms.is_not(None))
+        )
+        if pipeline_ids is not None:
+            stmt = stmt.where(HealthCheck.pipeline_id.in_(pipeline_ids))
+
+        sketches: Dict[Optional[int], LatencySketch] = {}
+        bounds: Dict[Optional[int], Tuple[float, float]] = {}
+        for pipeline_id, response_time_ms in (await db.execute(stmt)).all():
+            key = pipeline_id if per_pipeline else None
+            sketch = sketches.get(key)
+            if sketch is None:
+                sketch = sketches[key] = LatencySketch()
+                bounds[key] = (response_time_ms, response_time_ms)
+            sketch.add(response_time_ms)
+            low, high = bounds[key]
+            bounds[key] = (min(low, response_time_ms), max(high, response_time_ms))
+        for key, sketch in sketches.items():
+            grouped.setdefault(key, []).append((sketch.to_bytes(), *bounds[key]))
+
+    result = {}
+    for key, rows in grouped.items():
+        sketch = LatencySketch.merge_many(row[0] for row in rows)
+        minimum = min(row[1] for row in rows)
+        maximum = max(row[2] for row in rows)
+        values = percentiles(sketch, minimum, maximum)
+        if values is not None:
+            result[key] = values
+    return result
+
+
+def _segment(resolution: str, start: datetime, end: Optional[datetime]):
+    return and_(
+        HealthCheckRollup.resolution == resolution,
+        HealthCheckRollup.bucket_start >= start,
+        *([HealthCheckRollup.bucket_start < end] if end is not None else [])
+    )
+
+
+def _segments(since: datetime, until: Optional[datetime]) -> list:
+    return [_segment(*segment) for segment in cover(since, until)]
+
+
+async def _uncovered(
+        db: AsyncSession,
+        since: datetime,
+        until: Optional[datetime],
+        pipeline_ids: Optional[List[int]]
+) -> List[Tuple[datetime, Optional[datetime]]]:
+    """
+    (start, end) ranges of [since, until) that rollups don't cover: each
+    segment of `cover()` up to its first bucket, or all of it without one.
+    Rollups are written as checks arrive, so they only go missing before
+    rolling up began or the first backfill reached; a coarse bucket right
+    after a gap may have started filling part way, so finer buckets place
+    the gap's end.
+    """
+    segments = cover(since, until)
+    queries = []
+    for i, segment in enumerate(segments):
+        stmt = select(literal(i), func.min(HealthCheckRollup.bucket_start)).where(_segment(*segment))
+        if pipeline_ids is not None:
+            stmt = stmt.where(HealthCheckRollup.pipeline_id.in_(pipeline_ids))
+        queries.append(stmt)
+    first = dict((await db.execute(union_all(*queries))).all())
+
+    gaps = []
+    for i, (resolution, start, end) in enumerate(segments):
+        covered = first.get(i)
+        if covered is not None and resolution != "1m" and (i == 0 or (gaps and gaps[-1][1] == start)):
+            covered = await _covered_from(db, resolution, covered, pipeline_ids)
+        if covered is not None and covered <= start:
+            continue
+        gap_end = end if covered is None else covered
+        if gaps and gaps[-1][1] == start:
+            gaps[-1] = (gaps[-1][0], gap_end)
+        else:
+            gaps.append((start, gap_end))
+    return gaps
+
+
+async def _covered_from(
+        db: AsyncSession,
+        resolution: str,
+        bucket: datetime,
+        pipeline_ids: Optional[List[int]]
+) -> datetime:
+    """Where the rolled up checks in one `resolution` bucket begin, as precisely as the finer buckets still kept tell"""
+    for finer in reversed(RESOLUTIONS[:RESOLUTIONS.index(resolution)]):
+        stmt = select(func.min(HealthCheckRollup.bucket_start)).where(
+            _segment(finer, bucket, bucket + _STEPS[resolution])
+        )
+        if pipeline_ids is not None:
+            stmt = stmt.where(HealthCheckRollup.pipeline_id.in_(pipeline_ids))
+        first = (await db.execute(stmt)).scalar()
+        if first is None:
+            break
+        bucket, resolution = first, finer
+    return bucket
+
+
+def _raw_ranges(ranges: List[Tuple[datetime, Optional[datetime]]]):
+    return or_(*(
+        and_(HealthCheck.checked_at >= start, *([HealthCheck.checked_at < end] if end is not None else []))
+        for start, end in ranges
+    ))
+
+
+def _key(column, per_pipeline: bool) -> list:
+    return [column] if per_pipeline else []
+
+
+def _collect(result, per_pipeline: bool) -> Dict[Optional[int], WindowStats]:
+    stats = {}
+    for row in result.all():
+        key, values = (row[0], row[1:]) if per_pipeline else (None, row)
+        if values[0]:
+            stats[key] = WindowStats(*values)
+    return stats
+
+
+async def backfill(since: Optional[datetime] = None, until: Optional[datetime] = None, chunk_size: int = 5000) -> int:
+    """
+    Rebuild rollups from raw health_checks between the day boundaries at or
+    before `since` and `until` (default: the start of today, UTC). Buckets
+    in that range are deleted and recomputed, so it is safe to re-run;
+    today's buckets are left to the live writer. Rows are read in id order,
+    `chunk_size` at a time.
+
+    Raw checks are only kept RAW_RETENTION_DAYS while rollups outlive them,
+    so buckets of days without any raw checks left are never touched: they
+    are all that is left of their history. Without `since` the range starts
+    at the first full day of raw checks; an explicit `since` may start on
+    the day of the oldest one (retention compacts that day before expiring it).
+    """
+    cutoff = bucket_start(until or datetime.utcnow(), "1d")
+
+    async with AsyncSessionLocal() as db:
+        oldest = (await db.execute(select(func.min(HealthCheck.checked_at)))).scalar()
+    if oldest is None:
+        return 0
+    if since is None:
+        start = _next_boundary(oldest, "1d")
+    else:
+        start = bucket_start(since, "1d")
+        if start < bucket_start(oldest, "1d"):
+            start = bucket_start(oldest, "1d")
+            print(f"  raw checks before {start} are gone, keeping the rollups before it")
+    if start >= cutoff:
+        return 0
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            delete(HealthCheckRollup)
+            .where(HealthCheckRollup.bucket_start >= start)
+            .where(HealthCheckRollup.bucket_start < cutoff)
+        )
+        await db.commit()
+
+    writer = RollupWriter()
+    processed = 0
+    last_id = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            stmt = (
+                select(
+                    HealthCheck.id,
+                    HealthCheck.pipeline_id,
+                    HealthCheck.status,
+                    HealthCheck.response_time_ms,
+                    HealthCheck.checked_at
+                )
+                .where(HealthCheck.id > last_id)
+                .where(HealthCheck.checked_at >= start)
+                .where(HealthCheck.checked_at < cutoff)
+                .order_by(HealthCheck.id)
+                .limit(chunk_size)
+            )
+            result = await db.execute(stmt)
+            rows = [row._asdict() for row in result.all()]
+            if not rows:
+                break
+
+            await writer.apply(db, rows)
+            await db.commit()
+
+        processed += len(rows)
+        last_id = rows[-1]["id"]
+        print(f"  rolled up {processed} checks")
+
+    return processed
@@ -0,0 +1,178 @@
+"""
+Per-pipeline deadline scheduler for health checks
+"""
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.config import get_settings
+from app.services.circuit_breaker import CircuitBreaker
+
+settings = get_settings()
+
+
+class ScheduledPipeline:
+    """Lightweight snapshot of the pipeline columns a health check needs"""
+
+    __slots__ = (
+        "id", "name", "endpoint_url", "check_interval", "timeout",
+        "current_status", "owner_team", "breaker",
+    )
+
+    def __init__(self, pipeline):
+        self.id = pipeline.id
+        self.name = pipeline.name
+        self.endpoint_url = str(pipeline.endpoint_url)
+        self.check_interval = pipeline.check_interval or settings.HEALTH_CHECK_INTERVAL
+        self.timeout = pipeline.timeout or settings.HEALTH_CHECK_TIMEOUT
+        self.current_status = pipeline.current_status
+        self.owner_team = pipeline.owner_team
+        self.breaker = CircuitBreaker(pipeline.circuit_state, pipeline.consecutive_failures)
+
+
+class CheckScheduler:
+    """
+    Min-heap of pipelines keyed on their next due time.
+
+    Heap entries are (due, seq, pipeline_id), seq increasing across all
+    pipelines. Only a pipeline's latest seq is live, so entries left behind
+    by rescheduling or removing it (even if it is added again later) are
+    skipped when popped instead of being searched for and deleted.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, int]] = []
+        self._pipelines: Dict[int, ScheduledPipeline] = {}
+        self._live: Dict[int, int] = {}  # pipeline id -> seq of its live heap entry
+        self._due: Dict[int, float] = {}  # absent while the pipeline's check is in flight
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self.max_lag = 0.0
+
+    def __len__(self) -> int:
+        return len(self._pipelines)
+
+    def __contains__(self, pipeline_id: int) -> bool:
+        return pipeline_id in self._pipelines
+
+    def get(self, pipeline_id: int) -> Optional[ScheduledPipeline]:
+        return self._pipelines.get(pipeline_id)
+
+    def _jitter(self, interval: float) -> float:
+        spread = interval * settings.SCHEDULER_JITTER
+        return random.uniform(-spread, spread)
+
+    def _push(self, pipeline_id: int, due: float):
+        seq = next(self._seq)
+        self._live[pipeline_id] = seq
+        self._due[pipeline_id] = due
+
+        was_first = not self._heap or due < self._heap[0][0]
+        heapq.heappush(self._heap, (due, seq, pipeline_id))
+        if was_first:
+            self._wakeup.set()
+
+    def add(self, pipeline):
+        """Add or refresh a pipeline without disturbing the rest of the schedule"""
+        snapshot = ScheduledPipeline(pipeline)
+        existing = self._pipelines.get(snapshot.id)
+        if existing is None:
+            self._pipelines[snapshot.id] = snapshot
+            # Spread new pipelines over their first interval
+            self._push(snapshot.id, time.monotonic() + random.uniform(0, snapshot.check_interval))
+            return
+
+        # Refresh the settings in place: a check in flight holds this object,
+        # and the worker owns status and breaker state, which the stored
+        # values may lag while results are still buffered
+        old_interval = existing.check_interval
+        for name in ("name", "endpoint_url", "check_interval", "timeout", "owner_team"):
+            setattr(existing, name, getattr(snapshot, name))
+        # In flight (no pending due time): rescheduling after the check picks up the new interval
+        due = self._due.get(snapshot.id)
+        if due is not None and existing.check_interval != old_interval:
+            self._push(snapshot.id, min(due, time.monotonic() + existing.check_interval))
+
+    def remove(self, pipeline_id: int):
+        """Drop a pipeline; its heap entry is discarded lazily"""
+        self._pipelines.pop(pipeline_id, None)
+        self._live.pop(pipeline_id, None)
+        self._due.pop(pipeline_id, None)
+
+    def sync(self, pipelines):
+        """Reconcile with the full set of active pipelines, adding, refreshing and removing entries"""
+        active = set()
+        for pipeline in pipelines:
+            active.add(pipeline.id)
+            self.add(pipeline)
+        for pipeline_id in list(self._pipelines):
+            if pipeline_id not in active:
+                self.remove(pipeline_id)
+
+    def clear(self):
+        self._heap.clear()
+        self._pipelines.clear()
+        self._live.clear()
+        self._due.clear()
+
+    def reschedule(self, pipeline_id: int, after: float, interval: Optional[float] = None):
+        """Schedule the next check one interval after the previous due time"""
+        pipeline = self._pipelines.get(pipeline_id)
+        if pipeline is None:
+            return
+
+        interval = interval or pipeline.check_interval
+        now = time.monotonic()
+        due = after + interval + self._jitter(interval)
+        if due < now:
+            # Fell behind by more than a full interval: skip missed slots
+            # instead of firing a burst of catch-up checks
+            due = now + random.uniform(0, min(interval, 1.0))
+        self._push(pipeline_id, due)
+
+    def _pop_due(self, now: float) -> List[Tuple[ScheduledPipeline, float]]:
+        due_pipelines = []
+        while self._heap and self._heap[0][0] <= now:
+            due, seq, pipeline_id = heapq.heappop(self._heap)
+            if self._live.get(pipeline_id) != seq:
+                continue
+            # In flight until rescheduled
+            del self._due[pipeline_id]
+            self.max_lag = max(self.max_lag, now - due)
+            due_pipelines.append((self._pipelines[pipeline_id], due))
+        return due_pipelines
+
+    async def wait_due(self) -> List[Tuple[ScheduledPipeline, float]]:
+        """Sleep until at least one pipeline is due and return (pipeline, due_time) pairs"""
+        while True:
+            now = time.monotonic()
+            due_pipelines = self._pop_due(now)
+            if due_pipelines:
+                return due_pipelines
+
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        next_due = None
+        for due, seq, pipeline_id in self._heap:
+            if self._live.get(pipeline_id) == seq:
+                next_due = due if next_due is None else min(next_due, due)
+        return {
+            "scheduled_pipelines": len(self._pipelines),
+            "heap_size": len(self._heap),
+            "next_due_in_seconds": round(next_due - now, 3) if next_due is not None else None,
+            "max_lag_seconds": round(self.max_lag, 3),
+        }
+
+
+# Global scheduler instance
+check_scheduler = CheckScheduler()
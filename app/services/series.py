@@ -0,0 +1,243 @@
+"""
+Downsampled latency/error time series for charts
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import case, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import HealthCheck, HealthCheckRollup, HealthStatus
+from app.config import get_settings
+from app.services.rollups import RESOLUTIONS
+
+settings = get_settings()
+
+METHODS = ("minmax", "lttb")
+
+_EPOCH = datetime(1970, 1, 1)
+_RESOLUTION_SECONDS = {"1m": 60, "1h": 3600, "1d": 86400}
+
+
+def _to_micros(values) -> np.ndarray:
+    return (np.array(values, dtype="datetime64[us]") - np.datetime64(_EPOCH, "us")).astype(np.int64)
+
+
+def _from_micros(micros: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=int(micros))
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Indices of the `points` samples largest-triangle-three-buckets keeps:
+    the first and last, plus from each of `points - 2` equal-count buckets
+    the sample forming the largest triangle with the previously kept one
+    and the next bucket's mean
+    """
+    size = len(x)
+    if points >= size:
+        return np.arange(size)
+    if points < 3:
+        # No buckets between the endpoints
+        return np.array([0, size - 1][:max(points, 0)], dtype=np.int64)
+    every = (size - 2) / (points - 2)
+    kept = np.empty(points, dtype=np.int64)
+    kept[0], kept[-1] = 0, size - 1
+    a = 0
+    for i in range(points - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, size)
+        mean_x = x[end:next_end].mean()
+        mean_y = y[end:next_end].mean()
+        area = np.abs((x[a] - mean_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (mean_y - y[a]))
+        a = start + int(area.argmax())
+        kept[i + 1] = a
+    return kept
+
+
+class _Series:
+    """Column arrays of time-ordered samples: raw checks or rollup buckets"""
+
+    def __init__(self, micros, checks, failed, latency_count, latency_sum, latency_min, latency_max):
+        self.micros = micros
+        self.checks = checks
+        self.failed = failed
+        self.latency_count = latency_count
+        self.latency_sum = latency_sum
+        self.latency_min = latency_min  # NaN without latencies
+        self.latency_max = latency_max
+
+    def __len__(self):
+        return len(self.micros)
+
+    @property
+    def avg(self) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.latency_count > 0, self.latency_sum / self.latency_count, np.nan)
+
+    def take(self, index: np.ndarray) -> "_Series":
+        return _Series(*(column[index] for column in self._columns()))
+
+    def bucketed(self, start: int, width: int) -> "_Series":
+        """Merge samples into `width`-micros bins from `start`; empty bins are left out"""
+        bins = (self.micros - start) // width
+        first = np.flatnonzero(np.concatenate(([True], bins[1:] != bins[:-1])))
+        return _Series(
+            start + bins[first] * width,
+            np.add.reduceat(self.checks, first),
+            np.add.reduceat(self.failed, first),
+            np.add.reduceat(self.latency_count, first),
+            np.add.reduceat(self.latency_sum, first),
+            np.fmin.reduceat(self.latency_min, first),
+            np.fmax.reduceat(self.latency_max, first),
+        )
+
+    def _columns(self):
+        return (self.micros, self.checks, self.failed, self.latency_count,
+                self.latency_sum, self.latency_min, self.latency_max)
+
+    def points(self) -> List[dict]:
+        avg = self.avg
+        return [
+            {
+                "t": _from_micros(micros),
+                "avg": None if np.isnan(mean) else round(mean, 2),
+                "min": None if np.isnan(low) else round(low, 2),
+                "max": None if np.isnan(high) else round(high, 2),
+                "checks": checks,
+                "failed": failed,
+            }
+            for micros, mean, low, high, checks, failed in zip(
+                self.micros.tolist(), avg.tolist(), self.latency_min.tolist(),
+                self.latency_max.tolist(), self.checks.tolist(), self.failed.tolist()
+            )
+        ]
+
+
+def choose_source(since: datetime, until: datetime, points: int, now: Optional[datetime] = None) -> str:
+    """
+    "raw" when each point spans under a minute and raw checks still cover
+    the range, else the coarsest rollup resolution no wider than a point
+    whose retention reaches back to `since`
+    """
+    now = now or datetime.utcnow()
+    step = (until - since).total_seconds() / points
+    if step < _RESOLUTION_SECONDS["1m"] and since >= now - timedelta(days=settings.RAW_RETENTION_DAYS):
+        return "raw"
+    retention = {
+        "1m": settings.ROLLUP_1M_RETENTION_DAYS,
+        "1h": settings.ROLLUP_1H_RETENTION_DAYS,
+        "1d": settings.ROLLUP_1D_RETENTION_DAYS,
+    }
+    fitting = [r for r in RESOLUTIONS if _RESOLUTION_SECONDS[r] <= step] or ["1m"]
+    position = RESOLUTIONS.index(fitting[-1])
+    for resolution in RESOLUTIONS[position:]:
+        if since >= now - timedelta(days=retention[resolution]):
+            return resolution
+    return RESOLUTIONS[-1]
+
+
+async def _rollup_series(db: AsyncSession, pipeline_id: int, resolution: str,
+                         since: datetime, until: datetime) -> _Series:
+    result = await db.execute(
+        select(
+            HealthCheckRollup.bucket_start,
+            HealthCheckRollup.check_count,
+            HealthCheckRollup.failed_count,
+            HealthCheckRollup.latency_count,
+            HealthCheckRollup.latency_sum,
+            HealthCheckRollup.latency_min,
+            HealthCheckRollup.latency_max,
+        )
+        .where(HealthCheckRollup.pipeline_id == pipeline_id)
+        .where(HealthCheckRollup.resolution == resolution)
+        .where(HealthCheckRollup.bucket_start >= since)
+        .where(HealthCheckRollup.bucket_start < until)
+        .order_by(HealthCheckRollup.bucket_start)
+    )
+    return _columns(result.all(), raw=False)
+
+
+async def _raw_series(db: AsyncSession, pipeline_id: int, since: datetime, until: datetime) -> _Series:
+    result = await db.execute(
+        select(
+            HealthCheck.checked_at,
+            case((HealthCheck.status == HealthStatus.HEALTHY, 0), else_=1),
+            HealthCheck.response_time_ms,
+        )
+        .where(HealthCheck.pipeline_id == pipeline_id)
+        .where(HealthCheck.checked_at >= since)
+        .where(HealthCheck.checked_at < until)
+        .order_by(HealthCheck.checked_at)
+    )
+    return _columns(result.all(), raw=True)
+
+
+def _columns(rows, raw: bool) -> _Series:
+    if not rows:
+        empty = np.empty(0)
+        return _Series(np.empty(0, np.int64), empty.astype(np.int64), empty.astype(np.int64),
+                       empty.astype(np.int64), empty, empty, empty)
+    columns = list(zip(*rows))
+    micros = _to_micros(columns[0])
+    if raw:
+        latency = np.array(columns[2], dtype=np.float64)  # None becomes NaN
+        measured = ~np.isnan(latency)
+        return _Series(
+            micros, np.ones(len(rows), np.int64), np.array(columns[1], np.int64),
+            measured.astype(np.int64), np.where(measured, latency, 0.0), latency, latency,
+        )
+    return _Series(
+        micros,
+        np.array(columns[1], np.int64),
+        np.array(columns[2], np.int64),
+        np.array(columns[3], np.int64),
+        np.array(columns[4], dtype=np.float64),
+        np.array(columns[5], dtype=np.float64),
+        np.array(columns[6], dtype=np.float64),
+    )
+
+
+async def pipeline_series(
+        db: AsyncSession,
+        pipeline_id: int,
+        since: datetime,
+        until: datetime,
+        points: int,
+        method: str = "minmax"
+) -> Dict:
+    """
+    At most `points` samples of a pipeline's latency (avg/min/max) and
+    check/failure counts over [since, until). Read from the finest rollup
+    resolution that still needs downsampling (raw checks when points are
+    under a minute apart, or when no rollups cover the range), then reduced
+    either into equal-time min/max/avg bins or, with "lttb", to the buckets
+    largest-triangle-three-buckets keeps on the average latency.
+    """
+    source = choose_source(since, until, points)
+    series = None
+    if source != "raw":
+        series = await _rollup_series(db, pipeline_id, source, since, until)
+    if series is None or not len(series):
+        source = "raw"
+        series = await _raw_series(db, pipeline_id, since, until)
+
+    if len(series) > points:
+        if method == "lttb":
+            measured = series.take(np.flatnonzero(series.latency_count > 0))
+            series = measured.take(lttb(measured.micros.astype(np.float64), measured.avg, points))
+        else:
+            start = int(_to_micros([since])[0])
+            width = -(-int(_to_micros([until])[0] - start) // points)
+            series = series.bucketed(start, width)
+
+    return {
+        "pipeline_id": pipeline_id,
+        "from": since,
+        "to": until,
+        "source": source,
+        "method": method,
+        "points": series.points(),
+    }
@@ -0,0 +1,139 @@
+"""
+Consistent-hash partitioning of pipelines across standalone worker processes
+"""
+import asyncio
+import bisect
+import hashlib
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.database import AsyncSessionLocal
+from app.models import WorkerMember
+from app.config import get_settings
+
+settings = get_settings()
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes so load stays even as members change"""
+
+    def __init__(self, members: Iterable[str] = (), vnodes: int = 200):
+        self.vnodes = vnodes
+        self.members: Tuple[str, ...] = tuple(sorted(set(members)))
+        points = [
+            (_hash(f"{member}#{i}"), member)
+            for member in self.members
+            for i in range(vnodes)
+        ]
+        points.sort()
+        self._keys = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, pipeline_id: int) -> Optional[str]:
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, _hash(str(pipeline_id))) % len(self._keys)
+        return self._owners[index]
+
+
+class ShardMembership:
+    """
+    Tracks live workers through heartbeats in the worker_members table and
+    decides which pipelines this worker owns. `changed` is set whenever the
+    member set (and therefore the partitioning) changes.
+
+    Once peers may have expired this worker (its row went missing or
+    stale, or heartbeats failed for WORKER_MEMBER_TTL) it owns nothing
+    until a heartbeat has re-registered it and peers had an interval to
+    see it, so no pipeline is checked by two workers meanwhile.
+    """
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.ring = HashRing()
+        self.changed = asyncio.Event()
+        self._last_beat: Optional[float] = None  # monotonic time of the last successful heartbeat
+
+    def owns(self, pipeline_id: int) -> bool:
+        return self.ring.owner(pipeline_id) == self.worker_id
+
+    @property
+    def members(self) -> List[str]:
+        return list(self.ring.members)
+
+    async def heartbeat(self):
+        """Refresh our own row, expire dead members and rebuild the ring if membership changed"""
+        now = datetime.utcnow()
+        expired = now - timedelta(seconds=settings.WORKER_MEMBER_TTL)
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(WorkerMember)
+                .where(WorkerMember.worker_id == self.worker_id)
+                .where(WorkerMember.heartbeat_at >= expired)
+                .values(heartbeat_at=now)
+            )
+            registered = bool(result.rowcount)
+            await db.execute(delete(WorkerMember).where(WorkerMember.heartbeat_at < expired))
+            if not registered:
+                db.add(WorkerMember(
+                    worker_id=self.worker_id,
+                    hostname=socket.gethostname(),
+                    pid=os.getpid(),
+                    started_at=now,
+                    heartbeat_at=now
+                ))
+            try:
+                await db.commit()
+            except IntegrityError:
+                await db.rollback()
+
+            result = await db.execute(select(WorkerMember.worker_id))
+            members = [row[0] for row in result.all()]
+
+        rejoined = not registered and self._last_beat is not None
+        self._last_beat = time.monotonic()
+        if rejoined:
+            # Peers took our pipelines over when our row expired
+            self._use(HashRing(), "Worker membership expired, rejoining with no pipelines")
+            return
+
+        if self.worker_id not in members:
+            members.append(self.worker_id)
+
+        if tuple(sorted(members)) != self.ring.members:
+            self._use(HashRing(members), f"Worker membership changed: {len(members)} live workers")
+
+    def _use(self, ring: HashRing, reason: str):
+        self.ring = ring
+        self.changed.set()
+        print(reason)
+
+    async def run(self):
+        """Heartbeat loop; database errors keep the last known ring until our row would have expired"""
+        while True:
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                print(f"Worker heartbeat failed: {e}")
+                stale = self._last_beat is None or time.monotonic() - self._last_beat > settings.WORKER_MEMBER_TTL
+                if stale and self.ring.members:
+                    self._use(HashRing(), "Worker heartbeats failing past WORKER_MEMBER_TTL, dropping all pipelines")
+            await asyncio.sleep(settings.WORKER_HEARTBEAT_INTERVAL)
+
+    async def leave(self):
+        """Remove our row so peers rebalance immediately instead of waiting for expiry"""
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(WorkerMember).where(WorkerMember.worker_id == self.worker_id))
+            await db.commit()
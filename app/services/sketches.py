@@ -0,0 +1,151 @@
+"""
+Mergeable latency quantile sketches (DDSketch-style log buckets)
+"""
+import math
+import struct
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Any quantile is returned within this fraction of the true value
+RELATIVE_ACCURACY = 0.01
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+# Latencies at or below this (ms) are counted as zero
+_MIN_VALUE = 1e-3
+
+_VERSION = 1
+_HEADER = struct.Struct("<BI")  # version, zero count
+_KEY = np.dtype("<i2")
+_COUNT = np.dtype("<u4")
+
+
+def _key(value: float) -> int:
+    return math.ceil(math.log(value) / _LOG_GAMMA)
+
+
+def _value(key: np.ndarray) -> np.ndarray:
+    """Midpoint of each bucket (gamma^(k-1), gamma^k], within RELATIVE_ACCURACY of anything in it"""
+    return 2 * np.power(_GAMMA, key) / (_GAMMA + 1)
+
+
+class LatencySketch:
+    """
+    Counts of response times in logarithmic buckets, each RELATIVE_ACCURACY
+    wide, so two sketches merge by adding counts and every quantile of the
+    merged data stays within RELATIVE_ACCURACY. A bucket per distinct key,
+    roughly a few hundred for latencies spanning 1ms to 10s.
+
+    Serialized as a small header plus sorted int16 keys and uint32 counts;
+    `merge_many()` combines any number of serialized sketches in one pass.
+    """
+
+    __slots__ = ("counts", "zero_count")
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.zero_count = 0
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.counts.values())
+
+    def add(self, value: float):
+        if value <= _MIN_VALUE:
+            self.zero_count += 1
+            return
+        key = _key(value)
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def merge(self, other: "LatencySketch"):
+        self.zero_count += other.zero_count
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+
+    def to_bytes(self) -> bytes:
+        keys = sorted(self.counts)
+        return (
+            _HEADER.pack(_VERSION, self.zero_count)
+            + np.asarray(keys, dtype=_KEY).tobytes()
+            + np.asarray([self.counts[key] for key in keys], dtype=_COUNT).tobytes()
+        )
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes]) -> "LatencySketch":
+        sketch = cls()
+        if data:
+            zero_count, keys, counts = _unpack(data)
+            sketch.zero_count = zero_count
+            sketch.counts = dict(zip(keys.tolist(), counts.tolist()))
+        return sketch
+
+    @staticmethod
+    def merge_many(blobs: Iterable[Optional[bytes]]) -> "LatencySketch":
+        zero_count = 0
+        key_parts, count_parts = [], []
+        for data in blobs:
+            if not data:
+                continue
+            zeros, keys, counts = _unpack(data)
+            zero_count += zeros
+            key_parts.append(keys)
+            count_parts.append(counts)
+
+        sketch = LatencySketch()
+        sketch.zero_count = zero_count
+        if key_parts:
+            keys, inverse = np.unique(np.concatenate(key_parts), return_inverse=True)
+            counts = np.bincount(inverse, weights=np.concatenate(count_parts))
+            sketch.counts = dict(zip(keys.tolist(), counts.astype(np.int64).tolist()))
+        return sketch
+
+    def quantiles(
+            self,
+            qs=QUANTILES,
+            minimum: Optional[float] = None,
+            maximum: Optional[float] = None
+    ) -> Optional[List[float]]:
+        """
+        Values at each quantile in `qs`, clamped to the exact `minimum`/
+        `maximum` when known; None for an empty sketch
+        """
+        total = self.count
+        if not total:
+            return None
+        keys = np.array(sorted(self.counts), dtype=np.int64)
+        cumulative = self.zero_count + np.cumsum([self.counts[key] for key in keys.tolist()])
+        values = []
+        for q in qs:
+            # Lower quantile: the smallest value with more than q * (n - 1) values at or below it
+            rank = q * (total - 1)
+            if rank < self.zero_count:
+                value = 0.0
+            else:
+                value = float(_value(keys[np.searchsorted(cumulative, rank, side="right")]))
+            if minimum is not None:
+                value = max(value, minimum)
+            if maximum is not None:
+                value = min(value, maximum)
+            values.append(value)
+        return values
+
+
+def _unpack(data: bytes):
+    version, zero_count = _HEADER.unpack_from(data)
+    if version != _VERSION:
+        raise ValueError(f"Unknown latency sketch version {version}")
+    size = (len(data) - _HEADER.size) // (_KEY.itemsize + _COUNT.itemsize)
+    keys = np.frombuffer(data, dtype=_KEY, count=size, offset=_HEADER.size)
+    counts = np.frombuffer(data, dtype=_COUNT, count=size, offset=_HEADER.size + size * _KEY.itemsize)
+    return zero_count, keys, counts
+
+
+def percentiles(sketch: LatencySketch, minimum: Optional[float] = None,
+                maximum: Optional[float] = None) -> Optional[Dict[str, float]]:
+    """{"p50": ..., "p90": ..., "p95": ..., "p99": ...} in ms, or None without latencies"""
+    values = sketch.quantiles(QUANTILES, minimum, maximum)
+    if values is None:
+        return None
+    return {f"p{round(q * 100)}": round(value, 2) for q, value in zip(QUANTILES, values)}
@@ -0,0 +1,83 @@
+"""
+Standalone health check worker.
+
+    python -m app.worker --processes 4
+
+Runs N worker processes outside the API. Each joins the worker_members
+table and checks only the pipelines that hash to it, so throughput scales
+with cores and nodes. Set EMBEDDED_WORKER=False on the API processes when
+running checks this way.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import signal
+
+from app.config import get_settings
+from app.database import init_db
+from app.services.cache import cache_service
+from app.services.health_checker import HealthCheckWorker
+from app.services.sharding import ShardMembership
+
+settings = get_settings()
+
+
+async def run_worker():
+    """Run one sharded worker until SIGINT/SIGTERM, then flush and leave the ring"""
+    # Cache invalidations and pipeline events from the API replicas
+    await cache_service.connect()
+    worker = HealthCheckWorker(shard=ShardMembership())
+    task = asyncio.create_task(worker.run())
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, task.cancel)
+
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await cache_service.close()
+
+
+def _process_main():
+    asyncio.run(run_worker())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DataPulse health check worker")
+    parser.add_argument(
+        "--processes", "-n", type=int, default=multiprocessing.cpu_count(),
+        help="number of worker processes to run on this node (default: CPU count)"
+    )
+    args = parser.parse_args()
+
+    asyncio.run(init_db())
+
+    if args.processes <= 1:
+        _process_main()
+        return
+
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=_process_main, daemon=False) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+
+    # Children get SIGINT from the terminal or SIGTERM forwarded below
+    def forward(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, forward)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
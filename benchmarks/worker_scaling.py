@@ -0,0 +1,133 @@
+"""
+Health check throughput at 1, 2, 4 and 8 sharded worker processes.
+
+    python -m benchmarks.worker_scaling --pipelines 5000 --workers 1,2,4,8
+
+Seeds a scratch SQLite database with pipelines due every second, points
+them at local target servers, then runs `python -m app.worker -n N` for
+each N and reports persisted checks per second over a steady window.
+Demand (pipelines / second) should exceed capacity, so the result is
+bounded by the workers rather than by the schedule.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+TARGET_BASE_PORT = 18700
+
+
+async def _target_app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def _serve_target(port: int):
+    import uvicorn
+    uvicorn.run(_target_app, host="127.0.0.1", port=port, log_level="error", access_log=False)
+
+
+async def _seed(pipeline_count: int, target_count: int):
+    from app.database import init_db, AsyncSessionLocal
+    from app.models import Pipeline, PipelineType
+
+    await init_db()
+    async with AsyncSessionLocal() as db:
+        db.add_all([
+            Pipeline(
+                name=f"bench-{i}",
+                pipeline_type=PipelineType.BATCH,
+                endpoint_url=f"http://127.0.0.1:{TARGET_BASE_PORT + i % target_count}/health",
+                check_interval=1,
+                timeout=5,
+            )
+            for i in range(pipeline_count)
+        ])
+        await db.commit()
+
+
+async def _count_checks() -> int:
+    from sqlalchemy import func, select
+    from app.database import AsyncSessionLocal
+    from app.models import HealthCheck
+
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(func.count(HealthCheck.id)))).scalar()
+
+
+async def _reset():
+    from sqlalchemy import delete
+    from app.database import AsyncSessionLocal
+    from app.models import HealthCheck, WorkerMember
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(HealthCheck))
+        await db.execute(delete(WorkerMember))
+        await db.commit()
+
+
+def _measure(processes: int, warmup: float, duration: float, env: dict) -> float:
+    asyncio.run(_reset())
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "app.worker", "--processes", str(processes)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        time.sleep(warmup)
+        start_count, start = asyncio.run(_count_checks()), time.perf_counter()
+        time.sleep(duration)
+        end_count, end = asyncio.run(_count_checks()), time.perf_counter()
+    finally:
+        worker.terminate()
+        worker.wait(timeout=60)
+    return (end_count - start_count) / (end - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pipelines", type=int, default=5000)
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--targets", type=int, default=4, help="local target server processes")
+    parser.add_argument("--warmup", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=20.0)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="datapulse-bench-")
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite+aiosqlite:///{scratch}/bench.db",
+        "SCHEDULER_RESYNC_INTERVAL": "2",
+        "WORKER_HEARTBEAT_INTERVAL": "1",
+    })
+    # Settings are read at import time, so configure before importing app
+    os.environ.update(env)
+
+    ctx = multiprocessing.get_context("spawn")
+    targets = [ctx.Process(target=_serve_target, args=(TARGET_BASE_PORT + i,), daemon=True)
+               for i in range(args.targets)]
+    for target in targets:
+        target.start()
+
+    try:
+        asyncio.run(_seed(args.pipelines, args.targets))
+        print(f"{args.pipelines} pipelines due every 1s, {os.cpu_count()} CPUs")
+        print(f"{'workers':>8} {'checks/s':>10} {'speedup':>8}")
+        baseline = None
+        for processes in [int(n) for n in args.workers.split(",")]:
+            rate = _measure(processes, args.warmup, args.duration, env)
+            baseline = baseline or rate
+            print(f"{processes:>8} {rate:>10.0f} {rate / baseline:>7.2f}x", flush=True)
+    finally:
+        for target in targets:
+            target.terminate()
+
+
+if __name__ == "__main__":
+    main()
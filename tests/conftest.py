@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# Before any app module reads the settings: tests never touch the configured database or Redis
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/datapulse-test.db"
+os.environ["REDIS_URL"] = "redis://127.0.0.1:1/0"
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.services import alerts
+from app.services.alerts import AlertService, TokenBucket
+
+
+@pytest.fixture(autouse=True)
+def policy(monkeypatch):
+    for name, value in [("ALERT_DEDUPE_SECONDS", 900), ("ALERT_RATE_PER_SECOND", 100.0), ("ALERT_BURST", 5),
+                        ("ALERT_MAX_ATTEMPTS", 3), ("ALERT_RETRY_BASE_SECONDS", 0.01),
+                        ("SLACK_WEBHOOK_URL", "https://hooks.example.com/alerts")]:
+        monkeypatch.setattr(alerts.settings, name, value)
+
+
+def _pipeline(pipeline_id: int = 1):
+    return SimpleNamespace(id=pipeline_id, name=f"pipeline-{pipeline_id}")
+
+
+def _send(service: AlertService, responses: list):
+    requests = []
+
+    def handler(request):
+        requests.append(time.monotonic())
+        return responses.pop(0)
+
+    async def scenario():
+        service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await service._send_with_retry("slack", "🚨 Pipeline Alert")
+        finally:
+            await service._client.aclose()
+
+    return asyncio.run(scenario()), requests
+
+
+def test_repeats_within_the_window_are_suppressed(monkeypatch):
+    service = AlertService()
+    first = service._alert(_pipeline(), "critical", "status:down", "down")
+    repeat = service._alert(_pipeline(), "critical", "status:down", "down again")
+    other_kind = service._alert(_pipeline(), "info", "anomaly:response_time", "slow")
+    other_pipeline = service._alert(_pipeline(2), "critical", "status:down", "down")
+
+    assert not first["suppressed"] and repeat["suppressed"]
+    assert not other_kind["suppressed"] and not other_pipeline["suppressed"]
+
+    monkeypatch.setattr(alerts.settings, "ALERT_DEDUPE_SECONDS", 0)
+    assert not service._alert(_pipeline(), "critical", "status:down", "down later")["suppressed"]
+    assert list(service._last_queued) == ["1:status:down"]
+
+
+def test_rate_limit_response_pauses_the_channel():
+    service = AlertService()
+    (attempts, error), requests = _send(service, [
+        httpx.Response(429, headers={"retry-after": "0.2"}),
+        httpx.Response(200),
+    ])
+
+    assert (attempts, error) == (2, None)
+    assert requests[1] - requests[0] >= 0.2
+
+
+def test_client_errors_are_not_retried_and_server_errors_are():
+    (attempts, error), _ = _send(AlertService(), [httpx.Response(400)])
+    assert (attempts, error) == (1, "HTTP 400")
+
+    (attempts, error), _ = _send(AlertService(), [httpx.Response(503)] * 3)
+    assert (attempts, error) == (3, "HTTP 503")
+
+
+def test_token_bucket_pause_holds_back_the_next_send():
+    async def scenario():
+        bucket = TokenBucket(rate=50, burst=1)
+        await bucket.acquire()
+        bucket.pause(0.1)
+        started = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.1
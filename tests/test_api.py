@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from app.database import engine
+from app.main import app
+from app.models import Base
+from app.services.baselines import baseline_elector, baseline_job
+from app.services.cache import cache_service
+from app.services.health_checker import HealthCheckWorker
+from app.services.recent_checks import recent_checks
+from app.services.scheduler import CheckScheduler, check_scheduler
+
+
+@pytest.fixture
+def api():
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    worker = HealthCheckWorker(scheduler=CheckScheduler(), recent=recent_checks)
+    cache_service.events.subscribe("pipeline", worker.on_pipeline_event)
+    recent_checks.live = True
+    yield lambda: httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    recent_checks.reset()
+    cache_service.events.unsubscribe("pipeline", worker.on_pipeline_event)
+    asyncio.run(engine.dispose())
+
+
+def _create(client, name="orders"):
+    return client.post("/api/pipelines/", json={
+        "name": name, "pipeline_type": "batch", "endpoint_url": "http://example.com/health",
+    })
+
+
+def test_recent_checks_survive_pipeline_update(api):
+    async def scenario():
+        async with api() as client:
+            pipeline_id = (await _create(client)).json()["id"]
+            recent_checks.add([{
+                "id": 1, "pipeline_id": pipeline_id, "status": "healthy", "response_time_ms": 42.0,
+                "status_code": 200, "error_message": None, "checked_at": datetime.utcnow(),
+            }])
+            response = await client.patch(f"/api/pipelines/{pipeline_id}", json={"check_interval": 120})
+            assert response.status_code == 200
+
+            checks = (await client.get(f"/api/health-checks/pipeline/{pipeline_id}")).json()
+            check_scheduler.remove(pipeline_id)
+            return checks
+
+    checks = asyncio.run(scenario())
+    assert [check["id"] for check in checks] == [1]
+    assert checks[0]["response_time_ms"] == 42.0
+
+
+def test_deleted_pipeline_drops_its_recent_checks(api):
+    async def scenario():
+        async with api() as client:
+            pipeline_id = (await _create(client)).json()["id"]
+            recent_checks.add([{
+                "id": 1, "pipeline_id": pipeline_id, "status": "down", "response_time_ms": None,
+                "status_code": None, "error_message": "timeout", "checked_at": datetime.utcnow(),
+            }])
+            response = await client.delete(f"/api/pipelines/{pipeline_id}")
+            assert response.status_code in (200, 204)
+            return pipeline_id
+
+    pipeline_id = asyncio.run(scenario())
+    assert recent_checks.latest(pipeline_id, 10, since=datetime.utcnow() - timedelta(hours=1)) == []
+
+
+def test_baseline_build_only_runs_on_the_leader(api, monkeypatch):
+    async def run():
+        async with api() as client:
+            return await client.post("/api/admin/baselines/run")
+
+    monkeypatch.setattr(baseline_elector, "is_leader", False)
+    response = asyncio.run(run())
+    assert response.status_code == 409
+    assert not baseline_job._run_requested.is_set()
+
+    monkeypatch.setattr(baseline_elector, "is_leader", True)
+    response = asyncio.run(run())
+    assert response.status_code == 202 and response.json() == {"started": True}
+    assert baseline_job._run_requested.is_set()
+    baseline_job._run_requested.clear()
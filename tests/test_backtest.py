@@ -0,0 +1,33 @@
+import numpy as np
+
+from app.services.anomaly_detector import ChangePointDetector
+from app.services.backtest import shift_alerts
+
+MINUTE_MICROS = 60_000_000
+
+
+def _checks(latency, failed):
+    micros = np.arange(len(latency), dtype=np.int64) * MINUTE_MICROS + 1_770_000_000_000_000
+    return micros, np.asarray(latency, dtype=np.float64), np.asarray(failed, dtype=np.float64)
+
+
+def test_latency_step_raises_shift_alert():
+    rng = np.random.default_rng(3)
+    latency = np.concatenate([rng.normal(100, 5, 200), rng.normal(200, 5, 100)])
+    detector = ChangePointDetector()
+    alerts = shift_alerts(detector, 1, *_checks(latency, np.zeros(300)))
+
+    hits = np.flatnonzero(alerts["response_time_shift"])
+    assert hits.size and 200 <= hits[0] < 210
+    assert not alerts["error_rate_shift"].any()
+    assert detector.pending == []
+
+
+def test_error_rate_step_raises_shift_alert_and_skips_missing_latency():
+    failed = np.concatenate([np.zeros(100), np.ones(40)])
+    latency = np.where(failed == 1, np.nan, 50.0)
+    alerts = shift_alerts(ChangePointDetector(), 1, *_checks(latency, failed))
+
+    hits = np.flatnonzero(alerts["error_rate_shift"])
+    assert len(hits) == 1 and 100 <= hits[0] < 120
+    assert not alerts["response_time_shift"].any()
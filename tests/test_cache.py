@@ -0,0 +1,100 @@
+import asyncio
+
+from app.services.cache import CacheService, LocalCache, _MISSING
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LocalCache(max_entries=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    cache.lookup("a")
+    cache.set("c", 3, ttl=60)
+
+    assert len(cache) == 2
+    assert cache.lookup("b") == (_MISSING, False)
+    assert cache.lookup("a") == (1, True)
+    assert cache.lookup("c") == (3, True)
+
+
+def test_entry_past_stale_window_is_gone():
+    cache = LocalCache(max_entries=10)
+    cache.set("a", 1, ttl=0, stale_ttl=60)
+    cache.set("b", 2, ttl=0, stale_ttl=0)
+
+    assert cache.lookup("a") == (1, False)
+    assert cache.lookup("b") == (_MISSING, False)
+    assert len(cache) == 1
+
+
+def test_single_flight_computes_once():
+    async def scenario():
+        cache = CacheService()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"value": calls}
+
+        results = await asyncio.gather(*(cache.get_or_set("key", compute, ttl=60) for _ in range(10)))
+        return cache, calls, results
+
+    cache, calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert results == [{"value": 1}] * 10
+    assert cache.counters["coalesced"] == 9
+    assert cache.counters["misses"] == 1
+
+
+def test_single_flight_survives_cancelled_loader():
+    async def scenario():
+        cache = CacheService()
+        started = asyncio.Event()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            started.set()
+            await asyncio.sleep(0.05)
+            return "loaded"
+
+        loader = asyncio.create_task(cache.get_or_set("key", compute, ttl=60))
+        await started.wait()
+        waiters = [asyncio.create_task(cache.get_or_set("key", compute, ttl=60)) for _ in range(3)]
+        await asyncio.sleep(0)
+        loader.cancel()
+
+        results = await asyncio.gather(*waiters)
+        assert loader.cancelled()
+        return cache, calls, results
+
+    cache, calls, results = asyncio.run(scenario())
+    # The first waiter to notice takes the load over and the others join it
+    assert results == ["loaded"] * 3
+    assert calls == 2
+    assert "key" not in cache._inflight
+
+
+def test_stale_value_served_while_one_refresh_runs():
+    async def scenario():
+        cache = CacheService()
+        cache.local.set("key", "old", ttl=0, stale_ttl=60)
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "new"
+
+        served = [await cache.get_or_set("key", compute, ttl=60, stale_ttl=60) for _ in range(3)]
+        await asyncio.gather(*cache._refreshes)
+        return cache, calls, served, await cache.get_or_set("key", compute, ttl=60)
+
+    cache, calls, served, refreshed = asyncio.run(scenario())
+    assert served == ["old"] * 3
+    assert calls == 1
+    assert refreshed == "new"
+    assert cache.counters["stale_served"] == 3
@@ -0,0 +1,100 @@
+import json
+from datetime import date, datetime
+
+import pytest
+
+from app.schemas import HealthCheckResponse, HealthStatus
+from app.services import cache_codec
+from app.services.cache_codec import CacheCodec
+
+
+def _value():
+    return {
+        "checked_at": datetime(2026, 3, 1, 12, 30, 15, 250000),
+        "day": date(2026, 3, 1),
+        "status": HealthStatus.DOWN,
+        "checks": [
+            HealthCheckResponse(
+                id=1, pipeline_id=7, status=HealthStatus.HEALTHY, response_time_ms=12.5,
+                status_code=200, error_message=None, checked_at=datetime(2026, 3, 1, 12, 0),
+            ),
+        ],
+        "counts": [1, 2, 3],
+        "ratio": 0.25,
+        "note": None,
+    }
+
+
+def _expected():
+    value = _value()
+    # Enums are stored by value
+    value["status"] = "down"
+    return value
+
+
+@pytest.mark.parametrize("compress_min_bytes", [0, 1 << 20])
+def test_json_round_trip(compress_min_bytes):
+    codec = CacheCodec("json", compress_min_bytes=compress_min_bytes)
+    decoded = codec.decode(codec.encode(_value()))
+
+    assert decoded == _expected()
+    assert isinstance(decoded["checks"][0], HealthCheckResponse)
+
+
+def test_json_round_trip_without_orjson(monkeypatch):
+    monkeypatch.setattr(cache_codec, "orjson", None)
+    codec = CacheCodec("json")
+
+    assert codec.decode(codec.encode(_value())) == _expected()
+
+
+@pytest.mark.parametrize("compress_min_bytes", [0, 1 << 20])
+def test_msgpack_round_trip(compress_min_bytes):
+    pytest.importorskip("msgpack")
+    codec = CacheCodec("msgpack", compress_min_bytes=compress_min_bytes)
+
+    assert codec.decode(codec.encode(_value())) == _expected()
+
+
+def test_large_values_are_compressed():
+    codec = CacheCodec("json", compress_min_bytes=64)
+    value = {"rows": [{"pipeline_id": i % 5, "status": "healthy"} for i in range(500)]}
+    encoded = codec.encode(value)
+
+    assert encoded[1:2] != b"-"
+    assert len(encoded) < len(json.dumps(value))
+    assert codec.decode(encoded) == value
+
+
+def test_incompressible_values_stay_plain():
+    codec = CacheCodec("json", compress_min_bytes=0)
+    encoded = codec.encode([1])
+
+    assert encoded[1:2] == b"-"
+    assert codec.decode(encoded) == [1]
+
+
+def test_reads_values_written_before_the_header():
+    codec = CacheCodec("json")
+
+    assert codec.decode(json.dumps({"total": 3}).encode()) == {"total": 3}
+
+
+def test_unregistered_model_comes_back_as_fields():
+    writer = CacheCodec("json")
+    reader = CacheCodec("json")
+    del reader._models["HealthCheckResponse"]
+    decoded = reader.decode(writer.encode(_value()))
+
+    assert decoded["checks"][0]["pipeline_id"] == 7
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        CacheCodec("pickle")
+
+
+def test_msgpack_falls_back_to_json_when_missing(monkeypatch):
+    monkeypatch.setattr(cache_codec, "msgpack", None)
+
+    assert CacheCodec("msgpack").format == "json"
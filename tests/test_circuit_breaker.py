@@ -0,0 +1,67 @@
+import pytest
+
+from app.models import CircuitState
+from app.services import circuit_breaker
+from app.services.circuit_breaker import CircuitBreaker
+
+
+@pytest.fixture(autouse=True)
+def policy(monkeypatch):
+    for name, value in [("CIRCUIT_FAILURE_THRESHOLD", 3), ("CIRCUIT_MAX_INTERVAL", 900),
+                        ("CIRCUIT_PROBE_TIMEOUT", 3), ("CIRCUIT_CONFIRM_CHECKS", 2),
+                        ("CIRCUIT_CONFIRM_INTERVAL", 10)]:
+        monkeypatch.setattr(circuit_breaker.settings, name, value)
+
+
+def _fail(breaker: CircuitBreaker, times: int):
+    for _ in range(times):
+        breaker.before_check()
+        breaker.record(success=False)
+
+
+def test_opens_after_threshold_and_backs_off():
+    breaker = CircuitBreaker()
+    _fail(breaker, 2)
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.next_interval(60) == 60
+
+    _fail(breaker, 1)
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.next_interval(60) == 120
+    _fail(breaker, 1)
+    assert breaker.next_interval(60) == 240
+    _fail(breaker, 10)
+    assert breaker.next_interval(60) == 900
+
+
+def test_expired_wait_becomes_a_short_probe():
+    breaker = CircuitBreaker(CircuitState.OPEN, 3)
+    assert breaker.check_timeout(10) == 10
+
+    breaker.before_check()
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert breaker.is_probe
+    assert breaker.check_timeout(10) == 3
+    assert breaker.check_timeout(2) == 2
+
+
+def test_probe_failure_reopens_and_success_closes():
+    breaker = CircuitBreaker(CircuitState.OPEN, 3)
+    breaker.before_check()
+    assert breaker.record(success=False)
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.consecutive_failures == 4
+
+    breaker.before_check()
+    assert breaker.record(success=True)
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.consecutive_failures == 0
+    assert breaker.next_interval(60) == 60
+
+
+def test_status_change_runs_fast_confirmation_checks():
+    breaker = CircuitBreaker()
+    assert not breaker.record(success=False, status_changed=True)
+
+    assert [breaker.next_interval(60) for _ in range(3)] == [10, 10, 60]
+    assert breaker.next_interval(5) == 5
@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.models import HealthCheck, HealthStatus
+from app.services.correlation import OutageCorrelator, error_signature
+
+WINDOW = 0.02
+
+
+def _pipeline(pipeline_id: int, team: str = "data", host: str = "warehouse.internal"):
+    return SimpleNamespace(
+        id=pipeline_id, name=f"pipeline-{pipeline_id}", owner_team=team, endpoint_url=f"https://{host}/health"
+    )
+
+
+def _check(error: str = "Connection refused", status_code: int = None):
+    return HealthCheck(
+        status=HealthStatus.DOWN, error_message=error, status_code=status_code, checked_at=datetime(2026, 3, 1)
+    )
+
+
+def _alert(pipeline):
+    return {
+        "pipeline_id": pipeline.id,
+        "name": pipeline.name,
+        "rows": [(pipeline.id, f"{pipeline.id}:status:down", False)],
+        "severity": "critical",
+        "message": f"alert for {pipeline.name}",
+        "suppressed": False,
+        "triggered_at": datetime(2026, 3, 1),
+    }
+
+
+def _fail(correlator, pipeline, check=None):
+    return correlator.add(pipeline, check or _check(), _alert(pipeline))
+
+
+def _run(scenario):
+    sent = []
+
+    async def main():
+        await scenario(OutageCorrelator(sent.append, window=WINDOW))
+        await asyncio.sleep(WINDOW * 3)
+
+    asyncio.run(main())
+    return sent
+
+
+def test_signature_ignores_variable_parts():
+    first = error_signature(_check("Timeout after 5003 ms connecting to '10.0.0.1'"))
+    second = error_signature(_check("Timeout after 4998 ms connecting to '10.0.0.7'"))
+
+    assert first == second
+    assert error_signature(_check(status_code=503)) == "DOWN HTTP 503"
+
+
+def test_lone_failure_sends_its_own_alert():
+    async def scenario(correlator):
+        assert _fail(correlator, _pipeline(1))
+
+    sent = _run(scenario)
+    assert [alert["message"] for alert in sent] == ["alert for pipeline-1"]
+
+
+def test_shared_cause_becomes_one_digest():
+    async def scenario(correlator):
+        for pipeline_id in (1, 2, 3):
+            _fail(correlator, _pipeline(pipeline_id))
+
+    sent = _run(scenario)
+    assert len(sent) == 1
+    lines = sent[0]["message"].splitlines()
+    assert lines[0] == "🚨 Outage: 3 pipelines DOWN"
+    assert "Host: warehouse.internal" in lines[1]
+    assert lines[2] == "Pipelines: pipeline-1, pipeline-2, pipeline-3"
+    assert [row[0] for row in sent[0]["rows"]] == [1, 2, 3]
+
+
+def test_different_causes_are_kept_apart():
+    async def scenario(correlator):
+        _fail(correlator, _pipeline(1))
+        _fail(correlator, _pipeline(2))
+        _fail(correlator, _pipeline(3, host="api.internal"))
+        _fail(correlator, _pipeline(4, team="payments"))
+        _fail(correlator, _pipeline(5), _check(status_code=500))
+
+    sent = _run(scenario)
+    assert sorted(alert["message"].splitlines()[0] for alert in sent) == [
+        "alert for pipeline-3", "alert for pipeline-4", "alert for pipeline-5", "🚨 Outage: 2 pipelines DOWN",
+    ]
+
+
+def test_digest_ends_with_recovery_message():
+    async def scenario(correlator):
+        _fail(correlator, _pipeline(1))
+        _fail(correlator, _pipeline(2))
+        await asyncio.sleep(WINDOW * 3)
+        correlator.recovered(1)
+        correlator.recovered(2)
+
+    sent = _run(scenario)
+    assert len(sent) == 2
+    assert sent[1]["message"].splitlines()[0] == "✅ Outage resolved: all pipelines recovered"
+    assert "Recovered: pipeline-1, pipeline-2" in sent[1]["message"]
+    assert sent[1]["severity"] == "info"
+
+
+def test_released_pipelines_leave_no_group_behind():
+    async def scenario(correlator):
+        _fail(correlator, _pipeline(1))
+        _fail(correlator, _pipeline(2))
+        correlator.release([2])
+        await asyncio.sleep(WINDOW * 3)
+        correlator.sync([])
+        assert len(correlator) == 0
+        assert not correlator._member_of
+
+    sent = _run(scenario)
+    assert [alert["message"] for alert in sent] == ["alert for pipeline-1"]
+
+
+def test_disabled_window_sends_everything_alone():
+    correlator = OutageCorrelator(lambda alert: None, window=0)
+
+    assert not _fail(correlator, _pipeline(1))
+    assert len(correlator) == 0
@@ -0,0 +1,78 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database import AsyncSessionLocal, engine
+from app.models import Base, HealthStatus, Pipeline, PipelineType
+from app.services.dashboard_view import DashboardView
+from app.services.events import EventHub
+
+
+@pytest.fixture
+def view():
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSessionLocal() as db:
+            for pipeline_id, status in [(1, HealthStatus.HEALTHY), (2, HealthStatus.HEALTHY), (3, HealthStatus.DOWN)]:
+                db.add(Pipeline(
+                    id=pipeline_id, name=f"pipeline-{pipeline_id}", pipeline_type=PipelineType.BATCH,
+                    endpoint_url="http://example.com", current_status=status,
+                ))
+            await db.commit()
+        view = DashboardView()
+        await view.reconcile()
+        return view
+
+    yield asyncio.run(setup())
+    asyncio.run(engine.dispose())
+
+
+def _row(check_id, pipeline_id, status, response_time_ms=None, checked_at=None):
+    return {
+        "id": check_id, "pipeline_id": pipeline_id, "status": status, "response_time_ms": response_time_ms,
+        "checked_at": checked_at or datetime.utcnow(),
+    }
+
+
+def test_sink_batch_publishes_only_changed_counters(view):
+    hub = EventHub(dashboard=view)
+    hub.seed([(1, HealthStatus.HEALTHY), (2, HealthStatus.HEALTHY), (3, HealthStatus.DOWN)])
+    subscription = hub.subscribe()
+    hub.apply([])
+    asyncio.run(subscription.get(0))  # the initial values
+
+    batch = [
+        _row(1, 1, HealthStatus.DOWN),
+        _row(2, 2, HealthStatus.HEALTHY, 100.0),
+        _row(3, 3, HealthStatus.HEALTHY, 300.0),
+    ]
+    view.apply(batch)
+    hub.apply(batch)
+
+    events = asyncio.run(subscription.get(0))
+    # One pipeline went down and another recovered: the status counts net out
+    assert [event_type for event_type, _ in events] == ["status", "status", "dashboard"]
+    assert json.loads(events[-1][1]) == {"total_checks_today": 3, "avg_response_time": 200.0}
+
+    view.apply([_row(4, 2, HealthStatus.DEGRADED, 50.0)])
+    hub.apply([_row(4, 2, HealthStatus.DEGRADED, 50.0)])
+    events = dict(asyncio.run(subscription.get(0)))
+    assert json.loads(events["dashboard"]) == {
+        "healthy_pipelines": 1, "degraded_pipelines": 1, "total_checks_today": 4, "avg_response_time": 150.0,
+    }
+
+
+def test_late_results_and_deleted_pipelines_leave_statuses_alone(view):
+    view.apply([_row(1, 1, HealthStatus.DOWN)])
+    view.apply([_row(2, 1, HealthStatus.HEALTHY, checked_at=datetime.utcnow() - timedelta(minutes=5))])
+    view.pipeline_removed(3)
+    view.apply([_row(3, 3, HealthStatus.HEALTHY)])
+    view.pipeline_added(4)
+
+    stats = view.stats()
+    assert (stats.total_pipelines, stats.healthy_pipelines, stats.down_pipelines) == (3, 1, 1)
+    assert stats.total_checks_today == 3
@@ -0,0 +1,45 @@
+import asyncio
+import json
+
+from app import main
+from app.api.events import stream_events
+from app.services.cache import cache_service
+from app.services.events import event_hub
+
+
+class _Client:
+    async def is_disconnected(self) -> bool:
+        return False
+
+
+async def _next_event(body) -> tuple:
+    while True:
+        chunk = await asyncio.wait_for(body.__anext__(), 1)
+        if chunk.startswith("event: "):
+            event_type, data = chunk[len("event: "):].split("\ndata: ")
+            return event_type, json.loads(data)
+
+
+def test_any_replica_streams_status_changes_from_the_bus(monkeypatch):
+    monkeypatch.setattr(main.settings, "EMBEDDED_WORKER", False)
+
+    async def scenario():
+        async with main.lifespan(main.app):
+            response = await stream_events(_Client())
+            body = response.body_iterator
+            try:
+                ready = await _next_event(body)
+                # Published by a worker in another process
+                await cache_service.events._dispatch("status", {
+                    "pipeline_id": 7, "status": "down", "previous_status": "healthy",
+                    "checked_at": "2026-03-01T12:00:00",
+                }, remote=True)
+                change = await _next_event(body)
+            finally:
+                await body.aclose()
+            return ready, change
+
+    ready, change = asyncio.run(scenario())
+    assert ready == ("ready", {"checks": False, "dashboard": False})
+    assert change[0] == "status" and change[1]["pipeline_id"] == 7
+    assert not event_hub.subscribers
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+from sqlalchemy import update
+
+from app.database import AsyncSessionLocal, engine
+from app.models import Base, Pipeline, PipelineType
+from app.services.anomaly_detector import anomaly_detector
+from app.services.health_checker import HealthCheckWorker
+from app.services.scheduler import CheckScheduler
+
+
+@pytest.fixture
+def worker():
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSessionLocal() as db:
+            db.add(Pipeline(id=1, name="orders", pipeline_type=PipelineType.BATCH, endpoint_url="http://example.com"))
+            await db.commit()
+
+    asyncio.run(create_tables())
+    yield HealthCheckWorker(scheduler=CheckScheduler())
+    anomaly_detector.reset()
+    asyncio.run(engine.dispose())
+
+
+async def _edit(**values):
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(Pipeline).where(Pipeline.id == 1).values(**values))
+        await db.commit()
+
+
+def test_pipeline_events_apply_incrementally(worker):
+    async def scenario():
+        await worker.on_pipeline_event({"pipeline_id": 1, "action": "created", "status": "unknown"})
+        scheduled = worker.scheduler.get(1)
+        assert scheduled is not None
+
+        await _edit(check_interval=120, endpoint_url="http://example.com/v2")
+        await worker.on_pipeline_event({"pipeline_id": 1, "action": "updated"})
+        assert worker.scheduler.get(1) is scheduled
+        assert (scheduled.check_interval, scheduled.endpoint_url) == (120, "http://example.com/v2")
+
+        await _edit(is_active=False)
+        await worker.on_pipeline_event({"pipeline_id": 1, "action": "updated"})
+        assert 1 not in worker.scheduler
+        assert 1 not in anomaly_detector.states
+
+    asyncio.run(scenario())
+    # Single-pipeline events never fall back to a full resync
+    assert not worker.resync_requested.is_set()
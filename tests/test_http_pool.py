@@ -0,0 +1,66 @@
+import asyncio
+import socket
+
+from app.services.http_pool import CheckHttpClient, DNSCache
+
+_RESPONSE = b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: keep-alive\r\n\r\nok"
+
+
+async def _serve(connections: list):
+    async def handle(reader, writer):
+        connections.append(writer)
+        while await reader.readuntil(b"\r\n\r\n"):
+            writer.write(_RESPONSE)
+            await writer.drain()
+
+    async def guarded(reader, writer):
+        try:
+            await handle(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    server = await asyncio.start_server(guarded, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def test_connections_are_reused_and_setup_is_timed_once():
+    async def scenario():
+        connections = []
+        server, port = await _serve(connections)
+        http = CheckHttpClient()
+        try:
+            responses = [await http.get(f"http://127.0.0.1:{port}/health", timeout=5) for _ in range(3)]
+        finally:
+            await http.aclose()
+            server.close()
+        return connections, responses
+
+    connections, responses = asyncio.run(scenario())
+    assert len(connections) == 1
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    # Only the first check paid for the TCP connect
+    assert responses[0].connect_time_ms > 0
+    assert [response.connect_time_ms for response in responses[1:]] == [0.0, 0.0]
+    assert all(response.response_time_ms > 0 for response in responses)
+
+
+def test_dns_lookups_are_shared_and_cached():
+    lookups = []
+
+    async def getaddrinfo(host, port, type=0):
+        lookups.append(host)
+        await asyncio.sleep(0.01)
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("10.0.0.7", port))]
+
+    async def scenario():
+        asyncio.get_running_loop().getaddrinfo = getaddrinfo
+        dns = DNSCache(ttl=60)
+        concurrent = await asyncio.gather(*(dns.resolve("warehouse.internal", 443) for _ in range(5)))
+        cached = await dns.resolve("warehouse.internal", 443)
+        literal = await dns.resolve("192.168.1.4", 443)
+        return concurrent, cached, literal
+
+    concurrent, cached, literal = asyncio.run(scenario())
+    assert concurrent == ["10.0.0.7"] * 5 and cached == "10.0.0.7"
+    assert literal == "192.168.1.4"
+    assert lookups == ["warehouse.internal"]
@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.models import Base, HealthCheck, HealthCheckRollup, HealthStatus, Pipeline, PipelineType
+from app.services import retention, rollups
+from app.services.retention import RetentionJob
+
+NOW = datetime(2026, 3, 20, 6, 0)
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'retention.db'}")
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(retention, "engine", engine)
+    monkeypatch.setattr(retention, "AsyncSessionLocal", sessions)
+    monkeypatch.setattr(rollups, "AsyncSessionLocal", sessions)
+    monkeypatch.setattr(retention.settings, "RAW_RETENTION_DAYS", 7)
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    yield sessions
+    asyncio.run(engine.dispose())
+
+
+async def _insert(sessions, *checked_at):
+    async with sessions() as db:
+        db.add(Pipeline(id=1, name="orders", pipeline_type=PipelineType.BATCH, endpoint_url="http://example.com"))
+        for ts in checked_at:
+            db.add(HealthCheck(pipeline_id=1, status=HealthStatus.HEALTHY, response_time_ms=20.0, checked_at=ts))
+        await db.commit()
+
+
+async def _daily_counts(sessions):
+    async with sessions() as db:
+        result = await db.execute(
+            select(HealthCheckRollup.bucket_start, HealthCheckRollup.check_count)
+            .where(HealthCheckRollup.resolution == "1d")
+            .order_by(HealthCheckRollup.bucket_start)
+        )
+        return dict(result.all())
+
+
+def test_expiring_days_are_rolled_up_before_raw_checks_go(sessions):
+    async def scenario():
+        await _insert(
+            sessions,
+            datetime(2026, 3, 10, 12, 30), datetime(2026, 3, 10, 13, 0),  # oldest expiring day, mid-day
+            datetime(2026, 3, 11, 8, 0),
+            datetime(2026, 3, 19, 10, 0),
+        )
+        await RetentionJob().run_once(now=NOW)
+        async with sessions() as db:
+            remaining = (await db.execute(select(HealthCheck.checked_at))).scalars().all()
+        return remaining, await _daily_counts(sessions)
+
+    remaining, daily = asyncio.run(scenario())
+    assert remaining == [datetime(2026, 3, 19, 10, 0)]
+    assert daily == {datetime(2026, 3, 10): 2, datetime(2026, 3, 11): 1}
+
+
+def test_backfill_leaves_rollups_of_days_without_raw_checks(sessions):
+    async def scenario():
+        await _insert(sessions, datetime(2026, 3, 12, 9, 0), datetime(2026, 3, 13, 9, 0))
+        async with sessions() as db:
+            db.add(HealthCheckRollup(
+                pipeline_id=1, resolution="1d", bucket_start=datetime(2026, 3, 1), check_count=5,
+            ))
+            await db.commit()
+        await rollups.backfill(since=datetime(2026, 2, 1), until=NOW)
+        return await _daily_counts(sessions)
+
+    daily = asyncio.run(scenario())
+    assert daily == {datetime(2026, 3, 1): 5, datetime(2026, 3, 12): 1, datetime(2026, 3, 13): 1}
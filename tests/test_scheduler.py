@@ -0,0 +1,108 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.models import CircuitState
+from app.services import scheduler as scheduler_module
+from app.services.scheduler import CheckScheduler
+
+
+def _pipeline(pipeline_id: int, check_interval: int = 60):
+    return SimpleNamespace(
+        id=pipeline_id, name=f"pipeline-{pipeline_id}", endpoint_url="http://example.com",
+        check_interval=check_interval, timeout=5, current_status=None, owner_team=None,
+        circuit_state=CircuitState.CLOSED, consecutive_failures=0,
+    )
+
+
+@pytest.fixture(autouse=True)
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(scheduler_module.settings, "SCHEDULER_JITTER", 0.0)
+
+
+def _due_ids(scheduler: CheckScheduler, now: float):
+    return [(pipeline.id, round(due - now)) for pipeline, due in scheduler._pop_due(now + 1000)]
+
+
+def test_pipelines_come_due_in_deadline_order():
+    scheduler = CheckScheduler()
+    now = time.monotonic()
+    for pipeline_id, interval in [(1, 30), (2, 10), (3, 20)]:
+        scheduler.add(_pipeline(pipeline_id))
+        scheduler.reschedule(pipeline_id, after=now, interval=interval)
+
+    assert _due_ids(scheduler, now) == [(2, 10), (3, 20), (1, 30)]
+
+
+def test_reschedule_supersedes_earlier_entry():
+    scheduler = CheckScheduler()
+    now = time.monotonic()
+    scheduler.add(_pipeline(1))
+    scheduler.reschedule(1, after=now, interval=10)
+    scheduler.reschedule(1, after=now, interval=50)
+
+    assert _due_ids(scheduler, now) == [(1, 50)]
+
+
+def test_removed_pipeline_never_fires():
+    scheduler = CheckScheduler()
+    now = time.monotonic()
+    scheduler.add(_pipeline(1))
+    scheduler.add(_pipeline(2))
+    scheduler.remove(1)
+
+    assert [pipeline_id for pipeline_id, _ in _due_ids(scheduler, now)] == [2]
+    assert 1 not in scheduler
+
+
+def test_readded_pipeline_ignores_entries_from_before_removal():
+    scheduler = CheckScheduler()
+    now = time.monotonic()
+    scheduler.add(_pipeline(1))
+    scheduler.reschedule(1, after=now, interval=5)
+    scheduler.remove(1)
+    scheduler.add(_pipeline(1))
+    scheduler.reschedule(1, after=now, interval=40)
+
+    assert _due_ids(scheduler, now) == [(1, 40)]
+
+
+def test_sync_drops_pipelines_no_longer_active():
+    scheduler = CheckScheduler()
+    scheduler.sync([_pipeline(1), _pipeline(2), _pipeline(3)])
+    scheduler.sync([_pipeline(2)])
+
+    assert len(scheduler) == 1
+    assert [pipeline_id for pipeline_id, _ in _due_ids(scheduler, time.monotonic())] == [2]
+
+
+def test_sync_keeps_state_of_pipeline_in_flight():
+    scheduler = CheckScheduler()
+    now = time.monotonic()
+    scheduler.add(_pipeline(1))
+    scheduler.reschedule(1, after=now - 10, interval=10)
+    [(in_flight, _)] = scheduler._pop_due(now + 5)
+    in_flight.current_status = "down"
+
+    # A resync reads stored values that lag the check still running
+    stale = _pipeline(1, check_interval=30)
+    stale.current_status = "healthy"
+    scheduler.sync([stale])
+
+    assert scheduler.get(1) is in_flight
+    assert in_flight.current_status == "down" and in_flight.check_interval == 30
+    assert _due_ids(scheduler, now) == []
+
+    scheduler.reschedule(1, after=now, interval=in_flight.check_interval)
+    assert _due_ids(scheduler, now) == [(1, 30)]
+
+
+def test_interval_change_pulls_pending_check_forward():
+    scheduler = CheckScheduler()
+    now = time.monotonic()
+    scheduler.add(_pipeline(1, check_interval=300))
+    scheduler.reschedule(1, after=now, interval=300)
+    scheduler.add(_pipeline(1, check_interval=20))
+
+    assert _due_ids(scheduler, now) == [(1, 20)]
@@ -0,0 +1,45 @@
+from collections import Counter
+
+from app.services.sharding import HashRing
+
+PIPELINES = range(1, 20001)
+
+
+def test_empty_ring_owns_nothing():
+    assert HashRing().owner(1) is None
+
+
+def test_pipelines_spread_evenly():
+    members = ["worker-a", "worker-b", "worker-c", "worker-d"]
+    ring = HashRing(members)
+    counts = Counter(ring.owner(pipeline_id) for pipeline_id in PIPELINES)
+
+    assert set(counts) == set(members)
+    share = len(PIPELINES) / len(members)
+    for count in counts.values():
+        assert abs(count - share) < 0.15 * share
+
+
+def test_owner_does_not_depend_on_member_order():
+    ring = HashRing(["worker-a", "worker-b", "worker-c"])
+    shuffled = HashRing(["worker-c", "worker-a", "worker-b"])
+
+    assert all(ring.owner(pipeline_id) == shuffled.owner(pipeline_id) for pipeline_id in PIPELINES)
+
+
+def test_joining_member_only_takes_pipelines():
+    before = HashRing(["worker-a", "worker-b", "worker-c"])
+    after = HashRing(["worker-a", "worker-b", "worker-c", "worker-d"])
+
+    moved = [pipeline_id for pipeline_id in PIPELINES if before.owner(pipeline_id) != after.owner(pipeline_id)]
+    assert all(after.owner(pipeline_id) == "worker-d" for pipeline_id in moved)
+    assert abs(len(moved) / len(PIPELINES) - 0.25) < 0.05
+
+
+def test_leaving_member_only_gives_up_its_own_pipelines():
+    before = HashRing(["worker-a", "worker-b", "worker-c"])
+    after = HashRing(["worker-a", "worker-c"])
+
+    for pipeline_id in PIPELINES:
+        if before.owner(pipeline_id) != "worker-b":
+            assert after.owner(pipeline_id) == before.owner(pipeline_id)
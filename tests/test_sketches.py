@@ -0,0 +1,61 @@
+import numpy as np
+
+from app.services.sketches import QUANTILES, RELATIVE_ACCURACY, LatencySketch, percentiles
+
+
+def _sketch(values) -> LatencySketch:
+    sketch = LatencySketch()
+    for value in values:
+        sketch.add(float(value))
+    return sketch
+
+
+def _assert_close(estimates, values):
+    # Within RELATIVE_ACCURACY of some sample ranked at the quantile
+    for q, estimate in zip(QUANTILES, estimates):
+        low, high = np.quantile(values, q, method="lower"), np.quantile(values, q, method="higher")
+        assert low * (1 - RELATIVE_ACCURACY) <= estimate <= high * (1 + RELATIVE_ACCURACY)
+
+
+def test_merged_sketches_keep_relative_accuracy():
+    rng = np.random.default_rng(7)
+    fast = rng.lognormal(mean=3, sigma=0.5, size=20000)
+    slow = rng.lognormal(mean=6, sigma=0.8, size=5000)
+
+    merged = _sketch(fast)
+    merged.merge(_sketch(slow))
+
+    assert merged.count == len(fast) + len(slow)
+    _assert_close(merged.quantiles(), np.concatenate([fast, slow]))
+
+
+def test_merge_many_matches_merging_one_by_one():
+    rng = np.random.default_rng(11)
+    parts = [rng.lognormal(mean=4, sigma=1.0, size=1000) for _ in range(24)]
+    sketches = [_sketch(part) for part in parts]
+
+    merged = LatencySketch()
+    for sketch in sketches:
+        merged.merge(sketch)
+    combined = LatencySketch.merge_many(sketch.to_bytes() for sketch in sketches)
+
+    assert combined.counts == merged.counts
+    assert combined.zero_count == merged.zero_count
+    _assert_close(combined.quantiles(), np.concatenate(parts))
+
+
+def test_round_trip_and_empty_sketches():
+    sketch = _sketch([0.0, 1.5, 250.0, 250.0, 9000.0])
+    restored = LatencySketch.from_bytes(sketch.to_bytes())
+
+    assert restored.counts == sketch.counts
+    assert restored.zero_count == 1
+    assert LatencySketch.merge_many([None, b"", LatencySketch().to_bytes()]).count == 0
+    assert percentiles(LatencySketch()) is None
+
+
+def test_quantiles_clamped_to_exact_bounds():
+    values = [100.0] * 50
+    result = percentiles(_sketch(values), minimum=100.0, maximum=100.0)
+
+    assert result == {"p50": 100.0, "p90": 100.0, "p95": 100.0, "p99": 100.0}